@@ -1,20 +1,70 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from dotenv import load_dotenv
 from fastapi import Request
 from fastapi.responses import JSONResponse
+import logging
 import os
 from fastapi.middleware.cors import CORSMiddleware
+from clients.breaker import CircuitOpenError, breakers_snapshot
+from clients import odoo as odoo_client
 
 # Cargar variables de entorno al iniciar (solo una vez)
 load_dotenv()
 
+from services import logs  # noqa: E402
+
+# Logs JSON por cola con hilo escritor (antes de importar el resto de los módulos)
+logs.configure()
+
 from routes.send_plain_text import router as plain_text_router  # noqa: E402
 from routes.send_pdf import router as pdf_router  # noqa: E402
 from routes.validate_number import router as validate_number_router  # noqa: E402
 from routes.send_text_number import router as send_text_number_router  # noqa: E402
 from routes.send_pdf_number import router as send_pdf_number_router  # noqa: E402
+from routes.admin import router as admin_router  # noqa: E402
+from routes.media import router as media_router  # noqa: E402
+from routes.jobs import router as jobs_router  # noqa: E402
+from routes.reports import router as reports_router  # noqa: E402
+from routes.messages import router as messages_router  # noqa: E402
+from services.readiness import get_prober, request_started, request_finished  # noqa: E402
+from services.warmup import start_warmup  # noqa: E402
+from services import bulkheads, digest, dispatcher  # noqa: E402
+from services.profiling import ProfileMiddleware  # noqa: E402
+from clients.whatsapp import close_client, instances_snapshot  # noqa: E402
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Warm-up (auth Odoo, pools, fuentes, alias) y prober de readiness en segundo
+    # plano: /ready responde 503 hasta que el warm-up termina.
+    start_warmup()
+    # Threadpool con espacio para todos los cupos de los bulkheads
+    bulkheads.configure_threadpool()
+    prober = get_prober()
+    prober.start()
+    # Despachador de cierres (opcional): un solo worker lo ejecuta (file lock)
+    if dispatcher.enabled():
+        dispatcher.get_dispatcher().start()
+    try:
+        yield
+    finally:
+        # Lotes del modo resumen ya respondidos con 202: se envían antes de cerrar el cliente HTTP
+        await asyncio.to_thread(digest.flush_all)
+        dispatcher.get_dispatcher().stop()
+        prober.stop()
+        close_client()
+        logs.shutdown()
+
+
+app = FastAPI(title="Cierres API", version="0.1.0", lifespan=lifespan)
 
-app = FastAPI(title="Cierres API", version="0.1.0")
+# Cupos de concurrencia por clase de ruta (429/503 con Retry-After al saturarse).
+# Se registra antes que CORS para que los rechazos también lleven sus headers.
+app.add_middleware(bulkheads.BulkheadMiddleware)
+# Perfil cProfile de un request con X-Profile: 1 + X-Admin-Token (ver services.profiling)
+app.add_middleware(ProfileMiddleware)
 
 # ---------------------------------------------------------------------------
 # CORS CONFIG (simplificado)
@@ -46,16 +96,18 @@ app.add_middleware(
 
 APP_DEBUG = os.getenv("APP_DEBUG", "0") in {"1", "true", "True", "yes", "on"}
 
+logger = logging.getLogger("app")
+
 @app.middleware("http")
 async def log_errors(request: Request, call_next):
+    request_started()
     try:
         response = await call_next(request)
         return response
     except Exception as e:  # noqa: BLE001
         if APP_DEBUG:
-            # Log detallado a stdout (lo capta Coolify)
-            import traceback
-            traceback.print_exc()
+            # Log detallado con traceback (lo capta Coolify)
+            logger.exception("Excepción no manejada en %s", request.url.path)
             return JSONResponse(
                 status_code=500,
                 content={
@@ -65,16 +117,56 @@ async def log_errors(request: Request, call_next):
                 },
             )
         raise
+    finally:
+        request_finished()
+
+# Línea de resumen por request (route, status, bytes, Odoo, render, envío, validación).
+# Se registra al final para envolver a todos los demás middlewares (incluye rechazos 429/503).
+app.add_middleware(logs.AccessLogMiddleware)
+
+@app.exception_handler(CircuitOpenError)
+async def circuit_open_handler(request: Request, exc: CircuitOpenError):
+    # Dependencia caída: fallar rápido en lugar de retener un worker hasta el timeout
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc), "dependency": exc.name},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
 
 app.include_router(plain_text_router)
 app.include_router(pdf_router)
 app.include_router(send_text_number_router)
 app.include_router(send_pdf_number_router)
 app.include_router(validate_number_router)
+app.include_router(admin_router)
+app.include_router(media_router)
+app.include_router(jobs_router)
+app.include_router(reports_router)
+app.include_router(messages_router)
 
 @app.get("/health")
 async def health():
-    return {"status": "ok"}
+    # Solo estado en memoria: no toca Odoo ni el bridge, responde aunque el threadpool esté lleno
+    data = {"status": "ok", "breakers": breakers_snapshot(), "bulkheads": bulkheads.snapshot()}
+    try:
+        data["whatsapp_instances"] = instances_snapshot()
+    except ValueError:
+        # WhatsApp sin configurar: /health sigue respondiendo
+        pass
+    if odoo_client.DEBUG_PAYLOAD:
+        # Bytes de respuesta Odoo acumulados por modelo:método
+        data["odoo_payload"] = odoo_client.payload_stats()
+    return data
+
+@app.get("/ready")
+async def ready():
+    """Readiness profundo (Odoo auth, instancia WhatsApp, colas, breakers).
+
+    Devuelve el último resultado del prober en segundo plano; 503 si alguna
+    dependencia no está lista o los datos están vencidos.
+    """
+    snapshot = get_prober().snapshot()
+    return JSONResponse(status_code=200 if snapshot["ready"] else 503, content=snapshot)
 
 @app.get("/")
 async def root():
@@ -0,0 +1,122 @@
+"""Benchmark: helpers de formato actuales vs los anteriores basados en strptime.
+
+Simula el render de una sesión con N órdenes: una hora por orden, montos de
+órdenes/líneas/pagos y la fecha de la sesión.
+
+Uso:
+    python -m benchmarks.bench_formatting            # 2000 órdenes
+    python -m benchmarks.bench_formatting 10000 5    # órdenes, repeticiones
+"""
+
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+from services import formatting
+
+
+# --- Implementaciones anteriores (copiadas de services/pdf_service.py) -----
+
+def legacy_format_currency(value):
+    return f"${int(value):,}"
+
+
+def legacy_format_date_spanish(date_str):
+    if not date_str:
+        return ""
+    if isinstance(date_str, str):
+        try:
+            date_obj = datetime.strptime(date_str, '%Y-%m-%d %H:%M:%S')
+        except ValueError:
+            try:
+                date_obj = datetime.strptime(date_str, '%Y-%m-%d')
+            except ValueError:
+                return date_str
+    elif isinstance(date_str, datetime):
+        date_obj = date_str
+    else:
+        return str(date_str)
+    spanish_months = [
+        "Enero", "Febrero", "Marzo", "Abril", "Mayo", "Junio",
+        "Julio", "Agosto", "Septiembre", "Octubre", "Noviembre", "Diciembre"
+    ]
+    return f"{date_obj.day:02d} de {spanish_months[date_obj.month - 1]} del {date_obj.year}"
+
+
+def legacy_adjust_time(dt_string, format_in='%Y-%m-%d %H:%M:%S'):
+    dt = datetime.strptime(dt_string, format_in)
+    return (dt - timedelta(hours=5)).strftime('%I:%M:%S %p')
+
+
+# --- Datos sintéticos --------------------------------------------------------
+
+def build_session(n_orders: int, seed: int = 7):
+    rnd = random.Random(seed)
+    start = datetime(2025, 3, 14, 13, 0, 0)
+    prices = [rnd.choice([1500, 2500, 3900, 4500, 9900, 12000, 25000]) * rnd.randint(1, 4) for _ in range(200)]
+    orders = []
+    for i in range(n_orders):
+        ts = start + timedelta(seconds=i * rnd.randint(5, 25))
+        lines = [rnd.choice(prices) for _ in range(rnd.randint(1, 5))]
+        orders.append({
+            'date_order': ts.strftime('%Y-%m-%d %H:%M:%S'),
+            'amount_total': float(sum(lines)),
+            'lines': [float(p) for p in lines],
+            'payments': [float(sum(lines))],
+        })
+    return start.strftime('%Y-%m-%d %H:%M:%S'), orders
+
+
+def render(session_start, orders, adjust_time, format_currency, format_date_spanish):
+    out = [format_date_spanish(session_start), adjust_time(session_start)]
+    for order in orders:
+        out.append(adjust_time(order['date_order']))
+        out.append(format_currency(order['amount_total']))
+        for amount in order['lines']:
+            out.append(format_currency(amount))
+            out.append(format_currency(amount))
+        for amount in order['payments']:
+            out.append(format_currency(amount))
+    return out
+
+
+def bench(label, fn, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    print(f"{label:<28} {best * 1000:8.2f} ms (mejor de {repeat})")
+    return best
+
+
+def main(argv):
+    n_orders = int(argv[1]) if len(argv) > 1 else 2000
+    repeat = int(argv[2]) if len(argv) > 2 else 5
+    session_start, orders = build_session(n_orders)
+
+    # Verificar que ambas versiones producen exactamente la misma salida
+    formatting.clear_caches()
+    legacy = render(session_start, orders, legacy_adjust_time, legacy_format_currency, legacy_format_date_spanish)
+    current = render(session_start, orders, formatting.adjust_time, formatting.format_currency, formatting.format_date_spanish)
+    if legacy != current:
+        raise SystemExit("Las salidas difieren: revisar REPORT_TIMEZONE / REPORT_UTC_OFFSET")
+
+    print(f"Sesión sintética: {n_orders} órdenes")
+    t_legacy = bench("legacy (strptime)", lambda: render(
+        session_start, orders, legacy_adjust_time, legacy_format_currency, legacy_format_date_spanish), repeat)
+
+    def cold():
+        formatting.clear_caches(timezone_too=False)
+        render(session_start, orders, formatting.adjust_time, formatting.format_currency, formatting.format_date_spanish)
+
+    t_cold = bench("formatting (cache frío)", cold, repeat)
+    t_warm = bench("formatting (cache caliente)", lambda: render(
+        session_start, orders, formatting.adjust_time, formatting.format_currency, formatting.format_date_spanish), repeat)
+    print(f"speedup frío x{t_legacy / t_cold:.1f} | caliente x{t_legacy / t_warm:.1f}")
+    print(formatting.cache_info())
+
+
+if __name__ == "__main__":
+    main(sys.argv)
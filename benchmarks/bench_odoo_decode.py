@@ -0,0 +1,128 @@
+"""Benchmark: decodificación de respuestas Odoo XML-RPC vs JSON-RPC.
+
+Compara el costo de CPU y la memoria pico (tracemalloc) de convertir el cuerpo
+de una respuesta grande en objetos Python:
+    xmlrpc.client     -> lo que hace hoy TimeoutTransport.parse_response
+    json              -> /jsonrpc sin orjson
+    orjson            -> /jsonrpc con orjson (si está instalado)
+
+Por defecto usa una respuesta sintética de search_read sobre pos.order.line.
+También acepta una respuesta XML-RPC grabada (el cuerpo methodResponse, por
+ejemplo capturado con ODOO_DEBUG_PAYLOAD + un proxy); el JSON equivalente se
+genera a partir de ella.
+
+Uso:
+    python -m benchmarks.bench_odoo_decode                    # 20000 registros
+    python -m benchmarks.bench_odoo_decode 50000 5            # registros, repeticiones
+    python -m benchmarks.bench_odoo_decode respuesta.xml 5    # respuesta grabada
+"""
+
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+import xmlrpc.client
+
+try:
+    import orjson  # type: ignore
+except ImportError:  # pragma: no cover
+    orjson = None
+
+
+# --- Datos -------------------------------------------------------------------
+
+def build_records(n: int, seed: int = 7):
+    rnd = random.Random(seed)
+    records = []
+    for i in range(n):
+        product = rnd.randint(1, 800)
+        qty = float(rnd.randint(1, 4))
+        price = float(rnd.choice([1500, 2500, 3900, 4500, 9900, 12000, 25000]))
+        records.append({
+            'id': i + 1,
+            'order_id': [i // 3 + 1, f"Tienda Centro/{i // 3 + 1:05d}"],
+            'product_id': [product, f"[P{product:04d}] Producto {product}"],
+            'qty': qty,
+            'price_unit': price,
+            'price_subtotal': qty * price,
+        })
+    return records
+
+
+def load_bodies(argv):
+    """(cuerpo XML-RPC, cuerpo JSON-RPC, descripción)."""
+    if len(argv) > 1 and os.path.isfile(argv[1]):
+        with open(argv[1], 'rb') as fh:
+            xml_body = fh.read()
+        (result,), _ = xmlrpc.client.loads(xml_body, use_builtin_types=True)
+        label = f"respuesta grabada {argv[1]}"
+    else:
+        n = int(argv[1]) if len(argv) > 1 else 20000
+        result = build_records(n)
+        xml_body = xmlrpc.client.dumps((result,), methodresponse=True, allow_none=True).encode('utf-8')
+        label = f"search_read sintético de {n} pos.order.line"
+    json_body = json.dumps({'jsonrpc': '2.0', 'id': 1, 'result': result}).encode('utf-8')
+    return xml_body, json_body, label
+
+
+# --- Decodificadores ---------------------------------------------------------
+
+def decode_xmlrpc(body: bytes):
+    # Mismo camino que xmlrpc.client.Transport.parse_response
+    parser, unmarshaller = xmlrpc.client.getparser()
+    parser.feed(body)
+    parser.close()
+    return unmarshaller.close()[0]
+
+
+def decode_json(body: bytes):
+    return json.loads(body)['result']
+
+
+def decode_orjson(body: bytes):
+    return orjson.loads(body)['result']
+
+
+def bench(label, fn, body, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn(body)
+        best = min(best, time.perf_counter() - t0)
+
+    tracemalloc.start()
+    result = fn(body)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    print(f"{label:<10} {len(body) / 1024:9.0f} KiB {best * 1000:9.2f} ms {peak / 1024 / 1024:9.1f} MiB")
+    return best
+
+
+def main(argv):
+    repeat = int(argv[2]) if len(argv) > 2 else 5
+    xml_body, json_body, label = load_bodies(argv)
+
+    # Verificar que todos los decodificadores producen lo mismo
+    expected = decode_xmlrpc(xml_body)
+    decoders = [('xmlrpc', decode_xmlrpc, xml_body), ('json', decode_json, json_body)]
+    if orjson is not None:
+        decoders.append(('orjson', decode_orjson, json_body))
+    for name, fn, body in decoders[1:]:
+        if fn(body) != expected:
+            raise SystemExit(f"La salida de {name} difiere de xmlrpc")
+
+    print(f"{label} (mejor de {repeat})")
+    print(f"{'decoder':<10} {'payload':>13} {'tiempo':>12} {'pico mem':>13}")
+    times = {name: bench(name, fn, body, repeat) for name, fn, body in decoders}
+    for name in times:
+        if name != 'xmlrpc':
+            print(f"speedup {name} x{times['xmlrpc'] / times[name]:.1f}")
+    if orjson is None:
+        print("orjson no está instalado: pip install orjson")
+
+
+if __name__ == "__main__":
+    main(sys.argv)
@@ -0,0 +1,301 @@
+"""Circuit breaker por dependencia con timeouts adaptativos.
+
+Cada dependencia externa (Odoo, bridge WhatsApp) tiene su breaker:
+
+    closed     -> las llamadas pasan; se registran errores y latencias.
+    open       -> se falla de inmediato con CircuitOpenError (503) sin tocar
+                  la dependencia, durante `open_seconds`.
+    half_open  -> pasado ese tiempo se deja pasar una llamada de prueba; si
+                  sale bien se cierra, si falla vuelve a abrir.
+
+El breaker abre cuando, en la ventana de las últimas `window` llamadas (con
+al menos `min_calls`), la proporción de errores supera `error_rate` o la de
+llamadas lentas (> slow_call_seconds) supera `slow_rate`; también con
+`failure_threshold` errores consecutivos.
+
+El timeout de cada llamada se adapta al percentil observado por operación:
+clamp(pXX * multiplier, timeout_min, techo de la operación). Las operaciones
+cuyo costo crece con los datos (lecturas de reportes) pueden pasar un piso
+propio (`floor`): el percentil aprendido con sesiones chicas no debe cortar
+la lectura de una sesión grande ni contarla como fallo de la dependencia.
+
+Uso:
+    from clients.breaker import get_breaker
+    breaker = get_breaker("odoo", "ODOO", timeout_max=60.0)
+    with breaker.guard("pos.session:read", failures=(OSError,)) as call:
+        result = do_request(timeout=call.timeout)
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Deque, Dict, Iterator, Optional, Tuple, Type
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(RuntimeError):
+    """La dependencia está marcada como caída; se falla rápido."""
+
+    def __init__(self, name: str, retry_after: float):
+        self.name = name
+        self.retry_after = max(1, int(retry_after + 0.999))
+        super().__init__(f"Servicio '{name}' no disponible (circuit breaker abierto), reintentar en {self.retry_after}s")
+
+
+class _Call:
+    """Permiso de llamada devuelto por guard(): timeout a usar y marca de fallo."""
+
+    __slots__ = ("timeout", "failed")
+
+    def __init__(self, timeout: float):
+        self.timeout = timeout
+        self.failed = False
+
+    def fail(self) -> None:
+        """Marca la llamada como fallida sin lanzar excepción (ej: HTTP 5xx)."""
+        self.failed = True
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name) or default)
+    except ValueError:
+        return default
+
+
+class CircuitBreaker:
+    def __init__(
+        self,
+        name: str,
+        *,
+        failure_threshold: int = 5,
+        error_rate: float = 0.5,
+        slow_rate: float = 0.5,
+        slow_call_seconds: float = 10.0,
+        window: int = 20,
+        min_calls: int = 10,
+        open_seconds: float = 30.0,
+        timeout_min: float = 2.0,
+        timeout_max: float = 30.0,
+        timeout_multiplier: float = 3.0,
+        timeout_percentile: float = 0.99,
+        latency_samples: int = 200,
+        min_latency_samples: int = 20,
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.error_rate = error_rate
+        self.slow_rate = slow_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.window = window
+        self.min_calls = min_calls
+        self.open_seconds = open_seconds
+        self.timeout_min = timeout_min
+        self.timeout_max = timeout_max
+        self.timeout_multiplier = timeout_multiplier
+        self.timeout_percentile = timeout_percentile
+        self.latency_samples = latency_samples
+        self.min_latency_samples = min_latency_samples
+
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._consecutive_failures = 0
+        self._outcomes: Deque[Tuple[bool, bool]] = deque(maxlen=window)  # (ok, slow)
+        self._latencies: Dict[str, Deque[float]] = {}
+        self._totals = {"calls": 0, "failures": 0, "rejected": 0, "opened": 0}
+        self._last_error: Optional[str] = None
+
+    @classmethod
+    def from_env(cls, name: str, prefix: str, **defaults) -> "CircuitBreaker":
+        """Crea el breaker permitiendo overrides {PREFIX}_TIMEOUT_MIN/MAX,
+        {PREFIX}_SLOW_CALL_SECONDS, {PREFIX}_BREAKER_FAILURES y {PREFIX}_BREAKER_OPEN_SECONDS."""
+        overrides = {
+            "timeout_min": f"{prefix}_TIMEOUT_MIN",
+            "timeout_max": f"{prefix}_TIMEOUT_MAX",
+            "slow_call_seconds": f"{prefix}_SLOW_CALL_SECONDS",
+            "failure_threshold": f"{prefix}_BREAKER_FAILURES",
+            "open_seconds": f"{prefix}_BREAKER_OPEN_SECONDS",
+        }
+        params = dict(defaults)
+        for param, env_name in overrides.items():
+            if os.getenv(env_name):
+                value = _env_float(env_name, params.get(param, 0))
+                params[param] = int(value) if param == "failure_threshold" else value
+        return cls(name, **params)
+
+    # -- estado -----------------------------------------------------------
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state(time.monotonic())
+
+    def _current_state(self, now: float) -> str:
+        if self._state == OPEN and now - self._opened_at >= self.open_seconds:
+            self._state = HALF_OPEN
+            self._probe_in_flight = False
+        return self._state
+
+    def _open(self, now: float) -> None:
+        self._state = OPEN
+        self._opened_at = now
+        self._probe_in_flight = False
+        self._totals["opened"] += 1
+
+    def _close(self) -> None:
+        self._state = CLOSED
+        self._consecutive_failures = 0
+        self._outcomes.clear()
+
+    def reset(self) -> None:
+        with self._lock:
+            self._close()
+
+    # -- timeouts ---------------------------------------------------------
+
+    def timeout_for(self, op: str = "default", ceiling: Optional[float] = None,
+                    floor: Optional[float] = None) -> float:
+        """Timeout adaptativo para una operación según su percentil de latencia (nunca menor a `floor`)."""
+        upper = min(ceiling, self.timeout_max) if ceiling else self.timeout_max
+        with self._lock:
+            ordered = sorted(self._latencies.get(op) or ())
+        if len(ordered) < self.min_latency_samples:
+            return upper
+        idx = min(len(ordered) - 1, int(self.timeout_percentile * (len(ordered) - 1) + 0.5))
+        adaptive = ordered[idx] * self.timeout_multiplier
+        return max(self.timeout_min, min(upper, max(adaptive, floor or 0.0)))
+
+    # -- llamadas ---------------------------------------------------------
+
+    def acquire(self, op: str = "default", ceiling: Optional[float] = None, floor: Optional[float] = None) -> float:
+        """Pide permiso para llamar. Lanza CircuitOpenError si está abierto.
+
+        Devuelve el timeout (segundos) a usar en la llamada.
+        """
+        with self._lock:
+            now = time.monotonic()
+            state = self._current_state(now)
+            if state == OPEN:
+                self._totals["rejected"] += 1
+                raise CircuitOpenError(self.name, self.open_seconds - (now - self._opened_at))
+            if state == HALF_OPEN:
+                if self._probe_in_flight:
+                    self._totals["rejected"] += 1
+                    raise CircuitOpenError(self.name, 1)
+                self._probe_in_flight = True
+        return self.timeout_for(op, ceiling, floor)
+
+    def record(self, op: str, elapsed: float, ok: bool, error: Optional[BaseException] = None) -> None:
+        """Registra el resultado de una llamada autorizada por acquire()."""
+        slow = elapsed > self.slow_call_seconds
+        with self._lock:
+            now = time.monotonic()
+            self._totals["calls"] += 1
+            samples = self._latencies.get(op)
+            if samples is None:
+                samples = self._latencies[op] = deque(maxlen=self.latency_samples)
+            if ok:
+                samples.append(elapsed)
+            if not ok:
+                self._totals["failures"] += 1
+                self._last_error = f"{type(error).__name__}: {error}" if error else "error"
+            state = self._current_state(now)
+            if state == HALF_OPEN:
+                self._probe_in_flight = False
+                if ok and not slow:
+                    self._close()
+                else:
+                    self._open(now)
+                return
+            self._outcomes.append((ok, slow))
+            self._consecutive_failures = 0 if ok else self._consecutive_failures + 1
+            if state != CLOSED:
+                return
+            if self._consecutive_failures >= self.failure_threshold:
+                self._open(now)
+                return
+            total = len(self._outcomes)
+            if total >= self.min_calls:
+                errors = sum(1 for o, _ in self._outcomes if not o)
+                slows = sum(1 for _, s in self._outcomes if s)
+                if errors / total >= self.error_rate or slows / total >= self.slow_rate:
+                    self._open(now)
+
+    @contextmanager
+    def guard(
+        self,
+        op: str = "default",
+        ceiling: Optional[float] = None,
+        failures: Tuple[Type[BaseException], ...] = (Exception,),
+        floor: Optional[float] = None,
+    ) -> Iterator[_Call]:
+        """Context manager: acquire + medición + record.
+
+        Las excepciones de tipo `failures` cuentan como fallo de la dependencia;
+        cualquier otra (ej: error de negocio devuelto por Odoo) cuenta como
+        llamada exitosa y se propaga igual.
+        """
+        call = _Call(self.acquire(op, ceiling, floor))
+        start = time.perf_counter()
+        try:
+            yield call
+        except failures as e:
+            self.record(op, time.perf_counter() - start, False, e)
+            raise
+        except BaseException:
+            self.record(op, time.perf_counter() - start, True)
+            raise
+        else:
+            self.record(op, time.perf_counter() - start, not call.failed)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            now = time.monotonic()
+            state = self._current_state(now)
+            total = len(self._outcomes)
+            errors = sum(1 for o, _ in self._outcomes if not o)
+            data = {
+                "state": state,
+                "window_calls": total,
+                "window_error_rate": round(errors / total, 3) if total else 0.0,
+                "consecutive_failures": self._consecutive_failures,
+                "last_error": self._last_error,
+                **self._totals,
+            }
+            if state == OPEN:
+                data["retry_after"] = round(self.open_seconds - (now - self._opened_at), 1)
+            ops = list(self._latencies)
+        data["timeouts"] = {op: round(self.timeout_for(op), 2) for op in ops}
+        return data
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_registry_lock = threading.Lock()
+
+
+def get_breaker(name: str, env_prefix: Optional[str] = None, **defaults) -> CircuitBreaker:
+    """Breaker único por nombre (se crea la primera vez con los defaults dados)."""
+    breaker = _breakers.get(name)
+    if breaker is not None:
+        return breaker
+    with _registry_lock:
+        breaker = _breakers.get(name)
+        if breaker is None:
+            prefix = env_prefix or name.upper()
+            breaker = _breakers[name] = CircuitBreaker.from_env(name, prefix, **defaults)
+    return breaker
+
+
+def breakers_snapshot() -> Dict[str, dict]:
+    """Estado de todos los breakers registrados (para /health)."""
+    return {name: breaker.snapshot() for name, breaker in list(_breakers.items())}
+
+
+__all__ = ["CircuitBreaker", "CircuitOpenError", "get_breaker", "breakers_snapshot", "CLOSED", "OPEN", "HALF_OPEN"]
@@ -0,0 +1,498 @@
+"""Cliente mínimo para Odoo vía XML-RPC o JSON-RPC.
+
+Incluye:
+    authenticate() -> int (uid, cacheado por proceso)
+    execute_kw(model, method, args, kwargs) -> resultado de la llamada
+    OdooBatch -> declara varias llamadas independientes y las ejecuta juntas
+
+Las llamadas toman un ServerProxy de un pool (xmlrpc.client no es thread-safe;
+cada proxy conserva su conexión HTTP keep-alive) y lo devuelven al terminar.
+`warm_pool()` abre las conexiones por adelantado (TLS incluido) al arrancar.
+Todas las llamadas pasan por el circuit breaker "odoo": timeout adaptativo por
+operación y fallo rápido (CircuitOpenError) mientras Odoo esté caído.
+
+Transporte (ODOO_TRANSPORT):
+    xmlrpc  -> /xmlrpc/2/common y /xmlrpc/2/object (default)
+    jsonrpc -> /jsonrpc; la respuesta se decodifica con orjson si está instalado
+               (json estándar si no). Para respuestas grandes (miles de líneas de
+               órdenes o movimientos de stock) decodificar JSON cuesta una
+               fracción del unmarshalling XML-RPC en Python puro. Mismo
+               execute_kw y mismos errores (los errores de Odoo llegan como Fault).
+
+Variables de entorno requeridas:
+    ODOO_URL, ODOO_DB, ODOO_USERNAME, ODOO_PASSWORD
+Opcional:
+    ODOO_POOL_SIZE                       -> conexiones keep-alive conservadas (default 4)
+    ODOO_TIMEOUT_MIN / ODOO_TIMEOUT_MAX  -> límites del timeout adaptativo (default 5 / 60 s)
+    ODOO_READ_TIMEOUT_MIN                -> piso del timeout para lecturas de datos (search_read, read,
+                                            read_group, multicall), cuyo costo crece con la sesión
+                                            (default 15; 0 = sin piso)
+    ODOO_SLOW_CALL_SECONDS               -> latencia considerada lenta para el breaker (default 20)
+    ODOO_BREAKER_FAILURES                -> errores consecutivos que abren el breaker (default 5)
+    ODOO_BREAKER_OPEN_SECONDS            -> segundos en abierto antes de probar (default 30)
+    ODOO_DEBUG_PAYLOAD                   -> 1 para loguear (nivel INFO) bytes de respuesta y ms por llamada;
+                                            con LOG_LEVEL=DEBUG se loguean igual a nivel DEBUG
+    ODOO_MULTICALL                       -> auto | on | off: usar system.multicall para lotes (default auto)
+    ODOO_BATCH_CONCURRENCY               -> llamadas en paralelo por lote sin multicall (default 6)
+    ODOO_TRANSPORT                       -> xmlrpc | jsonrpc (default xmlrpc)
+
+Errores:
+    RuntimeError si faltan variables o falla la autenticación
+    CircuitOpenError si el breaker está abierto
+    xmlrpc.client.Fault para errores devueltos por Odoo
+"""
+
+import contextvars
+import http.client
+import itertools
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import urllib.parse
+import xmlrpc.client
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from clients.breaker import CircuitBreaker, get_breaker
+from services import logs
+
+try:
+    import orjson  # type: ignore
+
+    _json_loads = orjson.loads
+    _json_dumps = orjson.dumps
+except ImportError:  # pragma: no cover - orjson es opcional
+    _json_loads = json.loads
+
+    def _json_dumps(obj) -> bytes:
+        return json.dumps(obj, separators=(",", ":")).encode("utf-8")
+
+_ODOO_ENV_LOADED = False
+url = db = username = password = None
+transport_name = "xmlrpc"
+uid: Optional[int] = None
+
+_auth_lock = threading.Lock()
+_pool: "queue.LifoQueue[Tuple[xmlrpc.client.ServerProxy, Any]]" = queue.LifoQueue()
+
+# Errores de transporte que cuentan como caída de Odoo (un Fault es un error de negocio)
+_FAILURES = (OSError, http.client.HTTPException, xmlrpc.client.ProtocolError)
+
+logger = logging.getLogger(__name__)
+
+DEBUG_PAYLOAD = os.getenv("ODOO_DEBUG_PAYLOAD", "0") in {"1", "true", "True", "yes", "on"}
+
+# Bytes de respuesta acumulados por "modelo:método" (calls, bytes, max_bytes)
+_payload_stats: Dict[str, Dict[str, int]] = {}
+_stats_lock = threading.Lock()
+
+
+def _load_env_once():
+    global _ODOO_ENV_LOADED, url, db, username, password, transport_name
+    if _ODOO_ENV_LOADED:
+        return
+    try:
+        from dotenv import load_dotenv, find_dotenv  # type: ignore
+        env_path = find_dotenv(usecwd=True)
+        if env_path:
+            load_dotenv(env_path)
+    except Exception:
+        # Continuar aun si no está instalado
+        pass
+    url = os.getenv('ODOO_URL')
+    db = os.getenv('ODOO_DB')
+    username = os.getenv('ODOO_USERNAME')
+    password = os.getenv('ODOO_PASSWORD')
+    transport_name = (os.getenv('ODOO_TRANSPORT') or 'xmlrpc').lower()
+    if transport_name not in ('xmlrpc', 'jsonrpc'):
+        raise RuntimeError(f"ODOO_TRANSPORT inválido: {transport_name} (use xmlrpc o jsonrpc)")
+    missing = [name for name, val in [('ODOO_URL', url), ('ODOO_DB', db), ('ODOO_USERNAME', username), ('ODOO_PASSWORD', password)] if not val]
+    if missing:
+        raise RuntimeError(f"Faltan variables de entorno requeridas: {', '.join(missing)}")
+    _ODOO_ENV_LOADED = True
+
+
+def get_odoo_breaker() -> CircuitBreaker:
+    return get_breaker("odoo", "ODOO", timeout_min=5.0, timeout_max=60.0, slow_call_seconds=20.0)
+
+
+class _CountingReader:
+    """Envuelve la respuesta HTTP contando los bytes leídos por el parser."""
+
+    def __init__(self, response):
+        self._response = response
+        self.count = 0
+
+    def read(self, *args):
+        data = self._response.read(*args)
+        self.count += len(data)
+        return data
+
+    def __getattr__(self, name):
+        return getattr(self._response, name)
+
+
+class _TimeoutMixin:
+    """Aplica `self.timeout` al socket de la conexión HTTP reutilizada y
+    registra el tamaño (bytes en el cable) de la última respuesta."""
+
+    timeout: float = 60.0
+    last_response_bytes: int = 0
+
+    def make_connection(self, host):
+        conn = super().make_connection(host)
+        conn.timeout = self.timeout
+        if conn.sock is not None:
+            conn.sock.settimeout(self.timeout)
+        return conn
+
+    def parse_response(self, response):
+        reader = _CountingReader(response)
+        try:
+            return super().parse_response(reader)
+        finally:
+            self.last_response_bytes = reader.count
+
+
+class TimeoutTransport(_TimeoutMixin, xmlrpc.client.Transport):
+    pass
+
+
+class TimeoutSafeTransport(_TimeoutMixin, xmlrpc.client.SafeTransport):
+    pass
+
+
+class JsonRpcClient:
+    """Cliente de /jsonrpc con la interfaz que usa este módulo de ServerProxy.
+
+    Mantiene una conexión HTTP keep-alive (no es thread-safe: se usa desde el
+    pool igual que los ServerProxy). Hace de proxy y de transporte a la vez:
+    expone `timeout` y `last_response_bytes` como TimeoutTransport.
+    """
+
+    timeout: float = 60.0
+    last_response_bytes: int = 0
+
+    def __init__(self, base_url: str):
+        parts = urllib.parse.urlsplit(base_url)
+        self._https = parts.scheme == "https"
+        self._host = parts.netloc
+        self._path = parts.path.rstrip("/") + "/jsonrpc"
+        self._conn: Optional[http.client.HTTPConnection] = None
+        self._ids = itertools.count(1)
+
+    def _connection(self) -> Tuple[http.client.HTTPConnection, bool]:
+        if self._conn is None:
+            cls = http.client.HTTPSConnection if self._https else http.client.HTTPConnection
+            self._conn = cls(self._host, timeout=self.timeout)
+            return self._conn, False
+        self._conn.timeout = self.timeout
+        if self._conn.sock is not None:
+            self._conn.sock.settimeout(self.timeout)
+        return self._conn, True
+
+    def _post(self, body: bytes) -> Tuple[int, str, bytes]:
+        headers = {"Content-Type": "application/json", "Accept": "application/json"}
+        # Un reintento si el servidor cerró la conexión keep-alive reutilizada
+        for attempt in (0, 1):
+            conn, reused = self._connection()
+            try:
+                conn.request("POST", self._path, body, headers)
+                response = conn.getresponse()
+                return response.status, response.reason, response.read()
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                self.close()
+                if attempt or not reused:
+                    raise
+            except Exception:
+                self.close()
+                raise
+        raise AssertionError("unreachable")
+
+    def call(self, service: str, method: str, *args) -> Any:
+        body = _json_dumps({
+            "jsonrpc": "2.0",
+            "method": "call",
+            "params": {"service": service, "method": method, "args": list(args)},
+            "id": next(self._ids),
+        })
+        status, reason, data = self._post(body)
+        self.last_response_bytes = len(data)
+        if status != 200:
+            raise xmlrpc.client.ProtocolError(self._host + self._path, status, reason, {})
+        payload = _json_loads(data)
+        error = payload.get("error")
+        if error:
+            detail = error.get("data") or {}
+            raise xmlrpc.client.Fault(error.get("code", 1), detail.get("message") or error.get("message", ""))
+        return payload.get("result")
+
+    def authenticate(self, *args) -> Any:
+        return self.call("common", "authenticate", *args)
+
+    def execute_kw(self, *args) -> Any:
+        return self.call("object", "execute_kw", *args)
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+def _new_proxy(service: str):
+    """(proxy, transporte) para el servicio `common` u `object` según ODOO_TRANSPORT."""
+    if transport_name == "jsonrpc":
+        client = JsonRpcClient(url)
+        return client, client
+    endpoint = f"{url}/xmlrpc/2/{service}"
+    transport = TimeoutSafeTransport() if endpoint.startswith("https") else TimeoutTransport()
+    return xmlrpc.client.ServerProxy(endpoint, transport=transport, allow_none=True), transport
+
+
+def _pool_size() -> int:
+    try:
+        return max(1, int(os.getenv("ODOO_POOL_SIZE") or 4))
+    except ValueError:
+        return 4
+
+
+@contextmanager
+def _object_proxy() -> Iterator[Tuple[xmlrpc.client.ServerProxy, Any]]:
+    """Presta un proxy del servicio `object` del pool.
+
+    Si la llamada falla por transporte el proxy se descarta (conexión rota);
+    si el pool ya tiene `ODOO_POOL_SIZE` proxies libres también se descarta.
+    """
+    try:
+        item = _pool.get_nowait()
+    except queue.Empty:
+        item = _new_proxy("object")
+    broken = False
+    try:
+        yield item
+    except _FAILURES:
+        broken = True
+        raise
+    finally:
+        if not broken and _pool.qsize() < _pool_size():
+            _pool.put(item)
+        else:
+            item[1].close()
+
+
+def authenticate(force: bool = False) -> int:
+    """Autentica contra el servicio `common` y cachea el uid. Devuelve el uid."""
+    global uid
+    _load_env_once()
+    if uid and not force:
+        return uid
+    with _auth_lock:
+        if uid and not force:
+            return uid
+        breaker = get_odoo_breaker()
+        try:
+            with breaker.guard("common:authenticate", failures=_FAILURES) as call:
+                common, transport = _new_proxy("common")
+                transport.timeout = call.timeout
+                _uid = common.authenticate(db, username, password, {})
+        except Exception as e:
+            raise RuntimeError(f"No se pudo inicializar conexión a Odoo: {e}") from e
+        if not _uid:
+            raise RuntimeError("Autenticación Odoo fallida: credenciales inválidas")
+        uid = _uid
+        return uid
+
+
+# Métodos cuyo costo depende del tamaño de la sesión: el timeout aprendido con
+# sesiones chicas no aplica a las grandes (ver ODOO_READ_TIMEOUT_MIN)
+_DATA_METHODS = frozenset({"search_read", "read", "read_group"})
+# Piso por defecto: holgura para sesiones grandes sin renunciar al timeout
+# adaptativo (con Odoo degradado un hilo no queda retenido ODOO_TIMEOUT_MAX)
+_READ_TIMEOUT_FLOOR = 15.0
+
+
+def _read_timeout_floor() -> float:
+    try:
+        return max(0.0, float(os.getenv("ODOO_READ_TIMEOUT_MIN") or _READ_TIMEOUT_FLOOR))
+    except ValueError:
+        return _READ_TIMEOUT_FLOOR
+
+
+def execute_kw(model: str, method: str, args: list, kwargs: Optional[dict] = None) -> Any:
+    """Ejecuta `method` sobre `model` (equivalente a models.execute_kw)."""
+    _uid = authenticate()
+    op = f"{model}:{method}"
+    breaker = get_odoo_breaker()
+    floor = _read_timeout_floor() if method in _DATA_METHODS else None
+    with breaker.guard(op, failures=_FAILURES, floor=floor) as call:
+        with _object_proxy() as (proxy, transport):
+            transport.timeout = call.timeout
+            started = time.perf_counter()
+            if kwargs:
+                result = proxy.execute_kw(db, _uid, password, model, method, args, kwargs)
+            else:
+                result = proxy.execute_kw(db, _uid, password, model, method, args)
+            _record_payload(op, transport.last_response_bytes, time.perf_counter() - started)
+            return result
+
+
+def _record_payload(op: str, size: int, elapsed: float) -> None:
+    with _stats_lock:
+        stats = _payload_stats.setdefault(op, {"calls": 0, "bytes": 0, "max_bytes": 0})
+        stats["calls"] += 1
+        stats["bytes"] += size
+        stats["max_bytes"] = max(stats["max_bytes"], size)
+    # Resumen del request en curso (no-op fuera de un request)
+    logs.count("odoo_calls")
+    logs.count("odoo_bytes", size)
+    logs.add_ms("odoo_ms", elapsed)
+    logger.log(logging.INFO if DEBUG_PAYLOAD else logging.DEBUG, "%s %d bytes %.1f ms", op, size, elapsed * 1000,
+               extra={"op": op, "bytes": size})
+
+
+def payload_stats() -> Dict[str, Dict[str, int]]:
+    """Bytes de respuesta acumulados por operación desde el arranque."""
+    with _stats_lock:
+        return {op: dict(stats) for op, stats in _payload_stats.items()}
+
+
+def _batch_concurrency() -> int:
+    try:
+        return max(1, int(os.getenv("ODOO_BATCH_CONCURRENCY") or 6))
+    except ValueError:
+        return 6
+
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+# None = aún no se sabe si el servidor soporta system.multicall
+_multicall_supported: Optional[bool] = None
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=_batch_concurrency(), thread_name_prefix="odoo-batch")
+    return _executor
+
+
+def _multicall_mode() -> str:
+    mode = (os.getenv("ODOO_MULTICALL") or "auto").lower()
+    return mode if mode in ("auto", "on", "off") else "auto"
+
+
+class OdooBatch:
+    """Lote de llamadas execute_kw independientes entre sí.
+
+    El código de reportes declara lo que necesita y recibe todos los
+    resultados juntos, en el mismo orden:
+
+        batch = OdooBatch()
+        orders = batch.add('pos.order', 'search_read', [domain], {'fields': [...]})
+        lines = batch.add('pos.order.line', 'search_read', [domain2], {'fields': [...]})
+        results = batch.execute()
+        results[orders], results[lines]
+
+    Con system.multicall (si el servidor lo soporta) todo viaja en un único
+    request HTTP; si no, las llamadas salen en paralelo por el pool de
+    conexiones, así el lote cuesta un round trip de reloj en vez de N.
+    Cadenas dependientes = un OdooBatch por nivel.
+    """
+
+    def __init__(self):
+        self._calls: List[Tuple[str, str, list, Optional[dict]]] = []
+
+    def add(self, model: str, method: str, args: list, kwargs: Optional[dict] = None) -> int:
+        """Agrega una llamada; devuelve el índice de su resultado."""
+        self._calls.append((model, method, args, kwargs))
+        return len(self._calls) - 1
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    def execute(self) -> List[Any]:
+        """Ejecuta el lote. Propaga la primera excepción (Fault, CircuitOpenError, ...)."""
+        global _multicall_supported
+        if not self._calls:
+            return []
+        if len(self._calls) == 1:
+            return [execute_kw(*self._calls[0])]
+        _load_env_once()
+        mode = _multicall_mode()
+        if transport_name == "jsonrpc":
+            # /jsonrpc no tiene equivalente a system.multicall
+            mode = "off"
+        if mode == "on" or (mode == "auto" and _multicall_supported is not False):
+            try:
+                raw = self._execute_multicall()
+            except xmlrpc.client.Fault:
+                if mode == "on" or _multicall_supported:
+                    raise
+                # El servidor no expone system.multicall: recordar y usar paralelo
+                _multicall_supported = False
+            else:
+                _multicall_supported = True
+                return self._unpack_multicall(raw)
+        return self._execute_parallel()
+
+    def _execute_parallel(self) -> List[Any]:
+        # Cada llamada corre con el contexto del request (sus métricas van al mismo resumen)
+        futures = [_get_executor().submit(contextvars.copy_context().run, execute_kw, *call) for call in self._calls]
+        return [future.result() for future in futures]
+
+    def _execute_multicall(self) -> list:
+        _uid = authenticate()
+        payload = []
+        for model, method, args, kwargs in self._calls:
+            params = [db, _uid, password, model, method, args]
+            if kwargs:
+                params.append(kwargs)
+            payload.append({"methodName": "execute_kw", "params": params})
+        breaker = get_odoo_breaker()
+        with breaker.guard("system.multicall", failures=_FAILURES, floor=_read_timeout_floor()) as call:
+            with _object_proxy() as (proxy, transport):
+                transport.timeout = call.timeout
+                started = time.perf_counter()
+                raw = proxy.system.multicall(payload)
+                _record_payload("system.multicall", transport.last_response_bytes, time.perf_counter() - started)
+        return raw
+
+    @staticmethod
+    def _unpack_multicall(raw: list) -> List[Any]:
+        # Cada elemento es [resultado] o {"faultCode", "faultString"} si esa llamada falló
+        results = []
+        for item in raw:
+            if isinstance(item, dict) and "faultCode" in item:
+                raise xmlrpc.client.Fault(item["faultCode"], item["faultString"])
+            results.append(item[0])
+        return results
+
+
+def warm_pool(size: Optional[int] = None) -> int:
+    """Abre `size` conexiones (default ODOO_POOL_SIZE) haciendo una llamada mínima
+    con cada una, para que el primer request no pague TCP + TLS. Devuelve cuántas
+    quedaron abiertas."""
+    _uid = authenticate()
+    size = size or _pool_size()
+    items = []
+    try:
+        for _ in range(size):
+            proxy, transport = _new_proxy("object")
+            with get_odoo_breaker().guard("res.users:search_count", failures=_FAILURES) as call:
+                transport.timeout = call.timeout
+                proxy.execute_kw(db, _uid, password, 'res.users', 'search_count', [[['id', '=', _uid]]])
+            items.append((proxy, transport))
+    finally:
+        for item in items:
+            if _pool.qsize() < _pool_size():
+                _pool.put(item)
+    return len(items)
+
+
+__all__ = ["authenticate", "execute_kw", "OdooBatch", "JsonRpcClient", "warm_pool", "payload_stats", "get_odoo_breaker"]
@@ -2,8 +2,13 @@
 
 Incluye:
         send_message(number, text) -> str (devuelve key.id)
+        get_connection_state() -> str (estado de la instancia: open, close, ...)
+        find_messages(remote_jid, message_id=None, limit=None) -> list (página reciente)
         validate_message(remote_jid) -> str (devuelve key.id del último mensaje)
+        message_exists(remote_jid, message_id) -> bool
         send_and_validate(remote_jid, message) -> str (mensaje de estado)
+        ConfirmationCoordinator -> confirmación agrupada por chat de los envíos pendientes
+        get_instances() / instances_snapshot() -> instancias del bridge y su carga
 
 Uso:
     from clients.whatsapp import send_message
@@ -11,32 +16,232 @@ Uso:
     print(message_id)
 
 Variables de entorno requeridas:
-    WHATSAPP_APIKEY (o WHATSAPP_API_KEY) -> apikey (obligatoria)
+    WHATSAPP_APIKEY (o WHATSAPP_API_KEY) -> apikey (obligatoria salvo que cada instancia traiga la suya)
     WHATSAPP_INSTANCE                   -> nombre de instancia (ej: daniela)
 Opcional:
+    WHATSAPP_INSTANCES                  -> varias instancias: "nombre[:apikey][@base_url],..."; reemplaza
+                                           a WHATSAPP_INSTANCE (apikey/base por defecto: las globales)
     WHATSAPP_URL (o WHATSAPP_API_BASE)  -> base URL (default https://wpp-api.chinatownlogistic.com)
+    NUMBER_CACHE_TTL                    -> segundos que se cachea check_number_exists (default 3600, 0 desactiva)
+    NUMBER_CACHE_NEGATIVE_TTL           -> idem para números inexistentes (default 300)
+    WHATSAPP_TIMEOUT_MIN / _MAX         -> límites del timeout adaptativo (default 2 / 20 s)
+    WHATSAPP_SLOW_CALL_SECONDS          -> latencia considerada lenta para el breaker (default 8)
+    WHATSAPP_BREAKER_FAILURES           -> errores consecutivos que abren el breaker (default 5)
+    WHATSAPP_BREAKER_OPEN_SECONDS       -> segundos en abierto antes de probar (default 30)
+    WHATSAPP_FIND_PAGE_SIZE             -> registros por consulta a findMessages (default 10)
+    WHATSAPP_CONFIRM_INTERVAL           -> segundos entre consultas de confirmación por chat (default 1.5)
+    MEDIA_PUBLIC_URL                    -> si está definida los PDFs se envían por URL (services.media_store)
+
+Instancias múltiples:
+    Cada chat (JID) se asigna a una instancia por hashing consistente, así
+    todos sus mensajes salen del mismo dispositivo y agregar o quitar una
+    instancia solo mueve ~1/N de los chats. Cada instancia tiene su propio
+    circuit breaker ("whatsapp:<nombre>"); si la instancia del chat está caída
+    (breaker abierto, error de conexión o 5xx) el envío pasa a la siguiente del
+    anillo. Solo se reintenta en otra instancia cuando el mensaje no pudo salir
+    (no tras un timeout de lectura) para no duplicar envíos. La confirmación
+    consulta la instancia que realmente envió el mensaje.
 
 Errores:
     ValueError si faltan datos
     httpx.HTTPStatusError si la API responde != 2xx
     RuntimeError si la respuesta no contiene key.id
+    CircuitOpenError (clients.breaker) si el bridge está marcado como caído
 """
 
+import base64
+import bisect
+import hashlib
+import logging
 import os
+import pathlib
+import threading
 import time
+from collections import OrderedDict
 import httpx
-from typing import Optional, Tuple
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from clients.breaker import OPEN, CircuitBreaker, CircuitOpenError, get_breaker
+from services.cache import get_cache
+from services import ledger, logs, media_store
+
+logger = logging.getLogger(__name__)
+
+_NUMBERS_NS = "numbers"
+_MISSING = object()
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name) or default)
+    except ValueError:
+        return default
 
-def _get_config() -> Tuple[str, str, str]:
-    """Obtiene (api_key, instance, base_url) validando presencia requerida."""
+_DEFAULT_BASE = "https://wpp-api.chinatownlogistic.com"
+_VNODES = 64  # puntos por instancia en el anillo de hashing
+
+class BridgeInstance(NamedTuple):
+    name: str
+    api_key: str
+    base: str
+
+_instances_cache: Tuple[tuple, List[BridgeInstance]] = ((), [])
+_ring_cache: Tuple[tuple, List[int], List[str]] = ((), [], [])
+
+def get_instances() -> List[BridgeInstance]:
+    """Instancias configuradas (WHATSAPP_INSTANCES o WHATSAPP_INSTANCE), validando presencia requerida."""
+    global _instances_cache
     api_key = os.getenv("WHATSAPP_APIKEY") or os.getenv("WHATSAPP_API_KEY")
-    instance = os.getenv("WHATSAPP_INSTANCE")
-    base = os.getenv("WHATSAPP_URL") or os.getenv("WHATSAPP_API_BASE") or "https://wpp-api.chinatownlogistic.com"
-    if not api_key:
-        raise ValueError("Falta WHATSAPP_APIKEY / WHATSAPP_API_KEY en entorno")
-    if not instance:
-        raise ValueError("Falta WHATSAPP_INSTANCE en entorno")
-    return api_key, instance, base.rstrip('/')
+    base = (os.getenv("WHATSAPP_URL") or os.getenv("WHATSAPP_API_BASE") or _DEFAULT_BASE).rstrip('/')
+    raw = os.getenv("WHATSAPP_INSTANCES") or os.getenv("WHATSAPP_INSTANCE")
+    env_key = (api_key, base, raw)
+    if _instances_cache[0] == env_key:
+        return _instances_cache[1]
+    if not raw:
+        raise ValueError("Falta WHATSAPP_INSTANCE (o WHATSAPP_INSTANCES) en entorno")
+    instances = []
+    for item in raw.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        spec, _, item_base = item.partition("@")
+        name, _, item_key = spec.partition(":")
+        if not (item_key or api_key):
+            raise ValueError(f"Falta WHATSAPP_APIKEY / WHATSAPP_API_KEY en entorno (instancia {name})")
+        instances.append(BridgeInstance(name.strip(), (item_key or api_key).strip(), (item_base or base).strip().rstrip('/')))
+    if not instances:
+        raise ValueError("WHATSAPP_INSTANCES no contiene instancias")
+    if len({i.name for i in instances}) != len(instances):
+        raise ValueError("WHATSAPP_INSTANCES tiene nombres repetidos")
+    _instances_cache = (env_key, instances)
+    return instances
+
+def _get_instance(name: str) -> BridgeInstance:
+    for instance in get_instances():
+        if instance.name == name:
+            return instance
+    raise ValueError(f"Instancia WhatsApp no configurada: {name}")
+
+def _hash(value: str) -> int:
+    return int.from_bytes(hashlib.md5(value.encode("utf-8")).digest()[:8], "big")
+
+def instances_for(key: str) -> List[BridgeInstance]:
+    """Instancias en orden de preferencia para `key` (JID o número): la primera es la asignada."""
+    global _ring_cache
+    instances = get_instances()
+    if len(instances) == 1:
+        return list(instances)
+    names = tuple(i.name for i in instances)
+    if _ring_cache[0] != names:
+        points = sorted((_hash(f"{name}#{v}"), name) for name in names for v in range(_VNODES))
+        _ring_cache = (names, [p[0] for p in points], [p[1] for p in points])
+    _, hashes, owners = _ring_cache
+    by_name = {i.name: i for i in instances}
+    ordered: List[BridgeInstance] = []
+    start = bisect.bisect(hashes, _hash(key))
+    for offset in range(len(owners)):
+        name = owners[(start + offset) % len(owners)]
+        if by_name[name] not in ordered:
+            ordered.append(by_name[name])
+            if len(ordered) == len(instances):
+                break
+    return ordered
+
+_client: Optional[httpx.Client] = None
+_client_lock = threading.Lock()
+
+def get_client() -> httpx.Client:
+    """Cliente HTTP compartido (pool keep-alive): evita un handshake TLS por request."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = httpx.Client(limits=httpx.Limits(max_connections=50, max_keepalive_connections=10))
+    return _client
+
+def close_client() -> None:
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+            _client = None
+
+def get_whatsapp_breaker(instance: Optional[str] = None) -> CircuitBreaker:
+    """Breaker del bridge; con varias instancias cada una tiene el suyo ("whatsapp:<nombre>")."""
+    name = "whatsapp" if instance is None or len(get_instances()) == 1 else f"whatsapp:{instance}"
+    return get_breaker(name, "WHATSAPP", timeout_min=2.0, timeout_max=20.0, slow_call_seconds=8.0)
+
+def _request(method: str, url: str, headers: dict, *, op: str, max_timeout: float, payload: Optional[dict] = None,
+             breaker: Optional[CircuitBreaker] = None) -> httpx.Response:
+    """Request al bridge pasando por el circuit breaker (timeout adaptativo por operación).
+
+    Errores de red y respuestas 5xx cuentan como fallo del bridge; 4xx no.
+    """
+    with (breaker or get_whatsapp_breaker()).guard(op, max_timeout, failures=(httpx.TransportError,)) as call:
+        resp = get_client().request(method, url, json=payload, headers=headers, timeout=call.timeout)
+        if resp.status_code >= 500:
+            call.fail()
+        return resp
+
+def _post(url: str, payload: dict, headers: dict, *, op: str, max_timeout: float,
+          breaker: Optional[CircuitBreaker] = None) -> httpx.Response:
+    return _request("POST", url, headers, op=op, max_timeout=max_timeout, payload=payload, breaker=breaker)
+
+# Carga por instancia (este worker)
+_stats: Dict[str, Dict[str, int]] = {}
+_stats_lock = threading.Lock()
+
+def _count(instance: str, field: str, delta: int = 1) -> None:
+    with _stats_lock:
+        stats = _stats.setdefault(instance, {"requests": 0, "inflight": 0, "errors": 0, "failovers": 0, "sent": 0})
+        stats[field] += delta
+
+# Errores tras los que el mensaje seguro no salió: se puede probar otra instancia
+_NOT_SENT_ERRORS = (CircuitOpenError, httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+def _call_bridge(key: str, build: Callable[[BridgeInstance], Tuple[str, dict]], *, op: str, max_timeout: float,
+                 idempotent: bool = False, instance: Optional[str] = None) -> Tuple[BridgeInstance, httpx.Response]:
+    """POST a la instancia asignada a `key` con failover a las siguientes del anillo.
+
+    `build(instance)` devuelve (url, payload). Con `instance` se usa solo esa.
+    Las operaciones no idempotentes (envíos) solo pasan a otra instancia si el
+    error garantiza que el request no llegó al bridge; un 5xx de la instancia
+    asignada se devuelve tal cual (el mensaje pudo haberse entregado).
+    """
+    candidates = [_get_instance(instance)] if instance else instances_for(key)
+    retry_on = (CircuitOpenError, httpx.TransportError) if idempotent else _NOT_SENT_ERRORS
+    last_error: Optional[BaseException] = None
+    for position, candidate in enumerate(candidates):
+        is_last = position == len(candidates) - 1
+        breaker = get_whatsapp_breaker(candidate.name)
+        if not is_last and breaker.state == OPEN:
+            _count(candidate.name, "failovers")
+            continue
+        url, payload = build(candidate)
+        headers = {"Content-Type": "application/json", "apikey": candidate.api_key}
+        _count(candidate.name, "requests")
+        _count(candidate.name, "inflight")
+        try:
+            resp = _post(url, payload, headers, op=op, max_timeout=max_timeout, breaker=breaker)
+        except retry_on as e:
+            _count(candidate.name, "errors")
+            if is_last:
+                raise
+            _count(candidate.name, "failovers")
+            last_error = e
+            continue
+        except Exception:
+            _count(candidate.name, "errors")
+            raise
+        finally:
+            _count(candidate.name, "inflight", -1)
+        if resp.status_code >= 500:
+            _count(candidate.name, "errors")
+            # Un 5xx llegó al bridge: un envío pudo haber salido, no se repite en otra instancia
+            if idempotent and not is_last:
+                _count(candidate.name, "failovers")
+                continue
+        return candidate, resp
+    raise last_error or RuntimeError("Sin instancias WhatsApp disponibles")
 
 def check_number_exists(full_number: str) -> Optional[dict]:
     """Consulta si un número existe en WhatsApp usando la API oficial.
@@ -48,6 +253,10 @@ def check_number_exists(full_number: str) -> Optional[dict]:
         Dict con los datos retornados por la API (jid, exists, number, name, etc)
         o None si la lista viene vacía.
 
+    El resultado se guarda en el cache compartido (namespace "numbers"), así
+    que las consultas repetidas no vuelven a llamar a la API aunque lleguen a
+    otro worker.
+
     Raises:
         ValueError: Si no se proporcionó el número.
         RuntimeError: Si la API responde con error o formato inesperado.
@@ -55,12 +264,16 @@ def check_number_exists(full_number: str) -> Optional[dict]:
     if not full_number:
         raise ValueError("'full_number' es requerido")
 
-    api_key, instance, base = _get_config()
-    url = f"{base}/chat/whatsappNumbers/{instance}"
-    payload = {"numbers": [full_number]}
-    headers = {"Content-Type": "application/json", "apikey": api_key}
+    cache = get_cache()
+    cached = cache.get(_NUMBERS_NS, full_number, _MISSING)
+    if cached is not _MISSING:
+        return cached
 
-    resp = httpx.post(url, json=payload, headers=headers, timeout=10.0)
+    _, resp = _call_bridge(
+        full_number,
+        lambda inst: (f"{inst.base}/chat/whatsappNumbers/{inst.name}", {"numbers": [full_number]}),
+        op="whatsappNumbers", max_timeout=10.0, idempotent=True,
+    )
     if resp.status_code >= 400:
         detail = None
         try:
@@ -72,11 +285,71 @@ def check_number_exists(full_number: str) -> Optional[dict]:
     data = resp.json()
     if not isinstance(data, list):
         raise RuntimeError(f"Formato inesperado en respuesta: {data}")
-    if not data:
-        return None
-    return data[0]
+    result = data[0] if data else None
+    if result and result.get("exists"):
+        ttl = _env_float("NUMBER_CACHE_TTL", 3600)
+    else:
+        ttl = _env_float("NUMBER_CACHE_NEGATIVE_TTL", 300)
+    if ttl > 0:
+        cache.set(_NUMBERS_NS, full_number, result, ttl=ttl)
+    return result
+
+def get_connection_state(instance: Optional[str] = None) -> str:
+    """Estado de conexión de la instancia en el bridge (ej: "open", "connecting", "close").
+
+    GET /instance/connectionState/{instance} (default: la primera instancia).
+    Lanza RuntimeError si la API responde con error o un formato inesperado.
+    """
+    inst = _get_instance(instance) if instance else get_instances()[0]
+    url = f"{inst.base}/instance/connectionState/{inst.name}"
+    resp = _request("GET", url, {"apikey": inst.api_key}, op="connectionState", max_timeout=5.0,
+                    breaker=get_whatsapp_breaker(inst.name))
+    if resp.status_code >= 400:
+        raise RuntimeError(f"Error HTTP {resp.status_code} consultando estado de instancia: {resp.text}")
+    data = resp.json()
+    state = (data.get("instance") or {}).get("state") if isinstance(data, dict) else None
+    if not state:
+        raise RuntimeError(f"Formato inesperado en respuesta: {data}")
+    return state
+
+def connection_states() -> Dict[str, str]:
+    """Estado de cada instancia configurada ("error: ..." si no se pudo consultar)."""
+    states = {}
+    for inst in get_instances():
+        try:
+            states[inst.name] = get_connection_state(inst.name)
+        except Exception as e:  # noqa: BLE001
+            states[inst.name] = f"error: {e}"
+    return states
 
-def send_message(number: str, text: Optional[str], *, file_path: Optional[str] = None, file_name: Optional[str] = None, caption: Optional[str] = None, media_type: str = "document", debug: bool = False, auto_caption: bool = True) -> str:
+def instances_snapshot() -> Dict[str, dict]:
+    """Carga por instancia en este worker (requests, en curso, errores, failovers, enviados)."""
+    snapshot = {}
+    for inst in get_instances():
+        with _stats_lock:
+            stats = dict(_stats.get(inst.name) or {"requests": 0, "inflight": 0, "errors": 0, "failovers": 0, "sent": 0})
+        stats["base"] = inst.base
+        stats["breaker"] = get_whatsapp_breaker(inst.name).state
+        stats["pending_confirmations"] = _coordinator.pending_count(inst.name) if _coordinator else 0
+        snapshot[inst.name] = stats
+    return snapshot
+
+# key.id -> instancia que lo envió (para confirmar en la misma instancia)
+_sent_via: "OrderedDict[str, str]" = OrderedDict()
+_SENT_VIA_MAX = 10000
+
+def _remember_sender(message_id: str, instance: str) -> None:
+    with _stats_lock:
+        _sent_via[message_id] = instance
+        while len(_sent_via) > _SENT_VIA_MAX:
+            _sent_via.popitem(last=False)
+
+def sent_via(message_id: str) -> Optional[str]:
+    """Instancia que envió `message_id` (None si no fue enviado por este worker o ya se olvidó)."""
+    with _stats_lock:
+        return _sent_via.get(message_id)
+
+def send_message(number: str, text: Optional[str], *, file_path: Optional[str] = None, file_name: Optional[str] = None, caption: Optional[str] = None, media_type: str = "document", debug: bool = False, auto_caption: bool = True, media_url: Optional[str] = None, alias: Optional[str] = None, pos_name: Optional[str] = None) -> str:
     """Envía un mensaje de texto o un documento PDF.
 
     Modos:
@@ -84,8 +357,11 @@ def send_message(number: str, text: Optional[str], *, file_path: Optional[str] =
       - Media (PDF): POST /message/sendMedia/{instance} con payload plano
           {
             "number": ..., "mediatype": "document", "fileName": "archivo.pdf",
-            "caption": "...", "media": "<base64>"
+            "caption": "...", "media": "<base64 o URL>"
           }
+        Con MEDIA_PUBLIC_URL definida el PDF se registra en services.media_store
+        y "media" lleva la URL de descarga (GET /media/{token}) en lugar del
+        base64: el bridge lo descarga en streaming.
 
     Parámetros:
       number: JID destino (ej: 1203...@g.us)
@@ -95,41 +371,48 @@ def send_message(number: str, text: Optional[str], *, file_path: Optional[str] =
       caption: Texto acompañante (default: text o file_name)
       media_type: Valor para 'mediatype' (default document)
       debug: Si True retorna JSON completo (str) en lugar de key.id
+      media_url: URL ya registrada (ej: media_store.media_url(token)) en lugar de
+        file_path; permite enviar el mismo archivo a varios destinatarios sin
+        volver a registrarlo.
+      alias, pos_name: etiquetas con las que se registra el envío en el ledger
+        local (services.ledger), para consultas y deduplicación.
 
     Retorna:
       key.id del mensaje o JSON (str) si debug=True.
     """
     if not number:
         raise ValueError("'number' es requerido")
-    if file_path is None and not text:
+    if file_path is None and media_url is None and not text:
         raise ValueError("Para mensajes de texto se requiere 'text'")
     # Para media: se permite que no haya text ni caption; si auto_caption=True se generará fallback.
 
-    api_key, instance, base = _get_config()
-    headers = {"Content-Type": "application/json", "apikey": api_key}
-
     # Modo media (PDF)
-    if file_path:
-        import base64
-        import pathlib
-
-        p = pathlib.Path(file_path)
-        if not p.exists() or not p.is_file():
-            raise ValueError(f"Archivo no encontrado: {file_path}")
-        if p.suffix.lower() != ".pdf":
-            raise ValueError("Solo se soportan PDFs (.pdf)")
-        file_name = file_name or p.name
-        with p.open("rb") as f:
-            raw_b64 = base64.b64encode(f.read()).decode("utf-8")
-        # Algunas APIs requieren el prefijo data URI; probamos ambos: enviamos solo base64 sin prefijo por defecto.
-        b64_data = raw_b64
-        url = f"{base}/message/sendMedia/{instance}"
+    is_media = bool(file_path or media_url)
+    if is_media:
+        if media_url:
+            file_name = file_name or "archivo.pdf"
+        else:
+            p = pathlib.Path(file_path)
+            if not p.exists() or not p.is_file():
+                raise ValueError(f"Archivo no encontrado: {file_path}")
+            if p.suffix.lower() != ".pdf":
+                raise ValueError("Solo se soportan PDFs (.pdf)")
+            file_name = file_name or p.name
         filename_pdf = file_name if file_name.lower().endswith('.pdf') else f"{file_name}.pdf"
+        if media_url:
+            media = media_url
+        elif media_store.enabled():
+            media = media_store.media_url(media_store.put_file(str(p), filename_pdf))
+        else:
+            # Algunas APIs requieren el prefijo data URI; probamos ambos: enviamos solo base64 sin prefijo por defecto.
+            with p.open("rb") as f:
+                media = base64.b64encode(f.read()).decode("utf-8")
+        endpoint = "sendMedia"
         payload = {
             "number": number,
             "mediatype": media_type,  # esperado según implementación anterior
             "fileName": filename_pdf,
-            "media": b64_data,
+            "media": media,
         }
         # Solo agregar caption si usuario la dio o si auto_caption activa fallback
         effective_caption = caption if caption is not None else (filename_pdf if auto_caption and text is None else text)
@@ -137,10 +420,37 @@ def send_message(number: str, text: Optional[str], *, file_path: Optional[str] =
             payload["caption"] = effective_caption
     else:
         # Texto plano
-        url = f"{base}/message/sendText/{instance}"
+        endpoint = "sendText"
         payload = {"number": number, "text": text}
 
-    resp = httpx.post(url, json=payload, headers=headers, timeout=20.0)
+    content_hash = ledger.payload_hash(text, file_path=None if media_url else file_path, media_url=media_url)
+    started = time.perf_counter()
+    try:
+        instance, data = _send_payload(number, endpoint, payload)
+        if debug:
+            # Retornar JSON completo (como string) si se requiere depurar
+            return str(data)
+        message_id = data.get("key", {}).get("id")
+        if not message_id:
+            raise RuntimeError(f"La respuesta no contiene key.id: {data}")
+    except Exception as e:
+        logs.add_ms("send_ms", time.perf_counter() - started)
+        ledger.record_send_failed(number, str(e), kind=endpoint, payload_hash=content_hash, alias=alias, pos_name=pos_name)
+        raise
+    elapsed = time.perf_counter() - started
+    logs.add_ms("send_ms", elapsed)
+    _count(instance.name, "sent")
+    _remember_sender(message_id, instance.name)
+    ledger.record_sent(message_id, number, kind=endpoint, payload_hash=content_hash, instance=instance.name,
+                       elapsed_ms=round(elapsed * 1000, 1), alias=alias, pos_name=pos_name)
+    return message_id
+
+def _send_payload(number: str, endpoint: str, payload: dict) -> Tuple[BridgeInstance, dict]:
+    # El chat se envía siempre desde su instancia asignada (failover si está caída)
+    instance, resp = _call_bridge(
+        number, lambda inst: (f"{inst.base}/message/{endpoint}/{inst.name}", payload),
+        op=endpoint, max_timeout=20.0,
+    )
     if resp.status_code >= 400:
         detail = None
         try:
@@ -148,35 +458,87 @@ def send_message(number: str, text: Optional[str], *, file_path: Optional[str] =
         except Exception:
             detail = resp.text
         raise RuntimeError(f"Error HTTP {resp.status_code} al enviar mensaje: {detail}")
-    data = resp.json()
-    if debug:
-        # Retornar JSON completo (como string) si se requiere depurar
-        return str(data)
-    message_id = data.get("key", {}).get("id")
-    if not message_id:
-        raise RuntimeError(f"La respuesta no contiene key.id: {data}")
-    return message_id
+    return instance, resp.json()
 
-def validate_message(remote_jid: str) -> str:
-    """Devuelve el ID (key.id) del último mensaje para un remoteJid.
+def _find_page_size() -> int:
+    try:
+        return max(1, int(os.getenv("WHATSAPP_FIND_PAGE_SIZE") or 10))
+    except ValueError:
+        return 10
 
-    Realiza POST a /chat/findMessages/{instance} y toma el primer elemento de
-    messages.records (la API parece ordenar descendente por timestamp).
-    Lanza RuntimeError si no se encuentra al menos un registro o falta key.id.
+def _message_timestamp(record: dict) -> int:
+    try:
+        return int(record.get("messageTimestamp") or 0)
+    except (TypeError, ValueError):
+        return 0
+
+_oldest_first_warned = False
+
+def _find_page(remote_jid: str, message_id: Optional[str], limit: Optional[int],
+               instance: Optional[str]) -> Tuple[list, float]:
+    """Primera página ordenada (más reciente primero) y desde qué messageTimestamp está completa.
+
+    Página incompleta -> 0 (trae todo el chat). Página llena más reciente
+    primero -> timestamp de su registro más viejo. Página llena del más viejo
+    al más nuevo -> infinito: no dice nada de los mensajes recientes.
     """
+    global _oldest_first_warned
     if not remote_jid:
         raise ValueError("'remote_jid' es requerido")
-    api_key, instance, base = _get_config()
-    url = f"{base}/chat/findMessages/{instance}"
-    payload = {"where": {"key": {"remoteJid": remote_jid}}}
-    headers = {"Content-Type": "application/json", "apikey": api_key}
-    resp = httpx.post(url, json=payload, headers=headers, timeout=10.0)
+    size = limit or _find_page_size()
+    key = {"remoteJid": remote_jid}
+    if message_id:
+        key["id"] = message_id
+    payload = {"where": {"key": key}, "page": 1, "offset": size}
+    _, resp = _call_bridge(
+        remote_jid, lambda inst: (f"{inst.base}/chat/findMessages/{inst.name}", payload),
+        op="findMessages", max_timeout=10.0, idempotent=True, instance=instance,
+    )
     resp.raise_for_status()
     data = resp.json()
     try:
         records = data["messages"]["records"]
     except Exception as e:  # noqa: BLE001
         raise RuntimeError(f"Formato inesperado en respuesta: {data}") from e
+    covers_since = 0.0
+    if len(records) >= size:
+        first, last = _message_timestamp(records[0]), _message_timestamp(records[-1])
+        if first < last:
+            covers_since = float("inf")
+            if not _oldest_first_warned:
+                _oldest_first_warned = True
+                logger.warning("findMessages devolvió la página 1 del más viejo al más nuevo: "
+                               "la validación por página no ve los mensajes recientes (se consulta por key.id)")
+        else:
+            covers_since = float(last)
+    return sorted(records, key=_message_timestamp, reverse=True), covers_since
+
+def find_messages(remote_jid: str, *, message_id: Optional[str] = None, limit: Optional[int] = None,
+                  instance: Optional[str] = None) -> list:
+    """Página acotada de /chat/findMessages/{instance}, más reciente primero.
+
+    Pide solo la primera página de `limit` registros (default
+    WHATSAPP_FIND_PAGE_SIZE) y, si se pasa `message_id`, filtra por key.id
+    exacto. `instance` fija la instancia a consultar (default: la asignada al
+    chat, con failover).
+
+    Supuesto: el bridge (Evolution API) ordena findMessages por
+    messageTimestamp descendente, así que la página 1 son los mensajes más
+    recientes y el costo no depende del largo del historial. El payload no
+    tiene campo de orden; el orden recibido se verifica (ver _find_page) y los
+    registros se reordenan aquí. Si el bridge pagina del más viejo al más
+    nuevo se registra una advertencia y la confirmación consulta por key.id.
+    """
+    records, _ = _find_page(remote_jid, message_id, limit, instance)
+    return records
+
+def validate_message(remote_jid: str) -> str:
+    """Devuelve el ID (key.id) del último mensaje para un remoteJid.
+
+    Usa find_messages (primera página, ordenada por messageTimestamp).
+    Lanza RuntimeError si no se encuentra al menos un registro o falta key.id.
+    """
+    records = find_messages(remote_jid)
     if not records:
         raise RuntimeError("No hay mensajes en records")
     first = records[0]
@@ -185,6 +547,129 @@ def validate_message(remote_jid: str) -> str:
         raise RuntimeError(f"El primer registro no contiene key.id: {first}")
     return message_id
 
+def message_exists(remote_jid: str, message_id: str, instance: Optional[str] = None) -> bool:
+    """True si el mensaje `message_id` ya figura en el chat (consulta filtrada por key.id)."""
+    if not message_id:
+        raise ValueError("'message_id' es requerido")
+    records = find_messages(remote_jid, message_id=message_id, limit=1, instance=instance)
+    # Se verifica el id aunque el bridge ignore el filtro
+    return any(record.get("key", {}).get("id") == message_id for record in records)
+
+# Diferencia tolerada entre el reloj local y el messageTimestamp de WhatsApp
+_CLOCK_SKEW_SECONDS = 30.0
+
+class ConfirmationCoordinator:
+    """Confirma mensajes enviados agrupando la consulta por chat.
+
+    Cada envío registra su key.id como pendiente y espera. Un solo hilo, cada
+    WHATSAPP_CONFIRM_INTERVAL segundos, pide la página reciente de cada chat
+    con pendientes (una consulta por chat, sin importar cuántos mensajes
+    esperan) y resuelve todo id que aparezca en cualquier posición de la
+    página. Un id que no aparece en la página al vencer su plazo se verifica
+    con una consulta filtrada por key.id (message_exists) antes de darlo por
+    fallido. El hilo termina solo cuando no quedan pendientes.
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._lock = threading.Lock()
+        # (instancia, jid) -> key.id -> {"event", "deadline", "found", "error", "polls"}
+        self._pending: Dict[Tuple[Optional[str], str], Dict[str, dict]] = {}
+        self._thread: Optional[threading.Thread] = None
+
+    def wait_for(self, remote_jid: str, message_id: str, timeout: float,
+                 instance: Optional[str] = None) -> Tuple[bool, Optional[str]]:
+        """Bloquea hasta ver `message_id` en el chat o hasta `timeout`. Retorna (encontrado, último error).
+
+        `instance` es la instancia que envió el mensaje (default: la asignada al chat).
+        """
+        entry = {"event": threading.Event(), "deadline": time.monotonic() + timeout, "found": False, "error": None,
+                 "polls": 0, "sent_at": time.time()}
+        with self._lock:
+            self._pending.setdefault((instance, remote_jid), {})[message_id] = entry
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="whatsapp-confirm", daemon=True)
+                self._thread.start()
+        entry["event"].wait(timeout + self.interval + 15.0)
+        # Consultas al chat que hicieron falta (resumen del request en curso)
+        logs.count("validation_attempts", entry["polls"])
+        return entry["found"], entry["error"]
+
+    def pending_count(self, instance: Optional[str] = None) -> int:
+        with self._lock:
+            return sum(len(ids) for key, ids in self._pending.items() if instance is None or key[0] == instance)
+
+    def _run(self) -> None:
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                if not self._pending:
+                    self._thread = None
+                    return
+                chats = list(self._pending)
+            for chat in chats:
+                self._check_chat(chat)
+
+    def _check_chat(self, chat: Tuple[Optional[str], str]) -> None:
+        instance, remote_jid = chat
+        with self._lock:
+            count = len(self._pending.get(chat, {}))
+        if not count:
+            return
+        seen = set()
+        error = None
+        covers_since = 0.0
+        try:
+            # La página crece con los pendientes para cubrir ráfagas de envíos
+            records, covers_since = _find_page(remote_jid, None, min(100, _find_page_size() + count), instance)
+            seen = {record.get("key", {}).get("id") for record in records}
+        except Exception as e:  # noqa: BLE001
+            error = str(e)
+        now = time.monotonic()
+        with self._lock:
+            # Se consulta por key.id si vence el plazo o si la página no llega a
+            # la hora del envío (margen por diferencia de relojes con WhatsApp)
+            expiring = [message_id for message_id, entry in self._pending.get(chat, {}).items()
+                        if message_id not in seen
+                        and (now >= entry["deadline"] or entry["sent_at"] - _CLOCK_SKEW_SECONDS < covers_since)]
+        # Antes de dar por fallido un mensaje que no está en la página (chat con
+        # mucho movimiento u orden inesperado), se consulta filtrando por su key.id
+        for message_id in expiring:
+            try:
+                if message_exists(remote_jid, message_id, instance=instance):
+                    seen.add(message_id)
+            except Exception as e:  # noqa: BLE001
+                error = str(e)
+        with self._lock:
+            pending = self._pending.get(chat, {})
+            for message_id, entry in list(pending.items()):
+                entry["polls"] += 1
+                if message_id in seen:
+                    entry["found"] = True
+                elif now < entry["deadline"]:
+                    entry["error"] = error
+                    continue
+                else:
+                    entry["error"] = error
+                del pending[message_id]
+                entry["event"].set()
+            if not pending:
+                self._pending.pop(chat, None)
+
+
+_coordinator: Optional[ConfirmationCoordinator] = None
+
+def get_confirmation_coordinator() -> ConfirmationCoordinator:
+    global _coordinator
+    if _coordinator is None:
+        with _client_lock:
+            if _coordinator is None:
+                _coordinator = ConfirmationCoordinator(max(0.2, _env_float("WHATSAPP_CONFIRM_INTERVAL", 1.5)))
+    return _coordinator
+
+def pending_confirmations() -> int:
+    return _coordinator.pending_count() if _coordinator else 0
+
 def send_and_validate(
     remote_jid: str,
     message: Optional[str],
@@ -196,21 +681,24 @@ def send_and_validate(
     attempts: int = 5,
     delay_seconds: float = 1.0,
     auto_caption: bool = True,
+    media_url: Optional[str] = None,
+    alias: Optional[str] = None,
+    pos_name: Optional[str] = None,
 ) -> str:
-    """Envía un mensaje (texto o PDF) y valida que aparezca como el último.
+    """Envía un mensaje (texto o PDF) y valida que aparezca en el chat.
 
     Proceso:
       1. Envío vía send_message (soporta file_path para PDF).
-      2. Reintenta validate_message hasta 'attempts' veces, esperando 'delay_seconds' entre cada intento.
-      3. Compara el id enviado con el recuperado.
+      2. Espera a que el ConfirmationCoordinator vea el key.id enviado en la
+         página reciente del chat (consulta compartida con los demás envíos
+         pendientes al mismo chat), hasta attempts * delay_seconds segundos.
 
     Parámetros adicionales:
-      file_path/file_name/caption/media_type: mismos que en send_message.
-      attempts: número máximo de verificaciones (>=1).
-      delay_seconds: pausa entre verificaciones (>=0).
+      file_path/file_name/caption/media_type/media_url/alias/pos_name: mismos que en send_message.
+      attempts, delay_seconds: definen el tiempo máximo de espera (attempts >= 1).
 
     Retorna:
-      "Mensaje enviado y validado" si coincide el ID.
+      "Mensaje enviado y validado" si el mensaje aparece en el chat.
       Cadena de error descriptiva en caso contrario.
     """
     if attempts < 1:
@@ -224,20 +712,35 @@ def send_and_validate(
             caption=caption,
             media_type=media_type,
             auto_caption=auto_caption,
+            media_url=media_url,
+            alias=alias,
+            pos_name=pos_name,
         )
+    except CircuitOpenError:
+        raise
     except Exception as e:  # noqa: BLE001
         return f"Error al enviar: {e}"
 
-    for attempt in range(1, attempts + 1):
-        time.sleep(delay_seconds if attempt > 1 else delay_seconds)  # esperar también después del primer envío
-        try:
-            last_id = validate_message(remote_jid)
-        except Exception as e:  # noqa: BLE001
-            if attempt == attempts:
-                return f"Error al validar (intento {attempt}/{attempts}): {e}"
-            continue
-        if sent_id == last_id:
-            return "Mensaje enviado y validado"
-    return f"IDs no coinciden tras {attempts} intentos: enviado={sent_id} ultimo={last_id}"
+    return confirm_sent(remote_jid, sent_id, attempts=attempts, delay_seconds=delay_seconds)
+
+def confirm_sent(remote_jid: str, sent_id: str, *, attempts: int = 5, delay_seconds: float = 1.0) -> str:
+    """Espera la confirmación de un mensaje ya enviado (paso 2 de send_and_validate).
+
+    Retorna "Mensaje enviado y validado" o una cadena de error descriptiva.
+    """
+    coordinator = get_confirmation_coordinator()
+    timeout = max(attempts * delay_seconds, coordinator.interval)
+    started = time.perf_counter()
+    found, error = coordinator.wait_for(remote_jid, sent_id, timeout, instance=sent_via(sent_id))
+    if found:
+        result = "Mensaje enviado y validado"
+    elif error:
+        result = f"Error al validar: {error}"
+    else:
+        result = f"Mensaje no encontrado en el chat tras {timeout:.1f} s: enviado={sent_id}"
+    elapsed = time.perf_counter() - started
+    logs.add_ms("validate_ms", elapsed)
+    ledger.record_confirmation(sent_id, remote_jid, found, result, round(elapsed * 1000, 1))
+    return result
 
-__all__ = ["send_message", "validate_message", "send_and_validate", "check_number_exists"]
+__all__ = ["send_message", "find_messages", "validate_message", "message_exists", "send_and_validate", "confirm_sent", "ConfirmationCoordinator", "get_confirmation_coordinator", "pending_confirmations", "check_number_exists", "get_connection_state", "connection_states", "get_whatsapp_breaker", "BridgeInstance", "get_instances", "instances_for", "instances_snapshot", "sent_via"]
@@ -0,0 +1,93 @@
+"""Endpoints de administración (protegidos con ADMIN_TOKEN).
+
+Todas las rutas exigen el header `X-Admin-Token` igual a la variable de entorno
+ADMIN_TOKEN. Si ADMIN_TOKEN no está definida las rutas responden 403.
+"""
+
+import hmac
+import os
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import FileResponse, PlainTextResponse
+
+from clients.breaker import CircuitOpenError
+from services import dispatcher, profiling, reference_data
+from services.profiling import ProfiledRoute
+
+
+def require_admin(x_admin_token: Optional[str] = Header(default=None)) -> None:
+    expected = os.getenv("ADMIN_TOKEN")
+    if not expected:
+        raise HTTPException(status_code=403, detail="Administración deshabilitada (ADMIN_TOKEN no definido)")
+    if not x_admin_token or not hmac.compare_digest(x_admin_token, expected):
+        raise HTTPException(status_code=401, detail="Token de administración inválido")
+
+
+router = APIRouter(prefix="/admin", tags=["admin"], dependencies=[Depends(require_admin)], route_class=ProfiledRoute)
+
+
+@router.post("/reference-data/invalidate")
+def invalidate_reference_data(
+    model: Optional[str] = Query(None, description="Modelo a invalidar (ej: pos.config). Sin valor: todos."),
+    reload: bool = Query(False, description="Volver a cargar los datos de referencia después de invalidar."),
+):
+    try:
+        models = reference_data.invalidate(model)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
+
+    result = {"invalidated": models}
+    if reload:
+        try:
+            result["reloaded"] = reference_data.prefetch()
+        except CircuitOpenError:
+            raise
+        except Exception as e:  # noqa: BLE001
+            raise HTTPException(status_code=502, detail=f"Error recargando datos de referencia: {e}") from e
+    return result
+
+
+@router.get("/dispatcher")
+def dispatcher_status():
+    """Cursor, conteos por estado y últimas entregas del despachador de cierres."""
+    return dispatcher.get_dispatcher().status()
+
+
+@router.get("/profiles")
+def list_profiles():
+    """Perfiles guardados (pstats de requests y collapsed de muestreos), más recientes primero."""
+    return {"profiles": profiling.list_profiles()}
+
+
+@router.get("/profiles/{profile_id}")
+def get_profile(
+    profile_id: str,
+    format: str = Query("text", pattern="^(text|pstats|collapsed)$",
+                        description="text (resumen pstats), pstats (binario) o collapsed (flamegraph)"),
+    sort: str = Query("cumulative", pattern="^(cumulative|tottime|calls)$"),
+    limit: int = Query(60, ge=1, le=500),
+):
+    extension = "collapsed" if format == "collapsed" else "pstats"
+    try:
+        path = profiling.profile_path(profile_id, extension)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
+    if not os.path.exists(path):
+        raise HTTPException(status_code=404, detail=f"Perfil no encontrado ({extension})")
+    if format == "text":
+        return PlainTextResponse(profiling.stats_text(profile_id, sort, limit))
+    return FileResponse(path, media_type="application/octet-stream", filename=os.path.basename(path))
+
+
+@router.post("/profiling/sample")
+def sample_process(
+    seconds: float = Query(10, gt=0, le=120, description="Duración del muestreo"),
+    interval_ms: float = Query(5, ge=1, le=1000, description="Intervalo entre muestras"),
+    include_idle: bool = Query(False, description="Incluir hilos en espera (locks, colas, selectores)"),
+):
+    """Muestrea las pilas de todos los hilos del worker; descarga con GET /admin/profiles/{id}?format=collapsed."""
+    try:
+        return profiling.sample(seconds, interval_ms / 1000.0, include_idle)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e)) from e
@@ -0,0 +1,68 @@
+import asyncio
+import json
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+
+from services import jobs
+from services.profiling import ProfiledRoute
+
+router = APIRouter(prefix="/whatsapp/jobs", tags=["whatsapp"], route_class=ProfiledRoute)
+
+_HEARTBEAT_SECONDS = 15.0
+
+
+@router.get("/events")
+async def job_events(request: Request, job_id: Optional[str] = Query(None, description="Solo eventos de este job")):
+    """Stream SSE con cada job terminado (evento `job`) en este worker.
+
+    Con `job_id` el stream termina al emitir ese job. Si lo confirma otro
+    worker el evento no llega por la cola local: en cada heartbeat se vuelve a
+    leer el estado compartido del job.
+    """
+    if job_id and not jobs.get_job(job_id):
+        raise HTTPException(status_code=404, detail="Job no encontrado o vencido")
+    queue = jobs.subscribe(job_id)
+
+    async def stream():
+        try:
+            if job_id:
+                # El job pudo terminar antes de la suscripción
+                job = jobs.get_job(job_id)
+                if job and job["status"] != jobs.PENDING:
+                    yield _sse(job)
+                    return
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    if job_id:
+                        job = jobs.get_job(job_id)
+                        if not job:
+                            return  # venció (JOBS_TTL)
+                        if job["status"] != jobs.PENDING:
+                            yield _sse(job)
+                            return
+                    yield ": keep-alive\n\n"
+                    continue
+                yield _sse(event)
+                if job_id:
+                    return
+        finally:
+            jobs.unsubscribe(queue)
+
+    return StreamingResponse(stream(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+def _sse(job: dict) -> str:
+    public = {k: v for k, v in job.items() if k != "callback_url"}
+    return f"event: job\nid: {job['job_id']}\ndata: {json.dumps(public)}\n\n"
+
+
+@router.get("/{job_id}")
+def get_job(job_id: str):
+    job = jobs.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job no encontrado o vencido")
+    return {k: v for k, v in job.items() if k != "callback_url"}
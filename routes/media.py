@@ -0,0 +1,22 @@
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import FileResponse
+
+from services import media_store
+from services.profiling import ProfiledRoute
+
+router = APIRouter(tags=["media"], route_class=ProfiledRoute)
+
+
+@router.get("/media/{token}")
+def get_media(token: str):
+    """Descarga de un archivo registrado en el almacén temporal (usado por el bridge)."""
+    found = media_store.lookup(token)
+    if not found:
+        raise HTTPException(status_code=404, detail="Archivo no encontrado o vencido")
+    path, meta = found
+    return FileResponse(
+        path,
+        media_type=meta.get("content_type") or "application/octet-stream",
+        filename=meta.get("file_name"),
+        headers={"Cache-Control": "no-store"},
+    )
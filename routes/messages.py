@@ -0,0 +1,35 @@
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Query
+
+from services import ledger
+from services.chats import UnknownChatAliasError, ChatNotConfiguredError, resolve_jid
+from services.profiling import ProfiledRoute
+
+router = APIRouter(prefix="/whatsapp/messages", tags=["whatsapp"], route_class=ProfiledRoute)
+
+
+@router.get("")
+def list_messages(
+    pos_name: Optional[str] = Query(None, description="Sesión POS enviada (ej: POS/00025)"),
+    chat: Optional[str] = Query(None, description="Alias de chat (se resuelve a su JID)"),
+    jid: Optional[str] = Query(None, description="JID destino"),
+    alias: Optional[str] = Query(None, description="Alias registrado en el envío (ej: resúmenes de DIGEST_ALIASES)"),
+    limit: int = Query(50, ge=1, le=500),
+):
+    """Envíos registrados en el ledger local, más recientes primero, con su último estado."""
+    if chat:
+        try:
+            jid = resolve_jid(chat)
+        except (UnknownChatAliasError, ChatNotConfiguredError) as e:
+            raise HTTPException(status_code=400, detail=str(e)) from e
+    return {"messages": ledger.find(pos_name=pos_name, jid=jid, alias=alias.lower() if alias else None, limit=limit)}
+
+
+@router.get("/{message_id}")
+def get_message(message_id: str):
+    """Estado de un mensaje (key.id) y su historial de eventos, sin consultar el bridge."""
+    message = ledger.get_message(message_id)
+    if not message:
+        raise HTTPException(status_code=404, detail="Mensaje no registrado en el ledger")
+    return message
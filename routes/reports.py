@@ -0,0 +1,71 @@
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
+
+from clients.breaker import CircuitOpenError
+from services.aggregates import range_report
+from services.closing_data import SECTIONS, iter_csv, iter_json, load_closing_data
+from services.pdf_service import SessionNotFoundError, get_session_data
+from services.profiling import ProfiledRoute
+
+router = APIRouter(prefix="/reports", tags=["reports"], route_class=ProfiledRoute)
+
+
+def _parse_config_ids(raw: Optional[str]):
+    if not raw:
+        return None
+    try:
+        return [int(part) for part in raw.split(",") if part.strip()]
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail="config_ids debe ser una lista de enteros separados por coma") from e
+
+
+@router.get("/range")
+def report_range(
+    date_from: str = Query(..., description="Fecha inicial YYYY-MM-DD (hora local del reporte)"),
+    date_to: str = Query(..., description="Fecha final YYYY-MM-DD, incluida"),
+    config_ids: Optional[str] = Query(None, description="pos.config ids separados por coma (ej: 1,3). Sin valor: todas"),
+    top: int = Query(10, ge=1, le=100, description="Cantidad de productos más vendidos"),
+):
+    """Totales de los cierres del rango por tienda y globales (agregados materializados por sesión)."""
+    ids = _parse_config_ids(config_ids)
+    try:
+        return range_report(date_from, date_to, ids, top)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
+    except CircuitOpenError:
+        raise
+    except Exception as e:  # noqa: BLE001
+        raise HTTPException(status_code=502, detail=f"Error generando reporte: {e}") from e
+
+
+@router.get("/closing")
+def closing_data(
+    pos_name: str = Query(..., description="Nombre de la sesión POS (ej: POS/00025)"),
+    format: str = Query("json", pattern="^(json|csv)$", description="json (todas las secciones) o csv (una sección)"),
+    section: str = Query("lines", description=f"Sección para CSV: {', '.join(SECTIONS)}"),
+    stock: bool = Query(True, description="Incluir movimientos de inventario (consultas extra a Odoo)"),
+):
+    """Datos del reporte de cierre sin renderizar el PDF, emitidos por partes."""
+    if format == "csv" and section not in SECTIONS:
+        raise HTTPException(status_code=400, detail=f"Sección inválida: {section}. Opciones: {', '.join(SECTIONS)}")
+    try:
+        session = get_session_data(pos_name)
+        data = load_closing_data(session, include_stock=stock and (format == "json" or section == "stock"),
+                                 include_cash=format == "json" or section == "cash")
+    except SessionNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e)) from e
+    except CircuitOpenError:
+        raise
+    except Exception as e:  # noqa: BLE001
+        raise HTTPException(status_code=502, detail=f"Error consultando datos del cierre: {e}") from e
+
+    base = pos_name.replace("/", "_")
+    if format == "csv":
+        return StreamingResponse(
+            iter_csv(data, section),
+            media_type="text/csv; charset=utf-8",
+            headers={"Content-Disposition": f'attachment; filename="{base}_{section}.csv"'},
+        )
+    return StreamingResponse(iter_json(data), media_type="application/json")
@@ -5,32 +5,24 @@ import os
 from dotenv import load_dotenv
 from services.pdf_service import generate_pdf, SessionNotFoundError, PDFGenerationError
 from clients.whatsapp import send_and_validate
+from clients.breaker import CircuitOpenError
+from services.chats import CHAT_MAPPING, resolve_jid, UnknownChatAliasError, ChatNotConfiguredError
+from services.profiling import ProfiledRoute
 
 load_dotenv()
 
-router = APIRouter(prefix="/whatsapp", tags=["whatsapp"])
-
-_CHAT_MAPPING = {
-    "traspasos": ["WHATSAPP_TRASPASOS"],
-    "pedidos": ["WHATSAPP_PEDIDOS"],
-    "pruebas": ["WHATSAPP_PRUEBAS"],
-    "atm": ["WHATSAPP_ATM"],
-    "cierres": ["CHAT_CIERRES", "WHATSAPP_CIERRES"],
-    "retiradas": ["WHATSAPP_RETIRADAS"],
-}
+router = APIRouter(prefix="/whatsapp", tags=["whatsapp"], route_class=ProfiledRoute)
 
 def resolve_chat(alias: str) -> str:
-    env_keys = _CHAT_MAPPING.get(alias.lower())
-    if not env_keys:
-        raise HTTPException(status_code=400, detail=f"Alias desconocido: {alias}. Use: {', '.join(_CHAT_MAPPING.keys())}")
-    for key in env_keys:
-        value = os.getenv(key)
-        if value:
-            return value
-    raise HTTPException(status_code=500, detail=f"Variables de entorno no definidas: {', '.join(env_keys)}")
+    try:
+        return resolve_jid(alias)
+    except UnknownChatAliasError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ChatNotConfiguredError as e:
+        raise HTTPException(status_code=500, detail=str(e))
 
 class SendPDFRequest(BaseModel):
-    chat: str = Field(..., description=f"Alias de chat: {', '.join(_CHAT_MAPPING.keys())}")
+    chat: str = Field(..., description=f"Alias de chat: {', '.join(CHAT_MAPPING.keys())}")
     pos_name: str = Field(..., description="Nombre de la sesión POS (ej: POS/00025)")
     caption: Optional[str] = Field(None, description="Caption opcional. Si no se envía no se agrega caption.")
 
@@ -47,6 +39,8 @@ def send_pdf(req: SendPDFRequest):
             filename = generate_pdf(req.pos_name)
         except (SessionNotFoundError, PDFGenerationError) as e:
             raise HTTPException(status_code=500 if isinstance(e, PDFGenerationError) else 404, detail=str(e))
+        except CircuitOpenError:
+            raise
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Error inesperado generando PDF: {e}")
 
@@ -60,6 +54,8 @@ def send_pdf(req: SendPDFRequest):
             attempts=6,
             delay_seconds=1.5,
             auto_caption=False,
+            alias=req.chat.lower(),
+            pos_name=req.pos_name,
         )
         if result == "Mensaje enviado y validado":
             try:
@@ -69,7 +65,7 @@ def send_pdf(req: SendPDFRequest):
                 pass
             return SendPDFResponse(status="ok", detail=result, pdf_file=abs_path)
         raise HTTPException(status_code=400, detail=result)
-    except HTTPException:
+    except (HTTPException, CircuitOpenError):
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
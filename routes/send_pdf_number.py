@@ -1,11 +1,18 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel, Field
 from clients.whatsapp import check_number_exists, send_and_validate
-from typing import Optional
+from clients.breaker import CircuitOpenError
+from services import media_store
+from services.uploads import PDFUpload, read_pdf_upload
+from services.profiling import ProfiledRoute
+from typing import Optional, Tuple
 import base64
+import re
+import shutil
 import tempfile
 import os
-router = APIRouter(prefix="/whatsapp", tags=["whatsapp"])
+router = APIRouter(prefix="/whatsapp", tags=["whatsapp"], route_class=ProfiledRoute)
 
 class SendPDFNumberRequest(BaseModel):
     numero: str = Field(..., min_length=10, max_length=10, pattern=r"^\d{10}$", description="Número celular colombiano de 10 dígitos (sin prefijo)")
@@ -20,17 +27,22 @@ class SendPDFNumberResponse(BaseModel):
     name: Optional[str] = None
     pdf_file: Optional[str] = None
 
-@router.post("/send-pdf-number", response_model=SendPDFNumberResponse)
-def send_pdf_number(req: SendPDFNumberRequest):
-    formatted = f"+57{req.numero}"
+def _resolve_number(numero: str) -> Tuple[str, str]:
+    """Valida el número en WhatsApp. Retorna (jid, nombre)."""
+    formatted = f"+57{numero}"
     try:
         data = check_number_exists(formatted)
+    except CircuitOpenError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=502, detail=f"Error validando número: {e}")
     if not data or not data.get("exists"):
         raise HTTPException(status_code=404, detail="El número no existe en WhatsApp")
-    jid = data.get("jid")
-    name = data.get("name") or "No disponible"
+    return data.get("jid"), data.get("name") or "No disponible"
+
+@router.post("/send-pdf-number", response_model=SendPDFNumberResponse)
+def send_pdf_number(req: SendPDFNumberRequest):
+    jid, name = _resolve_number(req.numero)
     try:
         pdf_bytes = base64.b64decode(req.pdf_base64)
     except Exception:
@@ -56,3 +68,42 @@ def send_pdf_number(req: SendPDFNumberRequest):
     if result == "Mensaje enviado y validado":
         return SendPDFNumberResponse(status="ok", detail=result, name=name, pdf_file=pdf_nombre)
     raise HTTPException(status_code=400, detail=result)
+
+def _send_upload(jid: str, upload: PDFUpload, pdf_nombre: str, caption: Optional[str], mensaje: Optional[str]) -> str:
+    options = dict(file_name=pdf_nombre, caption=caption, attempts=6, delay_seconds=1.5, auto_caption=True)
+    if media_store.enabled():
+        # Del buffer al almacén de /media: el bridge lo descarga, sin base64
+        token = media_store.put_stream(upload.file, pdf_nombre)
+        return send_and_validate(jid, mensaje, media_url=media_store.media_url(token), **options)
+    with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
+        shutil.copyfileobj(upload.file, tmp)
+        pdf_path = tmp.name
+    try:
+        return send_and_validate(jid, mensaje, file_path=pdf_path, **options)
+    finally:
+        if os.path.exists(pdf_path):
+            os.remove(pdf_path)
+
+@router.post("/send-pdf-number/multipart", response_model=SendPDFNumberResponse)
+async def send_pdf_number_multipart(request: Request):
+    """Igual que /send-pdf-number pero con el PDF como archivo multipart/form-data.
+
+    Campos: numero (10 dígitos), pdf (archivo), pdf_nombre, caption y mensaje
+    (opcionales). El archivo se lee en streaming con tope de tamaño
+    (UPLOAD_MAX_BYTES) y validación temprana del encabezado %PDF-.
+    """
+    fields, upload = await read_pdf_upload(request)
+    try:
+        numero = fields.get("numero", "")
+        if not re.fullmatch(r"\d{10}", numero):
+            raise HTTPException(status_code=422, detail="'numero' debe tener 10 dígitos (sin prefijo)")
+        jid, name = await run_in_threadpool(_resolve_number, numero)
+        pdf_nombre = fields.get("pdf_nombre") or upload.filename or "archivo.pdf"
+        result = await run_in_threadpool(
+            _send_upload, jid, upload, pdf_nombre, fields.get("caption") or None, fields.get("mensaje") or None
+        )
+    finally:
+        upload.close()
+    if result == "Mensaje enviado y validado":
+        return SendPDFNumberResponse(status="ok", detail=result, name=name, pdf_file=pdf_nombre)
+    raise HTTPException(status_code=400, detail=result)
@@ -1,50 +1,81 @@
 from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel, Field
+from fastapi.responses import JSONResponse
+from pydantic import AnyHttpUrl, BaseModel, Field
 from typing import Optional
-import os
 from dotenv import load_dotenv
-from clients.whatsapp import send_and_validate
+from clients.whatsapp import send_and_validate, send_message
+from clients.breaker import CircuitOpenError
+from services.chats import CHAT_MAPPING, resolve_jid, UnknownChatAliasError, ChatNotConfiguredError
+from services.jobs import check_callback_url, start_job
+from services.digest import get_coalescer
+from services.profiling import ProfiledRoute
 
 load_dotenv()
 
-router = APIRouter(prefix="/whatsapp", tags=["whatsapp"])
-
-_CHAT_MAPPING = {
-    "traspasos": ["WHATSAPP_TRASPASOS"],
-    "pedidos": ["WHATSAPP_PEDIDOS"],
-    "pruebas": ["WHATSAPP_PRUEBAS"],
-    "atm": ["WHATSAPP_ATM"],
-    "cierres": ["CHAT_CIERRES", "WHATSAPP_CIERRES"],
-    "retiradas": ["WHATSAPP_RETIRADAS"],
-}
+router = APIRouter(prefix="/whatsapp", tags=["whatsapp"], route_class=ProfiledRoute)
 
 def resolve_chat(alias: str) -> str:
-    env_keys = _CHAT_MAPPING.get(alias.lower())
-    if not env_keys:
-        raise HTTPException(status_code=400, detail=f"Alias desconocido: {alias}. Use: {', '.join(_CHAT_MAPPING.keys())}")
-    for key in env_keys:
-        value = os.getenv(key)
-        if value:
-            return value
-    raise HTTPException(status_code=500, detail=f"Variables de entorno no definidas: {', '.join(env_keys)}")
+    try:
+        return resolve_jid(alias)
+    except UnknownChatAliasError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ChatNotConfiguredError as e:
+        raise HTTPException(status_code=500, detail=str(e))
 
 class SendTextRequest(BaseModel):
-    chat: str = Field(..., description=f"Alias de chat: {', '.join(_CHAT_MAPPING.keys())}")
+    chat: str = Field(..., description=f"Alias de chat: {', '.join(CHAT_MAPPING.keys())}")
     message: str = Field(..., description="Texto a enviar (siempre se valida envío)")
+    async_send: bool = Field(False, description="Responder 202 apenas el bridge acepta el envío; la validación sigue en segundo plano")
+    callback_url: Optional[AnyHttpUrl] = Field(None, description="URL a la que se hace POST firmado con el resultado (implica async_send)")
 
 class SendTextResponse(BaseModel):
     status: str
     detail: str
+    job_id: Optional[str] = Field(None, description="Job del envío (respuesta 202); en modo resumen es el mismo para todo el lote")
+    batch_size: Optional[int] = Field(None, description="Mensajes en el lote al agregar este (modo resumen, respuesta 202)")
+
+def send_async(jid: str, message: str, callback_url: Optional[AnyHttpUrl], alias: Optional[str] = None) -> JSONResponse:
+    """Envía sin esperar la validación: 202 con job_id (ver services.jobs)."""
+    # Validar antes de enviar: un 400 después del envío haría que el cliente reintente y duplique el mensaje
+    if callback_url:
+        try:
+            check_callback_url(str(callback_url))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    try:
+        message_id = send_message(jid, message, alias=alias)
+    except CircuitOpenError:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Error al enviar: {e}")
+    try:
+        job = start_job(jid, message_id, callback_url=str(callback_url) if callback_url else None)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return JSONResponse(status_code=202, content={"status": "accepted", "job_id": job["job_id"], "message_id": message_id})
 
-@router.post("/send-text", response_model=SendTextResponse)
+@router.post("/send-text", response_model=SendTextResponse, responses={202: {"description": "Enviado (o agrupado en un resumen); validación en segundo plano"}})
 def send_text(req: SendTextRequest):
     try:
         jid = resolve_chat(req.chat)
-        result = send_and_validate(jid, req.message)
+        if req.async_send or req.callback_url:
+            return send_async(jid, req.message, req.callback_url, alias=req.chat.lower())
+        # Alias con modo resumen: se agrupa con las demás alertas de la ventana y
+        # se responde 202 con el job del lote, sin esperar su envío
+        coalescer = get_coalescer(req.chat)
+        if coalescer:
+            job_id, batch_size = coalescer.submit(jid, req.message)
+            return JSONResponse(status_code=202, content={
+                "status": "accepted",
+                "detail": f"Agrupado en el resumen de '{coalescer.alias}' (sale en hasta {coalescer.window:g} s)",
+                "job_id": job_id,
+                "batch_size": batch_size,
+            })
+        result = send_and_validate(jid, req.message, alias=req.chat.lower())
         if result == "Mensaje enviado y validado":
             return SendTextResponse(status="ok", detail=result)
         raise HTTPException(status_code=400, detail=result)
-    except HTTPException:
+    except (HTTPException, CircuitOpenError):
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
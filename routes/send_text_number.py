@@ -1,29 +1,38 @@
 from fastapi import APIRouter, HTTPException, Query
-from pydantic import BaseModel, Field
+from pydantic import AnyHttpUrl, BaseModel, Field
 from typing import Optional
 from clients.whatsapp import check_number_exists, send_and_validate
-router = APIRouter(prefix="/whatsapp", tags=["whatsapp"])
+from routes.send_plain_text import send_async
+from clients.breaker import CircuitOpenError
+from services.profiling import ProfiledRoute
+router = APIRouter(prefix="/whatsapp", tags=["whatsapp"], route_class=ProfiledRoute)
 
 class SendTextNumberRequest(BaseModel):
     numero: str = Field(..., min_length=10, max_length=10, pattern=r"^\d{10}$", description="Número celular colombiano de 10 dígitos (sin prefijo)")
     mensaje: str = Field(..., description="Mensaje de texto a enviar")
+    async_send: bool = Field(False, description="Responder 202 apenas el bridge acepta el envío; la validación sigue en segundo plano")
+    callback_url: Optional[AnyHttpUrl] = Field(None, description="URL a la que se hace POST firmado con el resultado (implica async_send)")
 
 class SendTextNumberResponse(BaseModel):
     status: str
     detail: str
     name: Optional[str] = None
 
-@router.post("/send-text-number", response_model=SendTextNumberResponse)
+@router.post("/send-text-number", response_model=SendTextNumberResponse, responses={202: {"description": "Enviado; validación en segundo plano"}})
 def send_text_number(req: SendTextNumberRequest):
     formatted = f"+57{req.numero}"
     try:
         data = check_number_exists(formatted)
+    except CircuitOpenError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=502, detail=f"Error validando número: {e}")
     if not data or not data.get("exists"):
         raise HTTPException(status_code=404, detail="El número no existe en WhatsApp")
     jid = data.get("jid")
     name = data.get("name") or "No disponible"
+    if req.async_send or req.callback_url:
+        return send_async(jid, req.mensaje, req.callback_url)
     result = send_and_validate(jid, req.mensaje)
     if result == "Mensaje enviado y validado":
         return SendTextNumberResponse(status="ok", detail=result, name=name)
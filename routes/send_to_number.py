@@ -7,10 +7,12 @@ import os
 from dotenv import load_dotenv
 
 from clients.whatsapp import check_number_exists, send_and_validate
+from clients.breaker import CircuitOpenError
+from services.profiling import ProfiledRoute
 
 load_dotenv()
 
-router = APIRouter(prefix="/whatsapp", tags=["whatsapp"])
+router = APIRouter(prefix="/whatsapp", tags=["whatsapp"], route_class=ProfiledRoute)
 
 class SendToNumberRequest(BaseModel):
     numero: str = Field(..., min_length=10, max_length=10, pattern=r"^\d{10}$", description="Número celular colombiano de 10 dígitos (sin prefijo)")
@@ -31,6 +33,8 @@ def send_to_number(req: SendToNumberRequest):
     formatted = f"+57{req.numero}"
     try:
         data = check_number_exists(formatted)
+    except CircuitOpenError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=502, detail=f"Error validando número: {e}")
     if not data or not data.get("exists"):
@@ -2,9 +2,11 @@
 from fastapi import APIRouter, HTTPException, Query
 from pydantic import BaseModel
 from clients.whatsapp import check_number_exists
+from clients.breaker import CircuitOpenError
+from services.profiling import ProfiledRoute
 
 
-router = APIRouter(prefix="/whatsapp", tags=["whatsapp"])
+router = APIRouter(prefix="/whatsapp", tags=["whatsapp"], route_class=ProfiledRoute)
 
 
 class ValidateNumberResponse(BaseModel):
@@ -23,6 +25,8 @@ def validate_number(
     formatted = f"+57{number}"
     try:
         data = check_number_exists(formatted)
+    except CircuitOpenError:
+        raise
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e)) from e
     except RuntimeError as e:
@@ -0,0 +1,250 @@
+"""Agregados materializados por sesión y reportes por rango de fechas.
+
+Cuando una sesión cierra, sus totales (métodos de pago, ingresos/retiradas de
+efectivo, diferencias, órdenes y productos) se calculan una vez en Odoo con
+read_group (un solo OdooBatch) y se guardan en DATA_DIR/aggregates.sqlite3.
+Un reporte semanal o mensual lee esas filas: a Odoo solo se le pide la lista
+de sesiones del rango (un search_read) y los agregados de las sesiones que
+aún no estén materializadas o cuyo write_date cambió.
+
+Variables de entorno (opcionales):
+    AGGREGATES_CONCURRENCY -> sesiones materializadas en paralelo (default 4)
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from clients.odoo import OdooBatch
+from services.formatting import from_report_tz
+from services.pdf_service import _cash_movement_domain, list_sessions_between
+from services.storage import data_path, thread_connection
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS session_aggregates (
+    session_id INTEGER PRIMARY KEY,
+    session_name TEXT NOT NULL,
+    config_id INTEGER NOT NULL,
+    config_name TEXT,
+    start_at TEXT,
+    stop_at TEXT,
+    write_date TEXT,
+    balance_start REAL,
+    balance_end_real REAL,
+    difference REAL,
+    total_payments REAL,
+    cash_in REAL,
+    cash_out REAL,
+    orders_count INTEGER,
+    refunds_count INTEGER,
+    materialized_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_session_aggregates_start ON session_aggregates (start_at, config_id);
+CREATE TABLE IF NOT EXISTS session_methods (
+    session_id INTEGER NOT NULL,
+    method TEXT NOT NULL,
+    amount REAL NOT NULL,
+    PRIMARY KEY (session_id, method)
+);
+CREATE TABLE IF NOT EXISTS session_products (
+    session_id INTEGER NOT NULL,
+    product_id INTEGER NOT NULL,
+    product_name TEXT,
+    qty REAL NOT NULL,
+    amount REAL NOT NULL,
+    PRIMARY KEY (session_id, product_id)
+);
+"""
+
+_schema_lock = threading.Lock()
+_schema_ready = False
+
+
+def _conn():
+    global _schema_ready
+    conn = thread_connection(data_path("aggregates.sqlite3"))
+    if not _schema_ready:
+        with _schema_lock:
+            if not _schema_ready:
+                conn.executescript(_SCHEMA)
+                _schema_ready = True
+    return conn
+
+
+def _sum(groups: list, field: str) -> float:
+    return sum(group.get(field) or 0 for group in groups)
+
+
+def materialize_session(session: dict) -> None:
+    """Calcula en Odoo los agregados de una sesión cerrada y los guarda (reemplaza los anteriores)."""
+    session_id = session['id']
+    batch = OdooBatch()
+    methods_idx = batch.add('pos.payment', 'read_group',
+                            [[['session_id', '=', session_id]], ['amount:sum'], ['payment_method_id']],
+                            {'lazy': False})
+    cash_in_idx = batch.add('account.bank.statement.line', 'read_group',
+                            [_cash_movement_domain(session_id) + [['amount', '>', 0]], ['amount:sum'], []],
+                            {'lazy': False})
+    cash_out_idx = batch.add('account.bank.statement.line', 'read_group',
+                             [_cash_movement_domain(session_id) + [['amount', '<', 0]], ['amount:sum'], []],
+                             {'lazy': False})
+    products_idx = batch.add('pos.order.line', 'read_group',
+                             [[['order_id.session_id', '=', session_id]], ['qty:sum', 'price_subtotal:sum'], ['product_id']],
+                             {'lazy': False})
+    orders_idx = batch.add('pos.order', 'search_count', [[['session_id', '=', session_id]]])
+    refunds_idx = batch.add('pos.order', 'search_count',
+                            [[['session_id', '=', session_id], ['name', 'like', 'REEMBOLSO']]])
+    results = batch.execute()
+
+    methods: Dict[str, float] = {}
+    for group in results[methods_idx]:
+        if group.get('payment_method_id'):
+            name = group['payment_method_id'][1]
+            methods[name] = methods.get(name, 0) + (group.get('amount') or 0)
+
+    conn = _conn()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.execute("DELETE FROM session_methods WHERE session_id = ?", (session_id,))
+        conn.execute("DELETE FROM session_products WHERE session_id = ?", (session_id,))
+        conn.execute(
+            "INSERT OR REPLACE INTO session_aggregates (session_id, session_name, config_id, config_name, start_at, "
+            "stop_at, write_date, balance_start, balance_end_real, difference, total_payments, cash_in, cash_out, "
+            "orders_count, refunds_count, materialized_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                session_id, session['name'], session['config_id'][0], session['config_id'][1],
+                session.get('start_at'), session.get('stop_at') or None, session.get('write_date'),
+                session.get('cash_register_balance_start') or 0, session.get('cash_register_balance_end_real') or 0,
+                session.get('cash_register_difference') or 0, session.get('total_payments_amount') or 0,
+                _sum(results[cash_in_idx], 'amount'), _sum(results[cash_out_idx], 'amount'),
+                results[orders_idx], results[refunds_idx], time.time(),
+            ),
+        )
+        conn.executemany(
+            "INSERT INTO session_methods (session_id, method, amount) VALUES (?, ?, ?)",
+            [(session_id, name, amount) for name, amount in methods.items()],
+        )
+        conn.executemany(
+            "INSERT OR REPLACE INTO session_products (session_id, product_id, product_name, qty, amount) "
+            "VALUES (?, ?, ?, ?, ?)",
+            [
+                (session_id, g['product_id'][0], g['product_id'][1], g.get('qty') or 0, g.get('price_subtotal') or 0)
+                for g in results[products_idx] if g.get('product_id')
+            ],
+        )
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+
+
+def _stale_sessions(sessions: List[dict]) -> List[dict]:
+    if not sessions:
+        return []
+    known = {}
+    conn = _conn()
+    ids = [s['id'] for s in sessions]
+    for start in range(0, len(ids), 500):
+        chunk = ids[start:start + 500]
+        rows = conn.execute(
+            f"SELECT session_id, write_date FROM session_aggregates WHERE session_id IN ({','.join('?' * len(chunk))})",
+            chunk,
+        ).fetchall()
+        known.update(rows)
+    return [s for s in sessions if s['id'] not in known or known[s['id']] != s.get('write_date')]
+
+
+def _materialize_many(sessions: List[dict]) -> None:
+    if not sessions:
+        return
+    try:
+        workers = max(1, int(os.getenv("AGGREGATES_CONCURRENCY") or 4))
+    except ValueError:
+        workers = 4
+    with ThreadPoolExecutor(max_workers=min(workers, len(sessions)), thread_name_prefix="aggregates") as pool:
+        for future in [pool.submit(materialize_session, s) for s in sessions]:
+            future.result()
+
+
+def range_report(date_from: str, date_to: str, config_ids: Optional[List[int]] = None, top: int = 10) -> dict:
+    """Resumen de cierres entre `date_from` y `date_to` (YYYY-MM-DD, incluidos, hora local del reporte).
+
+    Retorna totales por tienda y globales: métodos de pago, efectivo, diferencias
+    y productos más vendidos.
+    """
+    start_local = datetime.strptime(date_from, '%Y-%m-%d')
+    end_local = datetime.strptime(date_to, '%Y-%m-%d') + timedelta(days=1)
+    if end_local <= start_local:
+        raise ValueError("date_to debe ser mayor o igual a date_from")
+    fmt = '%Y-%m-%d %H:%M:%S'
+    sessions = list_sessions_between(from_report_tz(start_local).strftime(fmt),
+                                     from_report_tz(end_local).strftime(fmt), config_ids)
+    stale = _stale_sessions(sessions)
+    _materialize_many(stale)
+
+    ids = [s['id'] for s in sessions]
+    stores: Dict[int, dict] = {}
+    totals = _empty_totals()
+    if ids:
+        conn = _conn()
+        marks = ','.join('?' * len(ids))
+        for row in conn.execute(
+            "SELECT config_id, config_name, COUNT(*), SUM(total_payments), SUM(cash_in), SUM(cash_out), "
+            "SUM(difference), SUM(orders_count), SUM(refunds_count) FROM session_aggregates "
+            f"WHERE session_id IN ({marks}) GROUP BY config_id ORDER BY config_name",
+            ids,
+        ):
+            store = _empty_totals()
+            store.update(config_id=row[0], config_name=(row[1] or '').split('(')[0].strip(), sessions=row[2],
+                         total_payments=row[3] or 0, cash_in=row[4] or 0, cash_out=row[5] or 0,
+                         difference=row[6] or 0, orders=row[7] or 0, refunds=row[8] or 0)
+            stores[row[0]] = store
+            for field in ('sessions', 'total_payments', 'cash_in', 'cash_out', 'difference', 'orders', 'refunds'):
+                totals[field] += store[field]
+        for config_id, method, amount in conn.execute(
+            "SELECT a.config_id, m.method, SUM(m.amount) FROM session_methods m "
+            "JOIN session_aggregates a ON a.session_id = m.session_id "
+            f"WHERE m.session_id IN ({marks}) GROUP BY a.config_id, m.method",
+            ids,
+        ):
+            stores[config_id]['methods'][method] = amount
+            totals['methods'][method] = totals['methods'].get(method, 0) + amount
+        for config_id in stores:
+            stores[config_id]['top_products'] = _top_products(conn, ids, top, config_id)
+        totals['top_products'] = _top_products(conn, ids, top)
+
+    return {
+        'date_from': date_from,
+        'date_to': date_to,
+        'sessions': len(sessions),
+        'materialized_now': len(stale),
+        'stores': list(stores.values()),
+        'totals': totals,
+    }
+
+
+def _empty_totals() -> dict:
+    return {'sessions': 0, 'total_payments': 0, 'cash_in': 0, 'cash_out': 0, 'difference': 0,
+            'orders': 0, 'refunds': 0, 'methods': {}, 'top_products': []}
+
+
+def _top_products(conn, session_ids: List[int], top: int, config_id: Optional[int] = None) -> List[dict]:
+    params: list = list(session_ids)
+    where = f"p.session_id IN ({','.join('?' * len(session_ids))})"
+    if config_id is not None:
+        where += " AND a.config_id = ?"
+        params.append(config_id)
+    params.append(top)
+    rows = conn.execute(
+        "SELECT p.product_id, MAX(p.product_name), SUM(p.qty), SUM(p.amount) FROM session_products p "
+        f"JOIN session_aggregates a ON a.session_id = p.session_id WHERE {where} "
+        "GROUP BY p.product_id ORDER BY SUM(p.amount) DESC LIMIT ?",
+        params,
+    ).fetchall()
+    return [{'product_id': r[0], 'product_name': r[1], 'qty': r[2], 'amount': r[3]} for r in rows]
+
+
+__all__ = ["materialize_session", "range_report"]
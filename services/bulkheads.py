@@ -0,0 +1,206 @@
+"""Bulkheads: límites de concurrencia por clase de ruta.
+
+Todas las rutas síncronas comparten el threadpool de AnyIO. Sin límites, una
+ráfaga de /whatsapp/send-pdf (cada una retiene un hilo durante la consulta a
+Odoo y las esperas de validación) deja sin hilos a /whatsapp/validate-number.
+Cada clase tiene su propio cupo y una cola de espera acotada:
+
+    report -> PDFs y reportes (send-pdf, /reports/*)
+    media  -> envíos de archivos (send-pdf-number, JSON y multipart)
+    text   -> envíos de texto (send-text, send-text-number)
+    lookup -> consultas rápidas (validate-number, estado de jobs y mensajes)
+
+Rutas sin clase (/health, /ready, /admin, /media, stream SSE) no se limitan.
+
+Con el cupo lleno el request espera en la cola hasta BULKHEAD_QUEUE_TIMEOUT
+segundos (503 si no obtiene cupo); si la cola también está llena responde 429
+de inmediato. Ambos con Retry-After. El cupo se libera al terminar de enviar
+la respuesta completa (incluye respuestas en streaming).
+
+Variables de entorno (opcionales):
+    BULKHEAD_REPORT / _MEDIA / _TEXT / _LOOKUP -> "limite:cola" (default 4:8, 8:16, 16:32, 16:64)
+    BULKHEAD_QUEUE_TIMEOUT                     -> segundos máximos en cola (default 10)
+"""
+
+import asyncio
+import json
+import math
+import os
+from typing import Dict, Optional, Tuple
+
+import anyio.to_thread
+
+from services.readiness import register_gauge
+
+_DEFAULTS: Dict[str, Tuple[int, int]] = {
+    "report": (4, 8),
+    "media": (8, 16),
+    "text": (16, 32),
+    "lookup": (16, 64),
+}
+
+# (prefijo, clase) en orden: gana el primero que coincide; clase None = sin límite
+_ROUTES = (
+    ("/whatsapp/send-pdf-number", "media"),
+    ("/whatsapp/send-pdf", "report"),
+    ("/reports/", "report"),
+    ("/whatsapp/send-text", "text"),
+    ("/whatsapp/validate-number", "lookup"),
+    ("/whatsapp/messages", "lookup"),
+    ("/whatsapp/jobs/events", None),
+    ("/whatsapp/jobs/", "lookup"),
+)
+
+# Hilos extra para rutas sin clase (admin, readiness, media) además de la suma de cupos
+_UNCLASSIFIED_THREADS = 8
+
+
+class BulkheadFull(Exception):
+    def __init__(self, name: str, status_code: int, retry_after: int):
+        self.name = name
+        self.status_code = status_code
+        self.retry_after = retry_after
+        reason = "cola llena" if status_code == 429 else "tiempo de espera agotado"
+        super().__init__(f"Capacidad de '{name}' agotada ({reason})")
+
+
+class Bulkhead:
+    def __init__(self, name: str, limit: int, queue: int, timeout: float):
+        self.name = name
+        self.limit = limit
+        self.queue = queue
+        self.timeout = timeout
+        self.active = 0
+        self.waiting = 0
+        self.rejected = 0
+        self._sem: Optional[asyncio.Semaphore] = None
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        # Se crea dentro del event loop (Python 3.9 lo asocia al crearlo)
+        if self._sem is None:
+            self._sem = asyncio.Semaphore(self.limit)
+        return self._sem
+
+    async def acquire(self) -> None:
+        sem = self._semaphore()
+        if sem.locked():
+            if self.waiting >= self.queue:
+                self.rejected += 1
+                raise BulkheadFull(self.name, 429, max(1, math.ceil(self.timeout / 2)))
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(sem.acquire(), timeout=self.timeout)
+            except asyncio.TimeoutError:
+                self.rejected += 1
+                raise BulkheadFull(self.name, 503, max(1, math.ceil(self.timeout))) from None
+            finally:
+                self.waiting -= 1
+        else:
+            await sem.acquire()
+        self.active += 1
+
+    def release(self) -> None:
+        self.active -= 1
+        self._semaphore().release()
+
+    def snapshot(self) -> dict:
+        return {"limit": self.limit, "queue": self.queue, "active": self.active,
+                "waiting": self.waiting, "rejected": self.rejected}
+
+
+def _parse(raw: Optional[str], default: Tuple[int, int]) -> Tuple[int, int]:
+    if not raw:
+        return default
+    limit, _, queue = raw.partition(":")
+    try:
+        return max(1, int(limit)), max(0, int(queue)) if queue else default[1]
+    except ValueError:
+        return default
+
+
+def _build() -> Dict[str, Bulkhead]:
+    try:
+        timeout = float(os.getenv("BULKHEAD_QUEUE_TIMEOUT") or 10)
+    except ValueError:
+        timeout = 10.0
+    bulkheads = {}
+    for name, default in _DEFAULTS.items():
+        limit, queue = _parse(os.getenv(f"BULKHEAD_{name.upper()}"), default)
+        bulkheads[name] = Bulkhead(name, limit, queue, timeout)
+    return bulkheads
+
+
+_bulkheads: Optional[Dict[str, Bulkhead]] = None
+
+
+def get_bulkheads() -> Dict[str, Bulkhead]:
+    global _bulkheads
+    if _bulkheads is None:
+        _bulkheads = _build()
+        for name, bulkhead in _bulkheads.items():
+            register_gauge(f"bulkhead_{name}_waiting", lambda b=bulkhead: b.waiting)
+    return _bulkheads
+
+
+def classify(path: str) -> Optional[str]:
+    for prefix, name in _ROUTES:
+        if path.startswith(prefix):
+            return name
+    return None
+
+
+def configure_threadpool() -> int:
+    """Agranda el threadpool de AnyIO para que quepan todos los cupos más las rutas sin clase.
+
+    Debe llamarse dentro del event loop (lifespan). Retorna el total de hilos.
+    """
+    needed = sum(b.limit for b in get_bulkheads().values()) + _UNCLASSIFIED_THREADS
+    limiter = anyio.to_thread.current_default_thread_limiter()
+    if limiter.total_tokens < needed:
+        limiter.total_tokens = needed
+    return int(limiter.total_tokens)
+
+
+def snapshot() -> Dict[str, dict]:
+    return {name: b.snapshot() for name, b in get_bulkheads().items()}
+
+
+class BulkheadMiddleware:
+    """Middleware ASGI: retiene el cupo hasta que la respuesta termina de enviarse."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        name = classify(scope["path"]) if scope["type"] == "http" else None
+        if name is None:
+            await self.app(scope, receive, send)
+            return
+        bulkhead = get_bulkheads()[name]
+        try:
+            await bulkhead.acquire()
+        except BulkheadFull as e:
+            await _reject(send, e)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            bulkhead.release()
+
+
+async def _reject(send, exc: BulkheadFull) -> None:
+    body = json.dumps({"detail": str(exc), "bulkhead": exc.name}).encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": exc.status_code,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode("ascii")),
+            (b"retry-after", str(exc.retry_after).encode("ascii")),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+__all__ = ["Bulkhead", "BulkheadFull", "BulkheadMiddleware", "classify", "configure_threadpool",
+           "get_bulkheads", "snapshot"]
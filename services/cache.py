@@ -0,0 +1,223 @@
+"""Cache con TTL detrás de un backend intercambiable.
+
+Backends:
+    memory -> dict LRU por proceso (default con un solo worker).
+    sqlite -> archivo en DATA_DIR compartido por todos los workers del host
+              (default cuando WEB_CONCURRENCY > 1).
+
+Cada uso del cache va en su propio namespace ("numbers", "reports", ...).
+
+Uso:
+    from services.cache import get_cache
+    cache = get_cache()
+    cache.set("numbers", "+573001234567", data, ttl=3600)
+    data = cache.get("numbers", "+573001234567")
+
+Variables de entorno (opcionales):
+    CACHE_BACKEND      -> memory | sqlite
+    CACHE_SQLITE_PATH  -> ruta del archivo (default DATA_DIR/cache.sqlite3)
+    CACHE_MAX_ENTRIES  -> máximo de entradas por namespace (default 2048)
+"""
+
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from services.storage import data_path, thread_connection
+
+_MISSING = object()
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name) or default)
+    except ValueError:
+        return default
+
+
+class CacheBackend:
+    """Interfaz mínima común a todos los backends."""
+
+    name = "base"
+
+    def get(self, namespace: str, key: str, default: Any = None) -> Any:
+        raise NotImplementedError
+
+    def set(self, namespace: str, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        raise NotImplementedError
+
+    def delete(self, namespace: str, key: str) -> None:
+        raise NotImplementedError
+
+    def clear(self, namespace: Optional[str] = None) -> None:
+        raise NotImplementedError
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": self.name}
+
+
+class MemoryCache(CacheBackend):
+    """Cache LRU en memoria del proceso, acotado por namespace."""
+
+    name = "memory"
+
+    def __init__(self, max_entries: int = 2048):
+        self.max_entries = max_entries
+        self._data: Dict[str, "OrderedDict[str, tuple[Optional[float], Any]]"] = {}
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, namespace: str, key: str, default: Any = None) -> Any:
+        with self._lock:
+            bucket = self._data.get(namespace)
+            entry = bucket.get(key, _MISSING) if bucket is not None else _MISSING
+            if entry is _MISSING:
+                self._misses += 1
+                return default
+            expires_at, value = entry
+            if expires_at is not None and expires_at < time.time():
+                del bucket[key]
+                self._misses += 1
+                return default
+            bucket.move_to_end(key)
+            self._hits += 1
+            return value
+
+    def set(self, namespace: str, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        expires_at = time.time() + ttl if ttl else None
+        with self._lock:
+            bucket = self._data.setdefault(namespace, OrderedDict())
+            bucket[key] = (expires_at, value)
+            bucket.move_to_end(key)
+            while len(bucket) > self.max_entries:
+                bucket.popitem(last=False)
+
+    def delete(self, namespace: str, key: str) -> None:
+        with self._lock:
+            bucket = self._data.get(namespace)
+            if bucket is not None:
+                bucket.pop(key, None)
+
+    def clear(self, namespace: Optional[str] = None) -> None:
+        with self._lock:
+            if namespace is None:
+                self._data.clear()
+            else:
+                self._data.pop(namespace, None)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            sizes = {ns: len(bucket) for ns, bucket in self._data.items()}
+            return {"backend": self.name, "hits": self._hits, "misses": self._misses, "entries": sizes}
+
+
+class SQLiteCache(CacheBackend):
+    """Cache persistido en SQLite (WAL), compartido entre procesos del mismo host."""
+
+    name = "sqlite"
+    _PURGE_EVERY = 200  # cada cuántos set() se purgan expirados/exceso
+
+    def __init__(self, path: str, max_entries: int = 2048):
+        self.path = path
+        self.max_entries = max_entries
+        self._writes = 0
+        self._lock = threading.Lock()
+        conn = thread_connection(self.path)
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            " namespace TEXT NOT NULL, key TEXT NOT NULL, value BLOB NOT NULL,"
+            " expires_at REAL, updated_at REAL NOT NULL,"
+            " PRIMARY KEY (namespace, key))"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS cache_expires ON cache(expires_at)")
+
+    def _conn(self):
+        return thread_connection(self.path)
+
+    def get(self, namespace: str, key: str, default: Any = None) -> Any:
+        row = self._conn().execute(
+            "SELECT value, expires_at FROM cache WHERE namespace = ? AND key = ?",
+            (namespace, key),
+        ).fetchone()
+        if row is None:
+            return default
+        value, expires_at = row
+        if expires_at is not None and expires_at < time.time():
+            self.delete(namespace, key)
+            return default
+        try:
+            return pickle.loads(value)
+        except Exception:
+            self.delete(namespace, key)
+            return default
+
+    def set(self, namespace: str, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        now = time.time()
+        expires_at = now + ttl if ttl else None
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        conn = self._conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO cache (namespace, key, value, expires_at, updated_at) VALUES (?, ?, ?, ?, ?)",
+            (namespace, key, blob, expires_at, now),
+        )
+        with self._lock:
+            self._writes += 1
+            purge = self._writes % self._PURGE_EVERY == 0
+        if purge:
+            self._purge(conn, namespace, now)
+
+    def _purge(self, conn, namespace: str, now: float) -> None:
+        conn.execute("DELETE FROM cache WHERE expires_at IS NOT NULL AND expires_at < ?", (now,))
+        conn.execute(
+            "DELETE FROM cache WHERE namespace = ? AND key NOT IN ("
+            " SELECT key FROM cache WHERE namespace = ? ORDER BY updated_at DESC LIMIT ?)",
+            (namespace, namespace, self.max_entries),
+        )
+
+    def delete(self, namespace: str, key: str) -> None:
+        self._conn().execute("DELETE FROM cache WHERE namespace = ? AND key = ?", (namespace, key))
+
+    def clear(self, namespace: Optional[str] = None) -> None:
+        if namespace is None:
+            self._conn().execute("DELETE FROM cache")
+        else:
+            self._conn().execute("DELETE FROM cache WHERE namespace = ?", (namespace,))
+
+    def stats(self) -> Dict[str, Any]:
+        rows = self._conn().execute("SELECT namespace, COUNT(*) FROM cache GROUP BY namespace").fetchall()
+        return {"backend": self.name, "path": self.path, "entries": dict(rows)}
+
+
+_cache: Optional[CacheBackend] = None
+_cache_lock = threading.Lock()
+
+
+def _default_backend_name() -> str:
+    # Con varios workers un cache en memoria no se comparte: usar SQLite
+    return "sqlite" if _env_int("WEB_CONCURRENCY", 1) > 1 else "memory"
+
+
+def get_cache() -> CacheBackend:
+    """Instancia única del backend configurado por CACHE_BACKEND."""
+    global _cache
+    if _cache is not None:
+        return _cache
+    with _cache_lock:
+        if _cache is None:
+            backend = (os.getenv("CACHE_BACKEND") or _default_backend_name()).lower()
+            max_entries = _env_int("CACHE_MAX_ENTRIES", 2048)
+            if backend == "sqlite":
+                path = os.getenv("CACHE_SQLITE_PATH") or data_path("cache.sqlite3")
+                _cache = SQLiteCache(path, max_entries=max_entries)
+            elif backend == "memory":
+                _cache = MemoryCache(max_entries=max_entries)
+            else:
+                raise ValueError(f"CACHE_BACKEND inválido: {backend} (use memory o sqlite)")
+    return _cache
+
+
+__all__ = ["CacheBackend", "MemoryCache", "SQLiteCache", "get_cache"]
@@ -0,0 +1,66 @@
+"""Alias de chats de WhatsApp (traspasos, cierres, ...) -> JID.
+
+Cada alias se resuelve desde una o más variables de entorno (la primera
+definida gana). El JID resuelto se guarda en memoria: el entorno no cambia en
+caliente y el warm-up de arranque resuelve todos los alias de una vez.
+"""
+
+import os
+import threading
+from typing import Dict, List
+
+CHAT_MAPPING: Dict[str, List[str]] = {
+    "traspasos": ["WHATSAPP_TRASPASOS"],
+    "pedidos": ["WHATSAPP_PEDIDOS"],
+    "pruebas": ["WHATSAPP_PRUEBAS"],
+    "atm": ["WHATSAPP_ATM"],
+    "cierres": ["CHAT_CIERRES", "WHATSAPP_CIERRES"],
+    "retiradas": ["WHATSAPP_RETIRADAS"],
+}
+
+_resolved: Dict[str, str] = {}
+_lock = threading.Lock()
+
+
+class UnknownChatAliasError(ValueError):
+    """El alias no está en CHAT_MAPPING."""
+
+
+class ChatNotConfiguredError(RuntimeError):
+    """El alias existe pero ninguna de sus variables de entorno está definida."""
+
+
+def resolve_jid(alias: str) -> str:
+    """Devuelve el JID configurado para `alias` (case-insensitive)."""
+    key = alias.lower()
+    jid = _resolved.get(key)
+    if jid:
+        return jid
+    env_keys = CHAT_MAPPING.get(key)
+    if not env_keys:
+        raise UnknownChatAliasError(f"Alias desconocido: {alias}. Use: {', '.join(CHAT_MAPPING.keys())}")
+    for env_key in env_keys:
+        value = os.getenv(env_key)
+        if value:
+            with _lock:
+                _resolved[key] = value
+            return value
+    raise ChatNotConfiguredError(f"Variables de entorno no definidas: {', '.join(env_keys)}")
+
+
+def preload_aliases() -> Dict[str, str]:
+    """Resuelve todos los alias configurados (los no configurados se omiten)."""
+    for alias in CHAT_MAPPING:
+        try:
+            resolve_jid(alias)
+        except ChatNotConfiguredError:
+            continue
+    return dict(_resolved)
+
+
+def clear_resolved() -> None:
+    with _lock:
+        _resolved.clear()
+
+
+__all__ = ["CHAT_MAPPING", "resolve_jid", "preload_aliases", "clear_resolved", "UnknownChatAliasError", "ChatNotConfiguredError"]
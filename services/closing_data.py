@@ -0,0 +1,231 @@
+"""Datos del cierre en formato máquina (JSON / CSV) sin renderizar el PDF.
+
+Antes de responder solo se consultan los totales (load_report_summary: un lote
+de Odoo con read_group de caja y por método y conteo de órdenes; las líneas de
+extracto solo si se pide la sección cash),
+así los errores de Odoo todavía llegan con su código HTTP. Órdenes y líneas se
+leen por páginas (iter_sales_details) mientras se emite la respuesta: la
+memoria depende del tamaño de página, no de la sesión. La salida se junta en
+bloques de ~64 KB (cada bloque es un salto al threadpool en StreamingResponse).
+
+Los movimientos de inventario (get_stock_movements, una fila por producto) se
+calculan antes de responder.
+
+Secciones (CSV: una por request; JSON: todas en un solo objeto):
+    summary -> saldos, diferencias, totales de ventas e ingresos/retiradas
+    methods -> desglose por método de pago
+    cash    -> ingresos y retiradas de efectivo
+    orders  -> una fila por orden (pagos resumidos)
+    lines   -> una fila por línea de orden
+    stock   -> movimientos de inventario de la sesión
+"""
+
+import csv
+import io
+import json
+from typing import Iterable, Iterator, List, Optional
+
+from services.formatting import adjust_time
+from services.pdf_service import get_stock_movements, iter_sales_details, load_report_summary
+
+SECTIONS = ("summary", "methods", "cash", "orders", "lines", "stock")
+
+# Tamaño aproximado de cada bloque emitido
+_CHUNK_BYTES = 64 * 1024
+# Órdenes por página leída de Odoo
+_ORDERS_PAGE = 200
+
+
+class ClosingData:
+    """Datos ya consultados de una sesión; serializarlos no vuelve a Odoo."""
+
+    def __init__(self, session: dict, summary: dict, stock: Optional[List[dict]]):
+        self.session = session
+        self.summary = summary
+        self.stock = stock
+
+    def sales_details(self) -> Iterator[dict]:
+        """Órdenes de la sesión, leídas de Odoo página por página."""
+        for page in iter_sales_details(self.session['id'], page_size=_ORDERS_PAGE):
+            yield from page
+
+
+def load_closing_data(session: dict, include_stock: bool = True, include_cash: bool = True) -> ClosingData:
+    """Consulta los totales antes de empezar a responder (los errores se reportan con su código HTTP).
+
+    Sin `include_cash` no se descargan las líneas de extracto (la sección cash queda vacía).
+    """
+    summary = load_report_summary(session['id'], include_movements=include_cash)
+    stock = get_stock_movements(session['id']) if include_stock else None
+    return ClosingData(session, summary, stock)
+
+
+# -- filas por sección ---------------------------------------------------------
+
+def _summary(data: ClosingData) -> dict:
+    session = data.session
+    return {
+        'session_id': session['id'],
+        'session_name': session.get('name'),
+        'pos_name': session['config_id'][1].split('(')[0].strip(),
+        'state': session.get('state'),
+        'start_at': adjust_time(session['start_at']),
+        'stop_at': adjust_time(session['stop_at']) if session.get('stop_at') else None,
+        'balance_start': session['cash_register_balance_start'],
+        'opening_difference': session.get('cash_register_balance_start_difference', 0),
+        'balance_end_real': session['cash_register_balance_end_real'],
+        'closing_difference': session['cash_register_difference'],
+        'total_sales': session['total_payments_amount'],
+        'cash_sales': data.summary['cash_sales'],
+        'other_sales': data.summary['other_sales'],
+        'total_cash_in': data.summary['cash_in_total'],
+        'total_cash_out': abs(data.summary['cash_out_total']),
+        'orders': data.summary['order_count'],
+    }
+
+
+def _methods(data: ClosingData) -> Iterator[dict]:
+    for method, amount in data.summary['sorted_methods']:
+        yield {'method': method, 'amount': amount}
+
+
+def _cash(data: ClosingData) -> Iterator[dict]:
+    for kind in ('cash_in', 'cash_out'):
+        for movement in data.summary[kind] or ():
+            yield {'type': 'in' if kind == 'cash_in' else 'out',
+                   'concept': movement['payment_ref'], 'amount': movement['amount']}
+
+
+def _line(line: dict) -> dict:
+    return {
+        'product_id': line['product_id'][0],
+        'product_name': line['product_id'][1],
+        'qty': line['qty'],
+        'price_unit': line['price_unit'],
+        'price_subtotal': line['price_subtotal'],
+    }
+
+
+def _order(order: dict) -> dict:
+    return {
+        'order_name': order['order_name'],
+        'order_date': order['order_date'],
+        'amount': order['order_amount'],
+        'is_refund': order['is_refund'],
+        'payments': [{k: v for k, v in p.items() if k != 'is_cash'} for p in order['payments']],
+        'lines': [_line(line) for line in order['lines']],
+    }
+
+
+def _order_rows(data: ClosingData) -> Iterator[dict]:
+    for order in data.sales_details():
+        yield {
+            'order_name': order['order_name'],
+            'order_date': order['order_date'],
+            'amount': order['order_amount'],
+            'is_refund': order['is_refund'],
+            'payments': '; '.join(f"{p['method']}={p['amount']}" for p in order['payments']),
+            'lines': len(order['lines']),
+        }
+
+
+def _line_rows(data: ClosingData) -> Iterator[dict]:
+    for order in data.sales_details():
+        for line in order['lines']:
+            yield {'order_name': order['order_name'], 'order_date': order['order_date'],
+                   'is_refund': order['is_refund'], **_line(line)}
+
+
+def _stock_rows(data: ClosingData) -> Iterator[dict]:
+    return iter(data.stock or [])
+
+
+_CSV_COLUMNS = {
+    'methods': ['method', 'amount'],
+    'cash': ['type', 'concept', 'amount'],
+    'orders': ['order_name', 'order_date', 'amount', 'is_refund', 'payments', 'lines'],
+    'lines': ['order_name', 'order_date', 'is_refund', 'product_id', 'product_name', 'qty', 'price_unit', 'price_subtotal'],
+    'stock': ['product_name', 'initial_stock', 'sales', 'entries', 'exits', 'current_stock'],
+}
+
+_ROWS = {
+    'summary': lambda data: iter([_summary(data)]),
+    'methods': _methods,
+    'cash': _cash,
+    'orders': _order_rows,
+    'lines': _line_rows,
+    'stock': _stock_rows,
+}
+
+
+# -- serialización -------------------------------------------------------------
+
+def _chunked(parts: Iterable[str]) -> Iterator[str]:
+    """Junta las partes en bloques de ~_CHUNK_BYTES caracteres."""
+    buffer: List[str] = []
+    size = 0
+    for part in parts:
+        buffer.append(part)
+        size += len(part)
+        if size >= _CHUNK_BYTES:
+            yield ''.join(buffer)
+            buffer, size = [], 0
+    if buffer:
+        yield ''.join(buffer)
+
+
+def iter_csv(data: ClosingData, section: str) -> Iterator[str]:
+    """CSV de una sección (con encabezado) en bloques de ~64 KB."""
+    if section not in _ROWS:
+        raise ValueError(f"Sección inválida: {section}. Opciones: {', '.join(SECTIONS)}")
+    return _chunked(_csv_rows(data, section))
+
+
+def _csv_rows(data: ClosingData, section: str) -> Iterator[str]:
+    rows = _ROWS[section](data)
+    columns = _CSV_COLUMNS.get(section) or list(_summary(data).keys())
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=columns, extrasaction='ignore')
+
+    def flush() -> str:
+        chunk = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+        return chunk
+
+    writer.writeheader()
+    yield flush()
+    for row in rows:
+        writer.writerow(row)
+        yield flush()
+
+
+def _json_array(items: Iterable) -> Iterator[str]:
+    yield '['
+    first = True
+    for item in items:
+        yield ('' if first else ',') + json.dumps(item)
+        first = False
+    yield ']'
+
+
+def iter_json(data: ClosingData) -> Iterator[str]:
+    """Documento JSON completo en bloques de ~64 KB."""
+    return _chunked(_json_parts(data))
+
+
+def _json_parts(data: ClosingData) -> Iterator[str]:
+    yield '{"summary":' + json.dumps(_summary(data))
+    yield ',"methods":'
+    yield from _json_array(_methods(data))
+    yield ',"cash":'
+    yield from _json_array(_cash(data))
+    yield ',"orders":'
+    yield from _json_array(_order(order) for order in data.sales_details())
+    if data.stock is not None:
+        yield ',"stock":'
+        yield from _json_array(data.stock)
+    yield '}'
+
+
+__all__ = ["SECTIONS", "ClosingData", "load_closing_data", "iter_csv", "iter_json"]
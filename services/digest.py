@@ -0,0 +1,227 @@
+"""Modo resumen (digest): agrupa alertas frecuentes a un mismo chat.
+
+Para los alias configurados en DIGEST_ALIASES, los mensajes que llegan a
+/whatsapp/send-text dentro de la ventana del alias se juntan en un solo
+mensaje (una línea con hora por alerta) y se envían con un único
+send_and_validate, así N alertas cuestan un envío y una confirmación.
+
+El request responde 202 apenas el mensaje entra al lote: no retiene un hilo
+del threadpool ni un cupo del bulkhead "text" durante la ventana (con una
+ráfaga, los cupos se agotarían antes de que el lote se llene). Cada lote es un
+job de services.jobs: todos los mensajes del lote reciben el mismo job_id y
+comparten su resultado (GET /whatsapp/jobs/{id} o el stream SSE). El envío
+también queda en el ledger con el alias (GET /whatsapp/messages?alias=...).
+
+Al apagar el proceso (lifespan) flush_all envía los lotes abiertos y espera
+los envíos en curso hasta DIGEST_FLUSH_TIMEOUT segundos: las alertas ya
+respondidas con 202 no se pierden en un redeploy.
+
+El lote sale al vencer la ventana (contada desde el primer mensaje) o antes si
+alcanza DIGEST_MAX_MESSAGES mensajes o DIGEST_MAX_CHARS caracteres. Los envíos
+con async_send/callback_url no se agrupan.
+
+Variables de entorno (opcionales):
+    DIGEST_ALIASES       -> alias:segundos separados por coma, ej: "traspasos:20,pedidos:30"
+    DIGEST_MAX_MESSAGES  -> mensajes máximos por lote (default 20)
+    DIGEST_MAX_CHARS     -> caracteres máximos por lote (default 4000)
+    DIGEST_FLUSH_TIMEOUT -> segundos máximos enviando lotes al apagar (default 20)
+"""
+
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from clients.breaker import CircuitOpenError
+from clients.whatsapp import send_and_validate
+from services import jobs
+from services.formatting import to_report_tz
+from services.readiness import register_gauge
+
+logger = logging.getLogger(__name__)
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return max(1, int(os.getenv(name) or default))
+    except ValueError:
+        return default
+
+
+def windows() -> Dict[str, float]:
+    """DIGEST_ALIASES parseado: {alias: segundos de ventana}."""
+    result: Dict[str, float] = {}
+    for item in (os.getenv("DIGEST_ALIASES") or "").split(","):
+        alias, _, seconds = item.partition(":")
+        try:
+            window = float(seconds)
+        except ValueError:
+            continue
+        if alias.strip() and window > 0:
+            result[alias.strip().lower()] = window
+    return result
+
+
+class _Batch:
+    def __init__(self, jid: str, job: dict):
+        self.jid = jid
+        self.job = job
+        self.messages: List[Tuple[datetime, str]] = []
+        self.chars = 0
+
+    def add(self, message: str) -> None:
+        self.messages.append((datetime.utcnow(), message))
+        self.chars += len(message)
+
+
+class Coalescer:
+    """Lote abierto de un alias; el primer mensaje arranca el temporizador de la ventana."""
+
+    def __init__(self, alias: str, window: float, max_messages: int, max_chars: int):
+        self.alias = alias
+        self.window = window
+        self.max_messages = max_messages
+        self.max_chars = max_chars
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._open: Optional[_Batch] = None
+        self.pending = 0
+
+    def submit(self, jid: str, message: str) -> Tuple[str, int]:
+        """Agrega el mensaje al lote abierto sin esperar el envío.
+
+        Retorna (job_id del lote, tamaño actual del lote).
+        """
+        ready: List[_Batch] = []
+        with self._lock:
+            batch = self._open
+            if batch and (batch.jid != jid or batch.chars + len(message) > self.max_chars):
+                ready.append(batch)
+                batch = self._open = None
+            if batch is None:
+                batch = self._open = _Batch(jid, jobs.create_job(kind="digest", alias=self.alias))
+                timer = threading.Timer(self.window, self._expire, args=(batch,))
+                timer.daemon = True
+                timer.start()
+            batch.add(message)
+            self.pending += 1
+            size = len(batch.messages)
+            if size >= self.max_messages:
+                ready.append(batch)
+                self._open = None
+        for full in ready:
+            self._send_in_background(full)
+        return batch.job["job_id"], size
+
+    def _send_in_background(self, batch: _Batch) -> None:
+        threading.Thread(target=self._send, args=(batch,), name=f"digest-{self.alias}", daemon=True).start()
+
+    def close_open(self) -> None:
+        """Envía ya el lote abierto (sin esperar la ventana)."""
+        with self._lock:
+            batch, self._open = self._open, None
+        if batch:
+            self._send_in_background(batch)
+
+    def wait_idle(self, timeout: float) -> bool:
+        """Espera hasta `timeout` segundos a que no queden mensajes sin enviar."""
+        deadline = time.monotonic() + timeout
+        with self._idle:
+            while self.pending:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._idle.wait(remaining)
+        return True
+
+    def _expire(self, batch: _Batch) -> None:
+        with self._lock:
+            if self._open is not batch:
+                return  # ya salió por tamaño
+            self._open = None
+        self._send(batch)
+
+    def _send(self, batch: _Batch) -> None:
+        size = len(batch.messages)
+        try:
+            try:
+                result = send_and_validate(batch.jid, format_digest(batch.messages), alias=self.alias)
+            except CircuitOpenError as e:
+                result = str(e)
+            except Exception as e:  # noqa: BLE001
+                result = f"Error al enviar: {e}"
+            level = logging.INFO if result == "Mensaje enviado y validado" else logging.WARNING
+            logger.log(level, "resumen '%s' (%d mensajes): %s", self.alias, size, result,
+                       extra={"alias": self.alias, "batch_size": size})
+            try:
+                jobs.finish_job(batch.job, result, batch_size=size)
+            except Exception as e:  # noqa: BLE001
+                logger.warning("resumen '%s': no se pudo registrar el job %s: %s", self.alias, batch.job["job_id"], e)
+        finally:
+            # Después de registrar el job: flush_all espera hasta aquí
+            with self._idle:
+                self.pending -= size
+                self._idle.notify_all()
+
+
+def format_digest(messages: List[Tuple[datetime, str]]) -> str:
+    """Un mensaje solo se envía tal cual; varios van con encabezado y hora local de cada uno."""
+    if len(messages) == 1:
+        return messages[0][1]
+    lines = [f"*{len(messages)} alertas*"]
+    for received_at, message in messages:
+        lines.append(f"[{to_report_tz(received_at).strftime('%H:%M:%S')}] {message}")
+    return "\n".join(lines)
+
+
+_coalescers: Dict[str, Coalescer] = {}
+_lock = threading.Lock()
+
+
+def get_coalescer(alias: str) -> Optional[Coalescer]:
+    """Coalescer del alias, o None si el alias no tiene modo resumen."""
+    key = alias.lower()
+    coalescer = _coalescers.get(key)
+    if coalescer is not None:
+        return coalescer
+    window = windows().get(key)
+    if window is None:
+        return None
+    with _lock:
+        coalescer = _coalescers.get(key)
+        if coalescer is None:
+            coalescer = _coalescers[key] = Coalescer(
+                key, window, _env_int("DIGEST_MAX_MESSAGES", 20), _env_int("DIGEST_MAX_CHARS", 4000)
+            )
+    return coalescer
+
+
+def pending_messages() -> int:
+    return sum(c.pending for c in list(_coalescers.values()))
+
+
+def flush_all(timeout: Optional[float] = None) -> int:
+    """Envía los lotes abiertos y espera los envíos en curso. Retorna los mensajes que quedaron sin enviar."""
+    if timeout is None:
+        try:
+            timeout = float(os.getenv("DIGEST_FLUSH_TIMEOUT") or 20)
+        except ValueError:
+            timeout = 20.0
+    coalescers = list(_coalescers.values())
+    for coalescer in coalescers:
+        coalescer.close_open()
+    deadline = time.monotonic() + timeout
+    for coalescer in coalescers:
+        coalescer.wait_idle(max(0.0, deadline - time.monotonic()))
+    left = pending_messages()
+    if left:
+        logger.warning("resumen: %d mensajes sin enviar al apagar", left, extra={"pending": left})
+    return left
+
+
+register_gauge("digest_pending_messages", pending_messages)
+
+
+__all__ = ["Coalescer", "get_coalescer", "format_digest", "pending_messages", "flush_all", "windows"]
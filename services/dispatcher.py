@@ -0,0 +1,367 @@
+"""Despachador automático de cierres.
+
+Un hilo en segundo plano consulta cada DISPATCHER_INTERVAL segundos las
+sesiones POS cerradas desde el último cursor (un solo search_read para todas
+las tiendas), genera el PDF fuera del camino de los requests y lo envía al
+chat configurado para su pos.config.
+
+Persistencia (DATA_DIR/dispatcher.sqlite3):
+    cursor     -> (write_date, id) más alto ya resuelto. La consulta pide desde
+                  write_date - DISPATCHER_OVERLAP_SECONDS: Odoo pone write_date
+                  con la hora de inicio de la transacción, así que un cierre
+                  cuya transacción confirma después de que el cursor pasó su
+                  hora igual entra en la ventana.
+    deliveries -> una fila por sesión (sent / skipped / failed + intentos):
+                  las sesiones de la ventana ya resueltas se saltan aquí.
+El ledger de mensajes evita reenviar: un cierre ya validado en el chat se
+omite, y si el bridge aceptó un envío que no se pudo confirmar, los reintentos
+lo verifican por key.id (message_exists) en lugar de mandar el PDF otra vez.
+Una sesión con fallo reintentable no detiene las siguientes del ciclo, pero el
+cursor no la pasa hasta que se resuelva.
+Tras resolver cada sesión se materializan sus agregados (services.aggregates)
+para que los reportes por rango no tengan que calcularlos.
+En el primer arranque el cursor empieza en la hora actual (no se reenvían
+cierres históricos) salvo que se defina DISPATCHER_START.
+
+Con varios workers solo uno despacha: el que toma el lock exclusivo de
+DATA_DIR/dispatcher.lock. Los demás reintentan tomarlo en cada intervalo.
+
+Variables de entorno:
+    DISPATCHER_ENABLED      -> 1 para activar (default desactivado)
+    CLOSING_CHAT_MAP        -> pos.config id -> alias de chat o JID, ej: "1:cierres,3:1203...@g.us"
+    DISPATCHER_DEFAULT_CHAT -> alias/JID para configs sin mapeo (sin definir: se omiten)
+    DISPATCHER_INTERVAL     -> segundos entre consultas (default 60)
+    DISPATCHER_MAX_ATTEMPTS -> intentos de envío por sesión antes de marcarla failed (default 3)
+    DISPATCHER_START        -> write_date inicial del cursor (ej: "2025-03-01 00:00:00")
+    DISPATCHER_OVERLAP_SECONDS -> ventana hacia atrás del cursor en cada consulta (default 600)
+"""
+
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional, Tuple
+
+from clients.breaker import CircuitOpenError
+from clients.whatsapp import message_exists, send_and_validate
+from services import aggregates, ledger
+from services.chats import resolve_jid
+from services.pdf_service import generate_pdf, list_closed_sessions
+from services.storage import data_path, thread_connection
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows (desarrollo local)
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+_ODOO_FORMAT = "%Y-%m-%d %H:%M:%S"
+# Sesiones por consulta a Odoo (se pagina hasta agotar la ventana)
+_PAGE_SIZE = 50
+
+SENT = "sent"
+SKIPPED = "skipped"
+FAILED = "failed"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS dispatcher_state (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS deliveries (
+    session_id INTEGER PRIMARY KEY,
+    session_name TEXT,
+    write_date TEXT,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    detail TEXT,
+    updated_at REAL NOT NULL
+);
+"""
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name) or default)
+    except ValueError:
+        return default
+
+
+def _overlap_start(since: str) -> str:
+    """`since` menos DISPATCHER_OVERLAP_SECONDS (mismo formato Odoo)."""
+    overlap = max(0.0, _env_float("DISPATCHER_OVERLAP_SECONDS", 600))
+    try:
+        start = datetime.strptime(since[:19], _ODOO_FORMAT)
+    except ValueError:
+        return since
+    return (start - timedelta(seconds=overlap)).strftime(_ODOO_FORMAT)
+
+
+def enabled() -> bool:
+    return os.getenv("DISPATCHER_ENABLED", "0") in {"1", "true", "True", "yes", "on"}
+
+
+def chat_map() -> Dict[int, str]:
+    """CLOSING_CHAT_MAP parseado: {config_id: alias o JID}."""
+    mapping: Dict[int, str] = {}
+    for item in (os.getenv("CLOSING_CHAT_MAP") or "").split(","):
+        if ":" not in item:
+            continue
+        config_id, chat = item.split(":", 1)
+        if config_id.strip().isdigit() and chat.strip():
+            mapping[int(config_id.strip())] = chat.strip()
+    return mapping
+
+
+def _chat_for(config_id: int) -> Optional[str]:
+    chat = chat_map().get(config_id) or os.getenv("DISPATCHER_DEFAULT_CHAT")
+    if not chat:
+        return None
+    return chat if "@" in chat else resolve_jid(chat)
+
+
+class ClosingDispatcher:
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.db_path = data_path("dispatcher.sqlite3")
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock_file = None
+        self._schema_ready = False
+        self.last_run: Optional[float] = None
+        self.last_error: Optional[str] = None
+
+    # -- persistencia -------------------------------------------------------
+
+    def _conn(self):
+        conn = thread_connection(self.db_path)
+        if not self._schema_ready:
+            conn.executescript(_SCHEMA)
+            self._schema_ready = True
+        return conn
+
+    def _read_cursor(self) -> Optional[Tuple[str, int]]:
+        row = self._conn().execute("SELECT value FROM dispatcher_state WHERE key = 'cursor'").fetchone()
+        if not row:
+            return None
+        write_date, _, last_id = row[0].partition("|")
+        return write_date, int(last_id or 0)
+
+    def get_cursor(self) -> Tuple[str, int]:
+        """(write_date, id) de la última sesión resuelta; lo inicializa en el primer uso."""
+        cursor = self._read_cursor()
+        if cursor:
+            return cursor
+        start = os.getenv("DISPATCHER_START") or datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+        self._set_cursor(start, 0)
+        return start, 0
+
+    def _set_cursor(self, write_date: str, last_id: int) -> None:
+        # Las sesiones de la ventana de solapamiento no hacen retroceder el cursor
+        current = self._read_cursor()
+        if current and (write_date, last_id) <= current:
+            return
+        self._conn().execute(
+            "INSERT INTO dispatcher_state (key, value) VALUES ('cursor', ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+            (f"{write_date}|{last_id}",),
+        )
+
+    def _delivery(self, session_id: int) -> Optional[tuple]:
+        return self._conn().execute(
+            "SELECT status, attempts FROM deliveries WHERE session_id = ?", (session_id,)
+        ).fetchone()
+
+    def _record(self, session: dict, status: str, attempts: int, detail: Optional[str]) -> None:
+        self._conn().execute(
+            "INSERT INTO deliveries (session_id, session_name, write_date, status, attempts, detail, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT(session_id) DO UPDATE SET "
+            "write_date = excluded.write_date, status = excluded.status, attempts = excluded.attempts, "
+            "detail = excluded.detail, updated_at = excluded.updated_at",
+            (session["id"], session["name"], session["write_date"], status, attempts, detail, time.time()),
+        )
+
+    # -- liderazgo ----------------------------------------------------------
+
+    def _acquire_leadership(self) -> bool:
+        if self._lock_file is not None:
+            return True
+        if fcntl is None:
+            self._lock_file = True
+            return True
+        fh = open(data_path("dispatcher.lock"), "w")
+        try:
+            fcntl.flock(fh, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            fh.close()
+            return False
+        self._lock_file = fh
+        return True
+
+    # -- ciclo --------------------------------------------------------------
+
+    def run_once(self) -> int:
+        """Procesa las sesiones cerradas pendientes. Retorna cuántas se enviaron."""
+        max_attempts = int(_env_float("DISPATCHER_MAX_ATTEMPTS", 3))
+        sent = 0
+        since, _ = self.get_cursor()
+        window_start = _overlap_start(since)
+        offset = 0
+        # Tras una sesión pendiente de reintento el cursor no avanza en este
+        # ciclo: las siguientes se registran en deliveries y se saltan después
+        hold_cursor = False
+        while True:
+            sessions = list_closed_sessions(window_start, limit=_PAGE_SIZE, offset=offset)
+            for session in sessions:
+                previous = self._delivery(session["id"])
+                if previous and previous[0] in (SENT, SKIPPED, FAILED):
+                    if not hold_cursor:
+                        self._set_cursor(session["write_date"], session["id"])
+                    continue
+                attempts = (previous[1] if previous else 0) + 1
+                status, detail = self._deliver(session)
+                if status is None:
+                    if attempts < max_attempts:
+                        self._record(session, "retry", attempts, detail)
+                        logger.warning("%s: intento %d fallido: %s", session['name'], attempts, detail,
+                                       extra={"session": session['name'], "attempt": attempts})
+                        hold_cursor = True
+                        continue
+                    status = FAILED
+                self._record(session, status, attempts, detail)
+                if not hold_cursor:
+                    self._set_cursor(session["write_date"], session["id"])
+                logger.info("%s: %s (%s)", session['name'], status, detail,
+                            extra={"session": session['name'], "status": status})
+                if status == SENT:
+                    sent += 1
+                self._materialize(session)
+            if len(sessions) < _PAGE_SIZE:
+                return sent
+            offset += len(sessions)
+
+    def _deliver(self, session: dict):
+        """(estado, detalle); estado None = fallo reintentable."""
+        config_id = session["config_id"][0] if session.get("config_id") else None
+        try:
+            jid = _chat_for(config_id) if config_id else None
+        except Exception as e:  # noqa: BLE001
+            return SKIPPED, f"Chat no configurado: {e}"
+        if not jid:
+            return SKIPPED, f"Sin chat para pos.config {config_id}"
+        # Enviado antes por otra vía (ej: /whatsapp/send-pdf) o con el historial de entregas perdido
+        previous = ledger.already_delivered(session["name"], jid)
+        if previous:
+            return SKIPPED, f"Ya enviado a este chat (mensaje {previous['message_id']})"
+        # El bridge aceptó un envío anterior sin confirmarlo: se verifica, no se reenvía
+        unconfirmed = ledger.unconfirmed_delivery(session["name"], jid)
+        if unconfirmed:
+            return self._recheck(unconfirmed, jid)
+        try:
+            filename = generate_pdf(session)
+        except CircuitOpenError as e:
+            return None, str(e)
+        except Exception as e:  # noqa: BLE001
+            return None, f"Error generando PDF: {e}"
+        abs_path = os.path.abspath(filename)
+        try:
+            result = send_and_validate(
+                jid,
+                None,
+                file_path=abs_path,
+                file_name=filename,
+                attempts=6,
+                delay_seconds=1.5,
+                auto_caption=False,
+                alias=chat_map().get(config_id) or os.getenv("DISPATCHER_DEFAULT_CHAT"),
+                pos_name=session["name"],
+            )
+        except CircuitOpenError as e:
+            return None, str(e)
+        finally:
+            try:
+                if os.path.exists(abs_path):
+                    os.remove(abs_path)
+            except OSError:
+                pass
+        if result == "Mensaje enviado y validado":
+            return SENT, result
+        return None, result
+
+    def _recheck(self, message: dict, jid: str):
+        """(estado, detalle) de un envío aceptado sin confirmar, consultado por key.id."""
+        message_id = message["message_id"]
+        try:
+            found = message_exists(jid, message_id, instance=message.get("instance"))
+        except CircuitOpenError as e:
+            return None, str(e)
+        except Exception as e:  # noqa: BLE001
+            return None, f"Error verificando el envío previo {message_id}: {e}"
+        if not found:
+            return None, f"Envío previo {message_id} sin confirmar; no se reenvía"
+        ledger.record_confirmation(message_id, jid, True, "Mensaje enviado y validado", 0.0)
+        return SENT, f"Mensaje enviado y validado (mensaje {message_id}, verificado en reintento)"
+
+    def _materialize(self, session: dict) -> None:
+        # Deja listos los agregados para los reportes por rango; si falla se
+        # calculan al pedir el reporte.
+        try:
+            aggregates.materialize_session(session)
+        except Exception as e:  # noqa: BLE001
+            logger.warning("%s: agregados no materializados: %s", session['name'], e)
+
+    def _loop(self) -> None:
+        while not self._stop.is_set():
+            if self._acquire_leadership():
+                try:
+                    self.run_once()
+                    self.last_error = None
+                except Exception as e:  # noqa: BLE001
+                    self.last_error = str(e)
+                    logger.exception("Error en el ciclo del despachador: %s", e)
+                self.last_run = time.time()
+            self._stop.wait(self.interval)
+
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="closing-dispatcher", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def status(self) -> dict:
+        conn = self._conn()
+        cursor = self._read_cursor()
+        counts = dict(conn.execute("SELECT status, COUNT(*) FROM deliveries GROUP BY status").fetchall())
+        recent = conn.execute(
+            "SELECT session_id, session_name, status, attempts, detail, updated_at FROM deliveries "
+            "ORDER BY updated_at DESC LIMIT 20"
+        ).fetchall()
+        return {
+            "enabled": enabled(),
+            "leader": self._lock_file is not None,
+            # Solo lectura: consultar el estado no inicializa el cursor
+            "cursor": "|".join(str(part) for part in cursor) if cursor else None,
+            "last_run": self.last_run,
+            "last_error": self.last_error,
+            "counts": counts,
+            "recent": [
+                dict(zip(("session_id", "session_name", "status", "attempts", "detail", "updated_at"), row))
+                for row in recent
+            ],
+        }
+
+
+_dispatcher: Optional[ClosingDispatcher] = None
+
+
+def get_dispatcher() -> ClosingDispatcher:
+    global _dispatcher
+    if _dispatcher is None:
+        _dispatcher = ClosingDispatcher(max(5.0, _env_float("DISPATCHER_INTERVAL", 60)))
+    return _dispatcher
+
+
+__all__ = ["ClosingDispatcher", "get_dispatcher", "enabled", "chat_map", "SENT", "SKIPPED", "FAILED"]
@@ -0,0 +1,164 @@
+"""Helpers de formato para los reportes de cierre (fechas, horas y moneda).
+
+Odoo entrega las fechas como texto UTC con el layout fijo
+``%Y-%m-%d %H:%M:%S``. En lugar de ``datetime.strptime`` (lento: regex +
+locale en cada llamada) se parsea por posición, y los resultados que se
+repiten durante un render (horas de apertura/cierre, montos frecuentes) se
+memorizan en caches LRU acotados.
+
+Variables de entorno (opcionales):
+    REPORT_TIMEZONE    -> zona IANA para las horas del reporte (ej: America/Bogota)
+    REPORT_UTC_OFFSET  -> desplazamiento en horas si no hay zona IANA (default -5)
+"""
+
+import os
+from datetime import datetime, timedelta, timezone, tzinfo
+from functools import lru_cache
+from typing import Union
+
+ODOO_DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+ODOO_DATE_FORMAT = '%Y-%m-%d'
+
+SPANISH_MONTHS = (
+    "Enero", "Febrero", "Marzo", "Abril", "Mayo", "Junio",
+    "Julio", "Agosto", "Septiembre", "Octubre", "Noviembre", "Diciembre",
+)
+
+_DEFAULT_UTC_OFFSET_HOURS = -5.0
+
+
+@lru_cache(maxsize=1)
+def get_report_timezone() -> tzinfo:
+    """Zona horaria usada para mostrar horas en los reportes.
+
+    Prioridad: REPORT_TIMEZONE (IANA) -> REPORT_UTC_OFFSET (horas) -> -5.
+    Se resuelve una sola vez; usar ``clear_caches()`` si cambia el entorno.
+    """
+    name = os.getenv("REPORT_TIMEZONE")
+    if name:
+        try:
+            from zoneinfo import ZoneInfo
+            return ZoneInfo(name)
+        except Exception:
+            # Sin tzdata en la imagen o nombre inválido: usar el offset fijo
+            pass
+    raw_offset = os.getenv("REPORT_UTC_OFFSET")
+    try:
+        offset = float(raw_offset) if raw_offset else _DEFAULT_UTC_OFFSET_HOURS
+    except ValueError:
+        offset = _DEFAULT_UTC_OFFSET_HOURS
+    return timezone(timedelta(hours=offset))
+
+
+def parse_odoo_datetime(value: str) -> datetime:
+    """Parsea 'YYYY-MM-DD HH:MM:SS' (o 'YYYY-MM-DD') sin usar strptime.
+
+    Devuelve un datetime naive (UTC, como lo guarda Odoo).
+    Lanza ValueError si el texto no tiene ninguno de los dos layouts.
+    """
+    try:
+        if len(value) == 19 and value[4] == '-' and value[7] == '-' and value[13] == ':' and value[16] == ':':
+            return datetime(
+                int(value[0:4]), int(value[5:7]), int(value[8:10]),
+                int(value[11:13]), int(value[14:16]), int(value[17:19]),
+            )
+        if len(value) == 10 and value[4] == '-' and value[7] == '-':
+            return datetime(int(value[0:4]), int(value[5:7]), int(value[8:10]))
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Fecha Odoo inválida: {value!r}") from e
+    raise ValueError(f"Fecha Odoo inválida: {value!r}")
+
+
+def to_report_tz(dt: datetime) -> datetime:
+    """Convierte un datetime naive UTC a la zona del reporte (naive)."""
+    return dt.replace(tzinfo=timezone.utc).astimezone(get_report_timezone()).replace(tzinfo=None)
+
+
+def from_report_tz(dt: datetime) -> datetime:
+    """Inverso de to_report_tz: datetime naive en la zona del reporte -> naive UTC."""
+    return dt.replace(tzinfo=get_report_timezone()).astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def _format_time_12h(dt: datetime) -> str:
+    hour = dt.hour % 12 or 12
+    suffix = 'AM' if dt.hour < 12 else 'PM'
+    return f"{hour:02d}:{dt.minute:02d}:{dt.second:02d} {suffix}"
+
+
+@lru_cache(maxsize=4096)
+def _adjust_time_cached(dt_string: str) -> str:
+    return _format_time_12h(to_report_tz(parse_odoo_datetime(dt_string)))
+
+
+def adjust_time(dt_string: str, format_in: str = ODOO_DATETIME_FORMAT) -> str:
+    """Convierte una fecha UTC de Odoo a hora local en formato 12h AM/PM."""
+    if format_in == ODOO_DATETIME_FORMAT:
+        return _adjust_time_cached(dt_string)
+    dt = datetime.strptime(dt_string, format_in)
+    return _format_time_12h(to_report_tz(dt))
+
+
+@lru_cache(maxsize=1024)
+def _format_date_spanish_str(date_str: str) -> str:
+    try:
+        date_obj = parse_odoo_datetime(date_str)
+    except ValueError:
+        return date_str  # Igual que antes: devolver el original si no se puede parsear
+    return _format_date_obj(date_obj)
+
+
+def _format_date_obj(date_obj: datetime) -> str:
+    return f"{date_obj.day:02d} de {SPANISH_MONTHS[date_obj.month - 1]} del {date_obj.year}"
+
+
+def format_date_spanish(date_str: Union[str, datetime, None]) -> str:
+    """Format date as 'DD de Month del YYYY' in Spanish"""
+    if not date_str:
+        return ""
+    if isinstance(date_str, str):
+        return _format_date_spanish_str(date_str)
+    if isinstance(date_str, datetime):
+        return _format_date_obj(date_str)
+    return str(date_str)
+
+
+@lru_cache(maxsize=8192)
+def _format_currency_cached(value: int) -> str:
+    return f"${value:,}"
+
+
+def format_currency(value) -> str:
+    """Monto sin decimales con separador de miles (ej: $1,234,500)."""
+    return _format_currency_cached(int(value))
+
+
+def clear_caches(timezone_too: bool = True) -> None:
+    """Vacía los caches de formato (útil si cambia REPORT_TIMEZONE en caliente)."""
+    _adjust_time_cached.cache_clear()
+    _format_date_spanish_str.cache_clear()
+    _format_currency_cached.cache_clear()
+    if timezone_too:
+        get_report_timezone.cache_clear()
+
+
+def cache_info() -> dict:
+    """Estadísticas de los caches LRU (hits/misses/tamaño)."""
+    return {
+        "adjust_time": _adjust_time_cached.cache_info()._asdict(),
+        "format_date_spanish": _format_date_spanish_str.cache_info()._asdict(),
+        "format_currency": _format_currency_cached.cache_info()._asdict(),
+    }
+
+
+__all__ = [
+    "ODOO_DATETIME_FORMAT",
+    "parse_odoo_datetime",
+    "to_report_tz",
+    "from_report_tz",
+    "get_report_timezone",
+    "adjust_time",
+    "format_date_spanish",
+    "format_currency",
+    "clear_caches",
+    "cache_info",
+]
@@ -0,0 +1,231 @@
+"""Envíos en modo asíncrono: confirmación en segundo plano + callback firmado.
+
+Con `async_send` (o `callback_url`) las rutas de texto responden 202 apenas
+el bridge acepta el mensaje, con un job id. La confirmación (confirm_sent)
+corre en un pool de hilos y al terminar (finish_job):
+    - se guarda el estado del job en el cache compartido (GET /whatsapp/jobs/{id}),
+    - se publica en el stream SSE GET /whatsapp/jobs/events (suscriptores de
+      este worker),
+    - si hay callback_url se hace POST del job en JSON firmado con HMAC-SHA256.
+
+Los lotes del modo resumen (services.digest) también son jobs: create_job al
+abrir el lote y finish_job con el resultado de su envío.
+
+Los callbacks solo se entregan a hosts de CALLBACK_ALLOWED_HOSTS: la API no
+tiene autenticación y sin esa lista cualquiera podría hacer que el servidor
+haga POST a hosts internos o a endpoints de metadata de la nube. La URL se
+valida antes de enviar el mensaje y el POST no sigue redirecciones.
+
+Firma del callback:
+    X-Noti-Timestamp: <epoch segundos>
+    X-Noti-Signature: sha256=<hex HMAC(CALLBACK_SECRET, "<timestamp>.<cuerpo>")>
+
+Variables de entorno:
+    CALLBACK_SECRET        -> secreto HMAC (requerido para usar callback_url)
+    CALLBACK_ALLOWED_HOSTS -> hosts permitidos en callback_url, separados por coma; "*.dominio.com"
+                              acepta subdominios (requerido para usar callback_url)
+    CALLBACK_ATTEMPTS      -> intentos de entrega del callback (default 3, backoff 1, 2, 4 s)
+    JOBS_CONCURRENCY       -> confirmaciones simultáneas (default 16)
+    JOBS_TTL               -> segundos que se conserva el estado del job (default 86400)
+"""
+
+import asyncio
+import hashlib
+import hmac
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import httpx
+
+from clients.whatsapp import confirm_sent
+from services.cache import get_cache
+
+logger = logging.getLogger(__name__)
+
+_JOBS_NS = "jobs"
+
+PENDING = "pending"
+VALIDATED = "validated"
+FAILED = "failed"
+
+_executor: Optional[ThreadPoolExecutor] = None
+_lock = threading.Lock()
+_subscribers: List[Tuple[asyncio.AbstractEventLoop, "asyncio.Queue[dict]", Optional[str]]] = []
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name) or default)
+    except ValueError:
+        return default
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=int(_env_float("JOBS_CONCURRENCY", 16)), thread_name_prefix="jobs")
+    return _executor
+
+
+def callbacks_enabled() -> bool:
+    return bool(os.getenv("CALLBACK_SECRET"))
+
+
+def _allowed_hosts() -> List[str]:
+    return [h.strip().lower() for h in (os.getenv("CALLBACK_ALLOWED_HOSTS") or "").split(",") if h.strip()]
+
+
+def _host_allowed(host: str, allowed: List[str]) -> bool:
+    for pattern in allowed:
+        if pattern.startswith("*."):
+            if host.endswith(pattern[1:]):
+                return True
+        elif host == pattern:
+            return True
+    return False
+
+
+def check_callback_url(callback_url: str) -> None:
+    """Valida que se pueda entregar un callback a `callback_url`. Lanza ValueError si no."""
+    if not callbacks_enabled():
+        raise ValueError("callback_url requiere CALLBACK_SECRET configurado en el servidor")
+    allowed = _allowed_hosts()
+    if not allowed:
+        raise ValueError("callback_url requiere CALLBACK_ALLOWED_HOSTS configurado en el servidor")
+    parts = urlsplit(callback_url)
+    host = (parts.hostname or "").lower()
+    if parts.scheme not in ("http", "https") or not _host_allowed(host, allowed):
+        raise ValueError(f"Host de callback_url no permitido: {host or callback_url}")
+
+
+def sign(body: bytes, timestamp: str) -> str:
+    secret = os.getenv("CALLBACK_SECRET") or ""
+    digest = hmac.new(secret.encode("utf-8"), timestamp.encode("ascii") + b"." + body, hashlib.sha256).hexdigest()
+    return f"sha256={digest}"
+
+
+def get_job(job_id: str) -> Optional[dict]:
+    return get_cache().get(_JOBS_NS, job_id)
+
+
+def _save(job: dict) -> None:
+    get_cache().set(_JOBS_NS, job["job_id"], dict(job), ttl=_env_float("JOBS_TTL", 86400))
+
+
+def create_job(*, message_id: Optional[str] = None, callback_url: Optional[str] = None, **fields) -> dict:
+    """Registra un job pendiente cuyo resultado se informa después con finish_job."""
+    if callback_url:
+        check_callback_url(callback_url)
+    job = {
+        "job_id": uuid.uuid4().hex,
+        "message_id": message_id,
+        "status": PENDING,
+        "detail": None,
+        "created_at": time.time(),
+        "finished_at": None,
+        "callback_url": callback_url,
+        **fields,
+    }
+    _save(job)
+    return job
+
+
+def finish_job(job: dict, detail: str, **fields) -> None:
+    """Cierra el job (validated si `detail` es la confirmación del envío), lo publica y entrega su callback."""
+    job.update(
+        status=VALIDATED if detail == "Mensaje enviado y validado" else FAILED,
+        detail=detail,
+        finished_at=time.time(),
+        **fields,
+    )
+    _save(job)
+    _publish(job)
+    if job["callback_url"]:
+        _deliver_callback(job)
+
+
+def start_job(remote_jid: str, message_id: str, *, callback_url: Optional[str] = None,
+              attempts: int = 5, delay_seconds: float = 1.0) -> dict:
+    """Registra un job para un mensaje ya aceptado por el bridge y lanza su confirmación."""
+    job = create_job(message_id=message_id, callback_url=callback_url)
+    _get_executor().submit(_run, job, remote_jid, attempts, delay_seconds)
+    return job
+
+
+def _run(job: dict, remote_jid: str, attempts: int, delay_seconds: float) -> None:
+    try:
+        detail = confirm_sent(remote_jid, job["message_id"], attempts=attempts, delay_seconds=delay_seconds)
+    except Exception as e:  # noqa: BLE001
+        detail = f"Error al validar: {e}"
+    finish_job(job, detail)
+
+
+def _deliver_callback(job: dict) -> None:
+    body = json.dumps({k: v for k, v in job.items() if k != "callback_url"}).encode("utf-8")
+    attempts = max(1, int(_env_float("CALLBACK_ATTEMPTS", 3)))
+    for attempt in range(attempts):
+        timestamp = str(int(time.time()))
+        headers = {
+            "Content-Type": "application/json",
+            "X-Noti-Timestamp": timestamp,
+            "X-Noti-Signature": sign(body, timestamp),
+        }
+        try:
+            resp = httpx.post(job["callback_url"], content=body, headers=headers, timeout=10.0, follow_redirects=False)
+            if resp.status_code < 500:
+                if resp.status_code >= 400:
+                    logger.warning("callback %s rechazado: HTTP %d", job['job_id'], resp.status_code)
+                return
+            error = f"HTTP {resp.status_code}"
+        except httpx.HTTPError as e:
+            error = str(e)
+        if attempt < attempts - 1:
+            time.sleep(2 ** attempt)
+    logger.warning("callback %s no entregado tras %d intentos: %s", job['job_id'], attempts, error)
+
+
+def _offer(queue: "asyncio.Queue[dict]", event: dict) -> None:
+    try:
+        queue.put_nowait(event)
+    except asyncio.QueueFull:
+        pass
+
+
+def _publish(job: dict) -> None:
+    event = {k: v for k, v in job.items() if k != "callback_url"}
+    with _lock:
+        subscribers = list(_subscribers)
+    for loop, queue, job_filter in subscribers:
+        if job_filter and job_filter != job["job_id"]:
+            continue
+        try:
+            loop.call_soon_threadsafe(_offer, queue, event)
+        except RuntimeError:
+            # Event loop cerrado: el suscriptor se desconectó
+            pass
+
+
+def subscribe(job_id: Optional[str] = None) -> "asyncio.Queue[dict]":
+    """Cola asyncio que recibe los jobs terminados (todos o solo `job_id`)."""
+    queue: "asyncio.Queue[dict]" = asyncio.Queue(maxsize=1000)
+    with _lock:
+        _subscribers.append((asyncio.get_running_loop(), queue, job_id))
+    return queue
+
+
+def unsubscribe(queue: "asyncio.Queue[dict]") -> None:
+    with _lock:
+        _subscribers[:] = [s for s in _subscribers if s[1] is not queue]
+
+
+__all__ = ["start_job", "create_job", "finish_job", "get_job", "subscribe", "unsubscribe", "sign", "callbacks_enabled", "check_callback_url",
+           "PENDING", "VALIDATED", "FAILED"]
@@ -0,0 +1,184 @@
+"""Registro local de mensajes enviados (ledger).
+
+Cada envío y cada resultado de confirmación agrega una fila (nunca se
+modifican filas) en DATA_DIR/ledger.sqlite3 (WAL, compartido por los
+workers). El estado de un mensaje es el de su último evento:
+
+    sent        -> el bridge aceptó el mensaje (con key.id)
+    send_failed -> el bridge rechazó el envío (sin key.id)
+    validated   -> el mensaje apareció en el chat
+    failed      -> no se pudo confirmar
+
+Índices por key.id, pos_name, jid y alias: "¿ya se envió el cierre POS/00025 a
+cierres?" o "¿en qué estado está el mensaje X?" se responden desde disco local
+sin consultar findMessages en el bridge.
+
+Un error escribiendo el ledger nunca hace fallar un envío: se registra en log.
+"""
+
+import hashlib
+import logging
+import threading
+import time
+from typing import Dict, List, Optional
+
+from services.storage import data_path, thread_connection
+
+SENT = "sent"
+SEND_FAILED = "send_failed"
+VALIDATED = "validated"
+FAILED = "failed"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS ledger (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    event TEXT NOT NULL,
+    message_id TEXT,
+    jid TEXT,
+    alias TEXT,
+    pos_name TEXT,
+    kind TEXT,
+    payload_hash TEXT,
+    instance TEXT,
+    detail TEXT,
+    elapsed_ms REAL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_ledger_message ON ledger (message_id, seq);
+CREATE INDEX IF NOT EXISTS idx_ledger_pos_name ON ledger (pos_name, seq);
+CREATE INDEX IF NOT EXISTS idx_ledger_jid ON ledger (jid, seq);
+CREATE INDEX IF NOT EXISTS idx_ledger_alias ON ledger (alias, seq);
+"""
+
+_COLUMNS = ("seq", "event", "message_id", "jid", "alias", "pos_name", "kind", "payload_hash",
+            "instance", "detail", "elapsed_ms", "created_at")
+
+logger = logging.getLogger(__name__)
+
+_schema_lock = threading.Lock()
+_schema_ready = False
+
+
+def _conn():
+    global _schema_ready
+    conn = thread_connection(data_path("ledger.sqlite3"))
+    if not _schema_ready:
+        with _schema_lock:
+            if not _schema_ready:
+                conn.executescript(_SCHEMA)
+                _schema_ready = True
+    return conn
+
+
+def payload_hash(text: Optional[str] = None, file_path: Optional[str] = None, media_url: Optional[str] = None) -> str:
+    """sha256 del contenido enviado (texto, bytes del archivo o URL del media)."""
+    digest = hashlib.sha256()
+    if text:
+        digest.update(text.encode("utf-8"))
+    if file_path:
+        with open(file_path, "rb") as f:
+            for chunk in iter(lambda: f.read(65536), b""):
+                digest.update(chunk)
+    elif media_url:
+        digest.update(media_url.encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _append(event: str, **fields) -> None:
+    fields["event"] = event
+    fields["created_at"] = time.time()
+    names = list(fields)
+    try:
+        _conn().execute(
+            f"INSERT INTO ledger ({', '.join(names)}) VALUES ({', '.join('?' * len(names))})",
+            [fields[name] for name in names],
+        )
+    except Exception as e:  # noqa: BLE001
+        logger.warning("no se pudo registrar %s (%s): %s", event, fields.get('message_id'), e)
+
+
+def record_sent(message_id: str, jid: str, *, kind: str, payload_hash: Optional[str], instance: Optional[str],
+                elapsed_ms: float, alias: Optional[str] = None, pos_name: Optional[str] = None) -> None:
+    _append(SENT, message_id=message_id, jid=jid, kind=kind, payload_hash=payload_hash, instance=instance,
+            elapsed_ms=elapsed_ms, alias=alias, pos_name=pos_name)
+
+
+def record_send_failed(jid: str, detail: str, *, kind: str, payload_hash: Optional[str],
+                       alias: Optional[str] = None, pos_name: Optional[str] = None) -> None:
+    _append(SEND_FAILED, jid=jid, kind=kind, payload_hash=payload_hash, detail=detail, alias=alias, pos_name=pos_name)
+
+
+def record_confirmation(message_id: str, jid: str, validated: bool, detail: str, elapsed_ms: float) -> None:
+    _append(VALIDATED if validated else FAILED, message_id=message_id, jid=jid, detail=detail, elapsed_ms=elapsed_ms)
+
+
+def _rows(sql: str, params: list) -> List[dict]:
+    return [dict(zip(_COLUMNS, row)) for row in _conn().execute(sql, params).fetchall()]
+
+
+def _with_status(sent_rows: List[dict]) -> List[dict]:
+    """Agrega a cada envío su último estado (un SELECT para todos)."""
+    ids = [row["message_id"] for row in sent_rows if row["message_id"]]
+    latest: Dict[str, dict] = {}
+    if ids:
+        marks = ",".join("?" * len(ids))
+        for row in _rows(
+            f"SELECT {', '.join(_COLUMNS)} FROM ledger WHERE seq IN ("
+            f"SELECT MAX(seq) FROM ledger WHERE message_id IN ({marks}) GROUP BY message_id)",
+            ids,
+        ):
+            latest[row["message_id"]] = row
+    for row in sent_rows:
+        last = latest.get(row["message_id"], row)
+        row["status"] = last["event"]
+        row["status_detail"] = last["detail"]
+        row["status_at"] = last["created_at"]
+        row["confirm_ms"] = last["elapsed_ms"] if last is not row else None
+    return sent_rows
+
+
+def get_message(message_id: str) -> Optional[dict]:
+    """Envío de `message_id` con su estado actual y todos sus eventos; None si no está registrado."""
+    events = _rows(f"SELECT {', '.join(_COLUMNS)} FROM ledger WHERE message_id = ? ORDER BY seq", [message_id])
+    sent = next((e for e in events if e["event"] == SENT), None)
+    if sent is None:
+        return None
+    message = _with_status([dict(sent)])[0]
+    message["events"] = [{"event": e["event"], "detail": e["detail"], "elapsed_ms": e["elapsed_ms"],
+                          "created_at": e["created_at"]} for e in events]
+    return message
+
+
+def find(*, pos_name: Optional[str] = None, jid: Optional[str] = None, alias: Optional[str] = None,
+         limit: int = 50) -> List[dict]:
+    """Envíos (sent y send_failed) más recientes primero, filtrados por pos_name / jid / alias."""
+    where = ["event IN (?, ?)"]
+    params: list = [SENT, SEND_FAILED]
+    for column, value in (("pos_name", pos_name), ("jid", jid), ("alias", alias)):
+        if value:
+            where.append(f"{column} = ?")
+            params.append(value)
+    params.append(limit)
+    return _with_status(_rows(
+        f"SELECT {', '.join(_COLUMNS)} FROM ledger WHERE {' AND '.join(where)} ORDER BY seq DESC LIMIT ?", params
+    ))
+
+
+def already_delivered(pos_name: str, jid: str) -> Optional[dict]:
+    """Último envío validado de `pos_name` a `jid` (None si nunca se confirmó uno)."""
+    for message in find(pos_name=pos_name, jid=jid, limit=20):
+        if message["status"] == VALIDATED:
+            return message
+    return None
+
+
+def unconfirmed_delivery(pos_name: str, jid: str) -> Optional[dict]:
+    """Último envío de `pos_name` a `jid` que el bridge aceptó pero no se confirmó (estado sent o failed)."""
+    for message in find(pos_name=pos_name, jid=jid, limit=20):
+        if message["event"] == SENT and message["status"] in (SENT, FAILED):
+            return message
+    return None
+
+
+__all__ = ["record_sent", "record_send_failed", "record_confirmation", "payload_hash", "get_message", "find",
+           "already_delivered", "unconfirmed_delivery", "SENT", "SEND_FAILED", "VALIDATED", "FAILED"]
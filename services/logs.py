@@ -0,0 +1,246 @@
+"""Logging estructurado (JSON) sin escrituras a stdout en los hilos de los requests.
+
+`configure()` instala en el logger raíz un QueueHandler: el hilo que loguea
+solo encola el registro y un hilo escritor (QueueListener) lo formatea y lo
+escribe en stdout. Con muchos hilos atendiendo requests ya no compiten por el
+lock de stdout. Los logs de uvicorn pasan por la misma cola.
+
+Cada request emite una línea de resumen (logger "access") con ruta, status,
+bytes de respuesta y lo que costó: llamadas y bytes a Odoo, ms de render del
+PDF, ms de envío al bridge e intentos de validación. Los módulos suman sus
+métricas con `count()` / `add_ms()`; fuera de un request (despachador, jobs)
+esas llamadas no hacen nada.
+
+Los logs de depuración usan logger.debug con argumentos %: si el nivel está
+desactivado no se formatea nada.
+
+Variables de entorno (opcionales):
+    LOG_LEVEL      -> DEBUG | INFO | WARNING | ERROR (default INFO)
+    LOG_FORMAT     -> json | text (default json; text para desarrollo local)
+    LOG_QUEUE_SIZE -> registros en cola antes de descartar (default 10000)
+    ACCESS_LOG     -> 0 para no emitir la línea de resumen por request (default 1)
+"""
+
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+import time
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+# Atributos propios de LogRecord; el resto viene de `extra=` y va como campo del JSON
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+_configure_lock = threading.Lock()
+_listener: Optional[logging.handlers.QueueListener] = None
+_handler: Optional["_QueueHandler"] = None
+
+_access = logging.getLogger("access")
+
+
+def _extra_fields(record: logging.LogRecord) -> Dict[str, object]:
+    return {k: v for k, v in record.__dict__.items() if k not in _RECORD_ATTRS and not k.startswith("_")}
+
+
+class JsonFormatter(logging.Formatter):
+    """Una línea JSON por registro: ts, level, logger, msg, campos extra y exc."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        entry.update(_extra_fields(record))
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """Formato legible para desarrollo: "[logger] mensaje campo=valor ..."."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = f"[{record.name}] {record.getMessage()}"
+        fields = _extra_fields(record)
+        if fields:
+            line += " " + " ".join(f"{k}={v}" for k, v in fields.items())
+        if record.exc_info:
+            line += "\n" + self.formatException(record.exc_info)
+        elif record.exc_text:
+            line += "\n" + record.exc_text
+        return line
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """Encola sin formatear; si la cola está llena descarta y cuenta (nunca bloquea al request)."""
+
+    def __init__(self, q: "queue.Queue"):
+        super().__init__(q)
+        self.dropped = 0
+        self._exception_formatter = logging.Formatter()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # El mensaje se resuelve aquí (los args pueden cambiar después); el
+        # traceback también, porque los frames no viajan por la cola.
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = self._exception_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return max(1, int(os.getenv(name) or default))
+    except ValueError:
+        return default
+
+
+def configure() -> None:
+    """Instala la cola y el hilo escritor (idempotente; una vez por proceso)."""
+    global _listener, _handler
+    with _configure_lock:
+        if _listener is not None:
+            return
+        level = (os.getenv("LOG_LEVEL") or "INFO").upper()
+        formatter = TextFormatter() if (os.getenv("LOG_FORMAT") or "json").lower() == "text" else JsonFormatter()
+        stream = logging.StreamHandler(sys.stdout)
+        stream.setFormatter(formatter)
+
+        _handler = _QueueHandler(queue.Queue(_env_int("LOG_QUEUE_SIZE", 10000)))
+        root = logging.getLogger()
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        root.addHandler(_handler)
+        numeric = logging.getLevelName(level)
+        root.setLevel(numeric if isinstance(numeric, int) else logging.INFO)
+        # httpx loguea cada request en INFO (incluye el polling de confirmaciones)
+        if root.level > logging.DEBUG:
+            logging.getLogger("httpx").setLevel(logging.WARNING)
+        # uvicorn configura sus propios handlers antes de importar la app
+        for name in ("uvicorn", "uvicorn.error", "uvicorn.access"):
+            logger = logging.getLogger(name)
+            logger.handlers = []
+            logger.propagate = True
+
+        _listener = logging.handlers.QueueListener(_handler.queue, stream)
+        _listener.start()
+        atexit.register(shutdown)
+
+
+def shutdown() -> None:
+    """Vacía la cola y detiene el hilo escritor."""
+    global _listener
+    with _configure_lock:
+        listener, _listener = _listener, None
+    if listener is not None:
+        try:
+            listener.stop()
+        except queue.Full:
+            pass
+
+
+def queue_depth() -> int:
+    return _handler.queue.qsize() if _handler else 0
+
+
+def dropped_records() -> int:
+    return _handler.dropped if _handler else 0
+
+
+# -- métricas por request -------------------------------------------------------
+
+class RequestStats:
+    """Contadores del request en curso; se suman desde cualquier hilo que herede el contexto."""
+
+    def __init__(self):
+        self.values: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def add(self, field: str, amount: float) -> None:
+        with self._lock:
+            self.values[field] = self.values.get(field, 0) + amount
+
+
+_current: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+def count(field: str, amount: float = 1) -> None:
+    """Suma `amount` al campo del resumen del request actual (no-op fuera de un request)."""
+    stats = _current.get()
+    if stats is not None:
+        stats.add(field, amount)
+
+
+def add_ms(field: str, seconds: float) -> None:
+    """Suma `seconds` (en ms) al campo del resumen del request actual."""
+    stats = _current.get()
+    if stats is not None:
+        stats.add(field, seconds * 1000)
+
+
+def _access_enabled() -> bool:
+    return (os.getenv("ACCESS_LOG") or "1").lower() not in {"0", "false", "no", "off"}
+
+
+class AccessLogMiddleware:
+    """Middleware ASGI: una línea de resumen por request al terminar de enviar la respuesta."""
+
+    def __init__(self, app):
+        self.app = app
+        self.enabled = _access_enabled()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.enabled:
+            await self.app(scope, receive, send)
+            return
+        stats = RequestStats()
+        token = _current.set(stats)
+        started = time.perf_counter()
+        response = {"status": None, "bytes": 0}
+
+        async def send_and_measure(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+            elif message["type"] == "http.response.body":
+                response["bytes"] += len(message.get("body") or b"")
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_and_measure)
+        finally:
+            _current.reset(token)
+            route = scope.get("route")
+            fields = {
+                "method": scope["method"],
+                "route": getattr(route, "path", None) or scope["path"],
+                "path": scope["path"],
+                "status": response["status"] or 500,
+                "bytes": response["bytes"],
+                "duration_ms": round((time.perf_counter() - started) * 1000, 1),
+            }
+            for field, value in stats.values.items():
+                fields[field] = round(value, 1) if field.endswith("_ms") else int(value)
+            _access.info("%s %s %s", fields["method"], fields["path"], fields["status"], extra=fields)
+
+
+__all__ = ["configure", "shutdown", "count", "add_ms", "AccessLogMiddleware", "JsonFormatter", "TextFormatter",
+           "queue_depth", "dropped_records"]
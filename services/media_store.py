@@ -0,0 +1,168 @@
+"""Almacén temporal de archivos servidos al bridge por URL (GET /media/{token}).
+
+En lugar de mandar el PDF como base64 dentro del JSON de /message/sendMedia,
+el archivo se registra aquí bajo un token aleatorio (no adivinable) con
+vencimiento y al bridge se le pasa la URL. El bridge descarga el archivo en
+streaming: la memoria por envío no depende del tamaño del PDF y un mismo
+token sirve para varios destinatarios.
+
+Los archivos viven en MEDIA_DIR (por defecto DATA_DIR/media, en el volumen de
+datos), un archivo de datos más un .json con metadatos por token, así
+cualquier worker del host puede servir un token registrado por otro. Un
+directorio en /dev/shm evita escrituras a disco, pero en Docker /dev/shm mide
+64 MB salvo que se amplíe con `shm_size`: solo conviene apuntar MEDIA_DIR ahí
+si el tamaño alcanza para los PDFs vigentes durante MEDIA_TTL.
+
+Variables de entorno:
+    MEDIA_PUBLIC_URL -> URL base con la que el bridge alcanza esta API
+                        (ej: http://noti-api:8084). Sin definir, los PDFs se
+                        siguen enviando en base64.
+    MEDIA_DIR        -> directorio del almacén (default DATA_DIR/media)
+    MEDIA_TTL        -> segundos de validez de cada token (default 600)
+"""
+
+import json
+import os
+import re
+import secrets
+import shutil
+import time
+from typing import Optional, Tuple
+
+from services.storage import data_path
+
+_TOKEN_RE = re.compile(r"^[A-Za-z0-9_-]{32}$")
+_PURGE_INTERVAL = 60.0
+_last_purge = 0.0
+
+
+def enabled() -> bool:
+    return bool(os.getenv("MEDIA_PUBLIC_URL"))
+
+
+def media_dir() -> str:
+    path = os.getenv("MEDIA_DIR")
+    if not path:
+        path = data_path("media")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _ttl() -> float:
+    try:
+        return float(os.getenv("MEDIA_TTL") or 600)
+    except ValueError:
+        return 600.0
+
+
+def _paths(token: str) -> Tuple[str, str]:
+    base = os.path.join(media_dir(), token)
+    return base + ".bin", base + ".json"
+
+
+def _register(file_name: str, content_type: str, ttl: Optional[float], write) -> str:
+    token = secrets.token_urlsafe(24)
+    data_file, meta_file = _paths(token)
+    write(data_file)
+    meta = {"file_name": file_name, "content_type": content_type, "expires_at": time.time() + (ttl or _ttl())}
+    tmp = meta_file + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as fh:
+        json.dump(meta, fh)
+    os.replace(tmp, meta_file)
+    _maybe_purge()
+    return token
+
+
+def put_file(path: str, file_name: Optional[str] = None, *, content_type: str = "application/pdf",
+             ttl: Optional[float] = None) -> str:
+    """Registra una copia de `path`. Retorna el token."""
+    def write(target: str) -> None:
+        shutil.copyfile(path, target)
+
+    return _register(file_name or os.path.basename(path), content_type, ttl, write)
+
+
+def put_bytes(data: bytes, file_name: str, *, content_type: str = "application/pdf",
+              ttl: Optional[float] = None) -> str:
+    """Registra `data` en el almacén. Retorna el token."""
+    def write(target: str) -> None:
+        with open(target, "wb") as fh:
+            fh.write(data)
+
+    return _register(file_name, content_type, ttl, write)
+
+
+def put_stream(fileobj, file_name: str, *, content_type: str = "application/pdf",
+               ttl: Optional[float] = None) -> str:
+    """Registra el contenido de un archivo abierto (copiado por bloques). Retorna el token."""
+    def write(target: str) -> None:
+        with open(target, "wb") as fh:
+            shutil.copyfileobj(fileobj, fh)
+
+    return _register(file_name, content_type, ttl, write)
+
+
+def lookup(token: str) -> Optional[Tuple[str, dict]]:
+    """(ruta, metadatos) de un token vigente; None si no existe, venció o es inválido."""
+    if not _TOKEN_RE.match(token or ""):
+        return None
+    data_file, meta_file = _paths(token)
+    try:
+        with open(meta_file, encoding="utf-8") as fh:
+            meta = json.load(fh)
+    except (OSError, ValueError):
+        return None
+    if meta.get("expires_at", 0) < time.time() or not os.path.exists(data_file):
+        discard(token)
+        return None
+    return data_file, meta
+
+
+def media_url(token: str) -> str:
+    base = (os.getenv("MEDIA_PUBLIC_URL") or "").rstrip("/")
+    if not base:
+        raise RuntimeError("MEDIA_PUBLIC_URL no está definida")
+    return f"{base}/media/{token}"
+
+
+def discard(token: str) -> None:
+    for path in _paths(token):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def purge_expired() -> int:
+    """Elimina los tokens vencidos. Retorna cuántos se eliminaron."""
+    now = time.time()
+    removed = 0
+    directory = media_dir()
+    for name in os.listdir(directory):
+        if not name.endswith(".json"):
+            continue
+        token = name[:-5]
+        try:
+            with open(os.path.join(directory, name), encoding="utf-8") as fh:
+                expires_at = json.load(fh).get("expires_at", 0)
+        except (OSError, ValueError):
+            expires_at = 0
+        if expires_at < now:
+            discard(token)
+            removed += 1
+    return removed
+
+
+def _maybe_purge() -> None:
+    global _last_purge
+    now = time.monotonic()
+    if now - _last_purge < _PURGE_INTERVAL:
+        return
+    _last_purge = now
+    try:
+        purge_expired()
+    except OSError:
+        pass
+
+
+__all__ = ["enabled", "put_file", "put_bytes", "put_stream", "lookup", "media_url", "discard", "purge_expired"]
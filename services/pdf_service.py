@@ -1,91 +1,142 @@
-import xmlrpc.client
 from fpdf import FPDF
 from datetime import datetime, timedelta
 import sys
 import os
 import asyncio
-from typing import Optional
+import logging
+import threading
+import time
+import xmlrpc.client
+from typing import Dict, Iterator, List, Optional
+from services.formatting import format_currency, format_date_spanish, adjust_time, parse_odoo_datetime
+from services.cache import get_cache
+from clients.odoo import OdooBatch, execute_kw
+from clients.breaker import CircuitOpenError
+from services.reference_data import get_pos_location_id
+from services import logs
 
-_ODOO_ENV_LOADED = False
-url = db = username = password = None
-common = uid = models = None
+logger = logging.getLogger(__name__)
 
-def _load_env_once():
-    global _ODOO_ENV_LOADED, url, db, username, password
-    if _ODOO_ENV_LOADED:
-        return
+_REPORTS_NS = "reports"
+
+def _report_cache_key(session_data) -> Optional[str]:
+    """Clave de cache del PDF renderizado; solo sesiones cerradas (inmutables)."""
+    if not session_data.get('stop_at') or session_data.get('state', 'closed') != 'closed':
+        return None
+    return f"{session_data['id']}:{session_data.get('write_date') or session_data['stop_at']}"
+
+def _report_cache_ttl() -> float:
     try:
-        from dotenv import load_dotenv, find_dotenv  # type: ignore
-        env_path = find_dotenv(usecwd=True)
-        if env_path:
-            load_dotenv(env_path)
-    except Exception:
-        # Continuar aun si no está instalado
-        pass
-    url = os.getenv('ODOO_URL')
-    db = os.getenv('ODOO_DB')
-    username = os.getenv('ODOO_USERNAME')
-    password = os.getenv('ODOO_PASSWORD')
-    missing = [name for name, val in [('ODOO_URL', url), ('ODOO_DB', db), ('ODOO_USERNAME', username), ('ODOO_PASSWORD', password)] if not val]
-    if missing:
-        raise RuntimeError(f"Faltan variables de entorno requeridas: {', '.join(missing)}")
-    _ODOO_ENV_LOADED = True
-
-def _init_odoo_clients():
-    global common, uid, models
-    _load_env_once()
-    if common and models and uid:
+        return float(os.getenv('REPORT_CACHE_TTL') or 86400)
+    except ValueError:
+        return 86400.0
+
+def preload_fonts() -> None:
+    """Carga las métricas de las fuentes core usadas en el reporte.
+
+    fpdf lee y ejecuta el archivo de métricas la primera vez que se usa cada
+    fuente/estilo (cache global del módulo); hacerlo en el arranque evita
+    pagarlo en el primer reporte.
+    """
+    pdf = FPDF()
+    for style in ('', 'B', 'I'):
+        pdf.set_font("Arial", style, 10)
+        pdf.get_string_width("Reporte $0,123456789")
+
+# ---------------------------------------------------------------------------
+# Proyección de campos: toda lectura de Odoo pide solo estos campos por modelo.
+# Sin 'fields' Odoo serializa todo el registro (computados y listas one2many
+# como order_ids / statement_line_ids), lo que infla cada respuesta XML-RPC.
+# Los campos que no existan en la versión de Odoo conectada se descartan
+# (se valida una vez por modelo con fields_get).
+# ---------------------------------------------------------------------------
+_FIELDS: Dict[str, List[str]] = {
+    'pos.session': [
+        'id', 'name', 'state', 'config_id', 'start_at', 'stop_at', 'write_date',
+        'cash_register_balance_start', 'cash_register_balance_end_real',
+        'cash_register_difference', 'cash_register_balance_start_difference',
+        'total_payments_amount',
+    ],
+    'pos.order': ['id', 'name', 'date_order', 'amount_total', 'payment_ids', 'write_date'],
+    'pos.order.line': ['order_id', 'product_id', 'qty', 'price_unit', 'price_subtotal', 'write_date'],
+    'pos.payment': ['amount', 'payment_method_id', 'write_date'],
+    'account.bank.statement.line': ['amount', 'payment_ref', 'write_date'],
+    'stock.move': ['product_id', 'product_qty', 'location_id', 'location_dest_id', 'origin'],
+    'product.product': ['name', 'default_code'],
+    'stock.quant': ['product_id', 'quantity'],
+}
+
+_valid_fields: Dict[str, List[str]] = {}
+_valid_fields_lock = threading.Lock()
+
+def _prefetch_fields(*models: str) -> None:
+    """Valida las whitelists pendientes con un único lote de fields_get."""
+    missing = [m for m in models if m not in _valid_fields]
+    if not missing:
         return
+    batch = OdooBatch()
+    index = {m: batch.add(m, 'fields_get', [_FIELDS[m]], {'attributes': ['type']}) for m in missing}
     try:
-        common = xmlrpc.client.ServerProxy(f"{url}/xmlrpc/2/common")
-        _uid = common.authenticate(db, username, password, {})
-        if not _uid:
-            raise RuntimeError("Autenticación Odoo fallida: credenciales inválidas")
-        uid = _uid
-        models = xmlrpc.client.ServerProxy(f"{url}/xmlrpc/2/object")
-    except Exception as e:
-        raise RuntimeError(f"No se pudo inicializar conexión a Odoo: {e}")
-
-def format_currency(value):
-    return f"${int(value):,}"  # Changed to show integers without decimals
-
-def format_date_spanish(date_str):
-    """Format date as 'DD de Month del YYYY' in Spanish"""
-    if not date_str:
-        return ""
-    
-    date_obj = None
-    if isinstance(date_str, str):
-        # Try to parse the string to a datetime object
-        try:
-            date_obj = datetime.strptime(date_str, '%Y-%m-%d %H:%M:%S')
-        except ValueError:
-            try:
-                date_obj = datetime.strptime(date_str, '%Y-%m-%d')
-            except ValueError:
-                return date_str  # Return original if parsing fails
-    elif isinstance(date_str, datetime):
-        date_obj = date_str
-    else:
-        return str(date_str)  # Return string representation if not a recognized type
-    
-    # Spanish month names
-    spanish_months = [
-        "Enero", "Febrero", "Marzo", "Abril", "Mayo", "Junio", 
-        "Julio", "Agosto", "Septiembre", "Octubre", "Noviembre", "Diciembre"
-    ]
-    
-    day = date_obj.day
-    month = spanish_months[date_obj.month - 1]  # Adjust for 0-based index
-    year = date_obj.year
-    
-    return f"{day:02d} de {month} del {year}"
-
-def adjust_time(dt_string, format_in='%Y-%m-%d %H:%M:%S'):
-    """Adjust datetime by -5 hours and format in 12-hour AM/PM format"""
-    dt = datetime.strptime(dt_string, format_in)
-    adjusted_dt = dt - timedelta(hours=5)
-    return adjusted_dt.strftime('%I:%M:%S %p')  # 12-hour format with AM/PM
+        results = batch.execute()
+    except xmlrpc.client.Fault:
+        # Odoo rechazó fields_get (sin permiso): usar las whitelists tal cual
+        results = None
+    except CircuitOpenError:
+        raise
+    except Exception as e:  # noqa: BLE001
+        # Error transitorio (timeout, conexión): no se cachea nada, el próximo
+        # uso vuelve a validar; mientras tanto _fields_for usa la whitelist
+        logger.warning("fields_get falló para %s, whitelist sin validar: %s", ", ".join(missing), e)
+        return
+    with _valid_fields_lock:
+        for model in missing:
+            wanted = _FIELDS[model]
+            if results is None:
+                _valid_fields[model] = wanted
+            else:
+                available = results[index[model]]
+                _valid_fields[model] = [f for f in wanted if f in available] or wanted
+
+def _fields_for(model: str) -> List[str]:
+    """Whitelist de `model` filtrada contra los campos que existen en el servidor."""
+    fields = _valid_fields.get(model)
+    if fields is None:
+        _prefetch_fields(model)
+        fields = _valid_fields.get(model, _FIELDS[model])
+    return fields
+
+def _read_call(model: str, ids) -> tuple:
+    return (model, 'read', [ids], {'fields': _fields_for(model)})
+
+def _search_read_call(model: str, domain: list, **kwargs) -> tuple:
+    return (model, 'search_read', [domain], {'fields': _fields_for(model), **kwargs})
+
+def _read(model: str, ids) -> List[dict]:
+    """read con proyección de campos."""
+    return execute_kw(*_read_call(model, ids))
+
+def _search_read(model: str, domain: list, **kwargs) -> List[dict]:
+    """search_read con proyección de campos (kwargs: limit, order, offset)."""
+    return execute_kw(*_search_read_call(model, domain, **kwargs))
+
+# Llamadas de una sesión. Se arman como tuplas (model, method, args, kwargs)
+# para poder ejecutarlas sueltas con execute_kw o juntas en un OdooBatch.
+def _statement_lines_call(session_id) -> tuple:
+    return _search_read_call('account.bank.statement.line', [['pos_session_id', '=', session_id]])
+
+def _payment_groups_call(session_id) -> tuple:
+    return ('pos.payment', 'read_group',
+            [[['session_id', '=', session_id]], ['amount:sum'], ['payment_method_id']],
+            {'lazy': False})
+
+def _orders_call(session_id) -> tuple:
+    return _search_read_call('pos.order', [['session_id', '=', session_id]])
+
+def _order_lines_call(session_id) -> tuple:
+    return _search_read_call('pos.order.line', [['order_id.session_id', '=', session_id]])
+
+def _payments_call(session_id) -> tuple:
+    return _search_read_call('pos.payment', [['session_id', '=', session_id]])
 
 class OdooConnectionError(Exception):
     """Errores relacionados con conexión / autenticación Odoo"""
@@ -100,29 +151,37 @@ class PDFGenerationError(Exception):
     pass
 
 def get_session_data(session_name: str):
-    _init_odoo_clients()
     try:
-        session_id = models.execute_kw(db, uid, password, 'pos.session', 'search', [[['name', '=', session_name]]])
-        if not session_id:
+        # Búsqueda por nombre + lectura en un solo search_read proyectado
+        sessions = _search_read('pos.session', [['name', '=', session_name]], limit=1)
+        if not sessions:
             raise SessionNotFoundError(f"Sesión no encontrada: {session_name}")
-        session_data = models.execute_kw(db, uid, password, 'pos.session', 'read', [session_id])
-        return session_data[0]
-    except SessionNotFoundError:
+        return sessions[0]
+    except (SessionNotFoundError, CircuitOpenError):
         raise
     except Exception as e:
         raise OdooConnectionError(f"Error consultando sesión: {e}") from e
 
+def list_closed_sessions(since: str, limit: int = 50, offset: int = 0) -> List[dict]:
+    """Sesiones cerradas con write_date >= `since` (UTC, formato Odoo), más antiguas primero."""
+    domain = [['state', '=', 'closed'], ['write_date', '>=', since]]
+    return _search_read('pos.session', domain, order='write_date asc, id asc', limit=limit, offset=offset)
+
+def list_sessions_between(start_utc: str, end_utc: str, config_ids: Optional[List[int]] = None) -> List[dict]:
+    """Sesiones cerradas abiertas entre `start_utc` (incluido) y `end_utc` (excluido)."""
+    domain = [['state', '=', 'closed'], ['start_at', '>=', start_utc], ['start_at', '<', end_utc]]
+    if config_ids:
+        domain.append(['config_id', 'in', list(config_ids)])
+    return _search_read('pos.session', domain, order='start_at asc, id asc')
+
 def list_statement_line_fields():
-    _init_odoo_clients()
-    fields = models.execute_kw(db, uid, password, 'account.bank.statement.line', 'fields_get', [], {'attributes': ['string', 'type']})
+    fields = execute_kw('account.bank.statement.line', 'fields_get', [], {'attributes': ['string', 'type']})
     for field, details in fields.items():
-        print(f"{field}: {details['string']} ({details['type']}")
+        logger.info("%s: %s (%s)", field, details['string'], details['type'])
 
-def get_cash_movements(session_id):
-    _init_odoo_clients()
+def _cash_movements_from_lines(statement_lines):
     cash_in = []
     cash_out = []
-    statement_lines = models.execute_kw(db, uid, password, 'account.bank.statement.line', 'search_read', [[['pos_session_id', '=', session_id]]], {'fields': ['amount', 'journal_id', 'payment_ref', 'ref', 'narration']})
     for line in statement_lines:
         if 'POS/' in line['payment_ref'] and '-' in line['payment_ref']:
             payment_ref = line['payment_ref'].split('-')[-1].strip()
@@ -136,141 +195,157 @@ def get_cash_movements(session_id):
                 cash_out.append(movement)
     return cash_in, cash_out
 
-def get_sales_by_payment_method(session_id):
-    _init_odoo_clients()
-    orders = models.execute_kw(db, uid, password, 'pos.order', 'search_read', [[['session_id', '=', session_id]]], {'fields': ['amount_total', 'payment_ids']})
-    
+def get_cash_movements(session_id):
+    return _cash_movements_from_lines(execute_kw(*_statement_lines_call(session_id)))
+
+def _cash_movement_domain(session_id):
+    # Mismo criterio que get_cash_movements: referencias tipo "POS/...-concepto"
+    return [['pos_session_id', '=', session_id], ['payment_ref', 'like', 'POS/'], ['payment_ref', 'like', '-']]
+
+def _cash_totals_calls(session_id) -> List[tuple]:
+    # Un read_group por signo: ingresos (> 0) y retiradas (< 0)
+    return [('account.bank.statement.line', 'read_group',
+             [_cash_movement_domain(session_id) + [sign_condition], ['amount:sum'], []],
+             {'lazy': False})
+            for sign_condition in (['amount', '>', 0], ['amount', '<', 0])]
+
+def _sum_groups(groups) -> float:
+    return sum(group.get('amount') or 0 for group in groups)
+
+def get_cash_totals(session_id):
+    """Totales de ingresos y retiradas de efectivo agregados en Odoo (read_group).
+
+    Retorna (total_ingresos, total_retiradas) con total_retiradas negativo, sin
+    descargar las líneas de extracto.
+    """
+    batch = OdooBatch()
+    for call in _cash_totals_calls(session_id):
+        batch.add(*call)
+    totals = [_sum_groups(groups) for groups in batch.execute()]
+    return totals[0], totals[1]
+
+def _methods_from_groups(groups):
     # Track each payment method separately including cash
     payment_method_totals = {}
-
-    for order in orders:
-        payments = models.execute_kw(db, uid, password, 'pos.payment', 'read', [order['payment_ids']], {'fields': ['amount', 'payment_method_id']})
-        for payment in payments:
-            method_name = payment['payment_method_id'][1]
-            method_amount = payment['amount']
-            
-            if method_name not in payment_method_totals:
-                payment_method_totals[method_name] = 0
-            payment_method_totals[method_name] += method_amount
+    for group in groups:
+        if not group.get('payment_method_id'):
+            continue
+        method_name = group['payment_method_id'][1]
+        payment_method_totals[method_name] = payment_method_totals.get(method_name, 0) + (group.get('amount') or 0)
 
     # Sort payment methods, but ensure cash comes first if present
     cash_amount = payment_method_totals.pop('Efectivo', 0)
     sorted_methods = sorted(payment_method_totals.items())
-    
+
     # Put cash back at the beginning of the list
     if cash_amount > 0:
         sorted_methods = [('Efectivo', cash_amount)] + sorted_methods
-    
+
     return sorted_methods, sum(payment_method_totals.values()), cash_amount
 
+def get_sales_by_payment_method(session_id):
+    """Totales por método de pago (efectivo primero) agregados en Odoo.
+
+    Un único read_group sobre pos.payment agrupado por payment_method_id: la
+    respuesta pesa O(métodos) en lugar de O(pagos).
+    """
+    return _methods_from_groups(execute_kw(*_payment_groups_call(session_id)))
+
 def get_stock_movements(session_id):
-    _init_odoo_clients()
     """Get stock movements for products related to this session"""
-    # First, get the session details to find the related location/warehouse
-    session_data = models.execute_kw(db, uid, password, 'pos.session', 'read', 
-                                    [session_id], 
-                                    {'fields': ['config_id', 'start_at', 'stop_at']})
-    
+    _prefetch_fields('pos.session', 'pos.order', 'pos.order.line', 'stock.move',
+                     'product.product', 'stock.quant')
+
+    # Sesión, órdenes y líneas no dependen entre sí: un solo viaje a Odoo
+    batch = OdooBatch()
+    session_idx = batch.add(*_read_call('pos.session', [session_id]))
+    orders_idx = batch.add(*_orders_call(session_id))
+    lines_idx = batch.add(*_order_lines_call(session_id))
+    results = batch.execute()
+    session_data, orders, lines = results[session_idx], results[orders_idx], results[lines_idx]
+
     if not session_data:
         return []
-    
-    # Get the POS config to find its stock location
-    pos_config_id = session_data[0]['config_id'][0]
-    pos_config = models.execute_kw(db, uid, password, 'pos.config', 'read', 
-                                  [pos_config_id], 
-                                  {'fields': ['picking_type_id']})
-    
-    if not pos_config or not pos_config[0].get('picking_type_id'):
-        return []
-    
-    # Get the picking type to find its location
-    picking_type_id = pos_config[0]['picking_type_id'][0]
-    picking_type = models.execute_kw(db, uid, password, 'stock.picking.type', 'read',
-                                   [picking_type_id],
-                                   {'fields': ['default_location_src_id']})
-    
-    if not picking_type or not picking_type[0].get('default_location_src_id'):
-        return []
-    
+
     # Get the stock location associated with this POS through its picking type
-    pos_location_id = picking_type[0]['default_location_src_id'][0]
-    
+    # (datos de referencia cacheados: no cuesta llamadas a Odoo)
+    pos_location_id = get_pos_location_id(session_data[0]['config_id'][0])
+    if not pos_location_id:
+        return []
+
     # Session time boundaries
     start_time = session_data[0]['start_at']
     end_time = session_data[0]['stop_at'] or datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    
-    print(f"Analyzing inventory movements for location {pos_location_id} between {start_time} and {end_time}")
-    
-    # Get orders from this session for sales calculation
-    orders = models.execute_kw(db, uid, password, 'pos.order', 'search_read', 
-                              [[['session_id', '=', session_id]]], 
-                              {'fields': ['id', 'name']})
-    order_ids = [order['id'] for order in orders]
+
+    logger.debug("Analyzing inventory movements for location %s between %s and %s", pos_location_id, start_time, end_time)
+
     order_names = [order['name'] for order in orders]
-    
+
     # Get all stock moves affecting our location during the session period
-    stock_moves = models.execute_kw(
-        db, uid, password, 'stock.move', 'search_read',
-        [[
+    stock_moves = _search_read(
+        'stock.move',
+        [
             '|',  # OR condition for source or destination being our location
             ['location_id', '=', pos_location_id],
             ['location_dest_id', '=', pos_location_id],
             ['state', '=', 'done'],  # Only completed moves
             ['date', '>=', start_time],
             ['date', '<=', end_time]
-        ]],
-        {'fields': ['product_id', 'product_qty', 'location_id', 'location_dest_id', 'picking_id', 'origin', 'name']}
+        ],
     )
-    
-    print(f"Found {len(stock_moves)} stock moves in the period")
-    
-    # Get all products that had movement during the session
+
+    logger.debug("Found %d stock moves in the period", len(stock_moves))
+
+    # Get all products that had movement during the session (moves + POS lines)
     all_product_ids = set()
     for move in stock_moves:
         all_product_ids.add(move['product_id'][0])
-    
-    # Add products from POS orders
-    lines = []
-    if order_ids:
-        lines = models.execute_kw(db, uid, password, 'pos.order.line', 'search_read',
-                                [[['order_id', 'in', order_ids]]], 
-                                {'fields': ['product_id', 'qty']})
-        for line in lines:
-            all_product_ids.add(line['product_id'][0])
-    
+    for line in lines:
+        all_product_ids.add(line['product_id'][0])
+
+    if not all_product_ids:
+        return []
+
+    # Nombres y stock actual de todos los productos en un solo lote
+    product_ids = sorted(all_product_ids)
+    batch = OdooBatch()
+    products_idx = batch.add(*_read_call('product.product', product_ids))
+    quants_idx = batch.add(*_search_read_call('stock.quant', [['product_id', 'in', product_ids],
+                                                              ['location_id', '=', pos_location_id]]))
+    results = batch.execute()
+
+    current_by_product = {}
+    for quant in results[quants_idx]:
+        product_id = quant['product_id'][0]
+        current_by_product[product_id] = current_by_product.get(product_id, 0) + quant['quantity']
+
     # Initialize product movement tracking
     product_movements = {}
-    for product_id in all_product_ids:
-        # Get product name
-        product_info = models.execute_kw(db, uid, password, 'product.product', 'read',
-                                       [product_id], {'fields': ['name', 'default_code']})
-        if not product_info:
-            continue
-            
-        product_name = product_info[0]['name']
-        if product_info[0].get('default_code'):
-            product_name = f"[{product_info[0]['default_code']}] {product_name}"
-            
-        product_movements[product_id] = {
-            'product_id': product_id, 
+    for product in results[products_idx]:
+        product_name = product['name']
+        if product.get('default_code'):
+            product_name = f"[{product['default_code']}] {product_name}"
+
+        product_movements[product['id']] = {
+            'product_id': product['id'],
             'product_name': product_name,
             'sold_qty': 0,
             'entries': 0,
             'exits': 0
         }
-    
+
     # Calculate sales from POS orders
     for line in lines:
         product_id = line['product_id'][0]
         if product_id in product_movements:
             product_movements[product_id]['sold_qty'] += line['qty']
-    
+
     # Analyze each stock move to categorize as entry or exit
     for move in stock_moves:
         product_id = move['product_id'][0]
         if product_id not in product_movements:
             continue
-        
+
         # Check if this move is related to a POS order (to avoid double counting)
         is_pos_related = False
         if move.get('origin'):
@@ -278,37 +353,31 @@ def get_stock_movements(session_id):
                 if order_name in move.get('origin', ''):
                     is_pos_related = True
                     break
-        
+
         # Skip POS-related movements as they're already counted in sales
         if is_pos_related:
             continue
-            
+
         # If destination is our location, it's an entry
         if move['location_dest_id'][0] == pos_location_id:
             product_movements[product_id]['entries'] += move['product_qty']
-            
+
         # If source is our location, it's an exit
         if move['location_id'][0] == pos_location_id:
             product_movements[product_id]['exits'] += move['product_qty']
-    
+
     # Get current stock levels for all affected products
     stock_info = []
     for product_id, movement in product_movements.items():
         # Skip products with no actual movement
         if movement['sold_qty'] == 0 and movement['entries'] == 0 and movement['exits'] == 0:
             continue
-            
-        # Get current stock from the specific location
-        quants = models.execute_kw(db, uid, password, 'stock.quant', 'search_read',
-                                 [[['product_id', '=', product_id], 
-                                   ['location_id', '=', pos_location_id]]],
-                                 {'fields': ['quantity']})
-        
-        current_stock = sum(q['quantity'] for q in quants) if quants else 0
-        
+
+        current_stock = current_by_product.get(product_id, 0)
+
         # Calculate initial stock by accounting for all movements
         initial_stock = current_stock + movement['sold_qty'] - movement['entries'] + movement['exits']
-        
+
         stock_info.append({
             'product_name': movement['product_name'],
             'initial_stock': initial_stock,
@@ -317,39 +386,36 @@ def get_stock_movements(session_id):
             'exits': -movement['exits'],     # Negative for outgoing
             'current_stock': current_stock
         })
-    
+
     # Sort by product name for better readability
     stock_info.sort(key=lambda x: x['product_name'])
     return stock_info
 
-def get_sales_details(session_id):
-    _init_odoo_clients()
-    """Get detailed sales information for this session"""
-    orders = models.execute_kw(db, uid, password, 'pos.order', 'search_read', 
-                              [[['session_id', '=', session_id]]], 
-                              {'fields': ['id', 'name', 'date_order', 'amount_total', 'payment_ids']})
-    
+def _sales_details_from(orders, lines, payments):
+    """Arma el detalle por orden a partir de órdenes, líneas y pagos de la sesión."""
+    lines_by_order = {}
+    for line in lines:
+        lines_by_order.setdefault(line['order_id'][0], []).append(line)
+    payments_by_id = {payment['id']: payment for payment in payments}
+
     sales_details = []
     for order in orders:
-        order_lines = models.execute_kw(db, uid, password, 'pos.order.line', 'search_read',
-                                       [[['order_id', '=', order['id']]]], 
-                                       {'fields': ['product_id', 'qty', 'price_unit', 'price_subtotal']})
-        
+        order_lines = lines_by_order.get(order['id'], [])
+
         # Get payment method information
         payment_methods = []
         if order['payment_ids']:
-            payments = models.execute_kw(db, uid, password, 'pos.payment', 'read', 
-                                        [order['payment_ids']], 
-                                        {'fields': ['amount', 'payment_method_id']})
-            
             # Group payments by method
             payment_by_method = {}
-            for payment in payments:
+            for payment_id in order['payment_ids']:
+                payment = payments_by_id.get(payment_id)
+                if not payment:
+                    continue
                 method_name = payment['payment_method_id'][1]
                 if method_name not in payment_by_method:
                     payment_by_method[method_name] = []
                 payment_by_method[method_name].append(payment['amount'])
-            
+
             # Process each payment method
             for method, amounts in payment_by_method.items():
                 if method == 'Efectivo' and len(amounts) > 1:
@@ -357,7 +423,7 @@ def get_sales_details(session_id):
                     total_paid = sum(amount for amount in amounts if amount > 0)
                     change = abs(sum(amount for amount in amounts if amount < 0))
                     net_amount = total_paid - change
-                    
+
                     payment_methods.append({
                         'method': 'Efectivo',
                         'amount': net_amount,
@@ -372,13 +438,13 @@ def get_sales_details(session_id):
                         'amount': sum(amounts),
                         'is_cash': False
                     })
-        
+
         # Format the order date with timezone adjustment
         order_time = adjust_time(order['date_order'])
-        
+
         # Check if this is a refund order
         is_refund = 'REEMBOLSO' in order['name']
-        
+
         sales_details.append({
             'order_name': order['name'],
             'order_date': order_time,
@@ -387,9 +453,190 @@ def get_sales_details(session_id):
             'payments': payment_methods,
             'is_refund': is_refund
         })
-    
+
     return sales_details
 
+def get_sales_details(session_id):
+    """Get detailed sales information for this session"""
+    # Órdenes, líneas y pagos de toda la sesión en un viaje (antes: 1 + 2 por orden)
+    _prefetch_fields('pos.order', 'pos.order.line', 'pos.payment')
+    batch = OdooBatch()
+    orders_idx = batch.add(*_orders_call(session_id))
+    lines_idx = batch.add(*_order_lines_call(session_id))
+    payments_idx = batch.add(*_payments_call(session_id))
+    results = batch.execute()
+    return _sales_details_from(results[orders_idx], results[lines_idx], results[payments_idx])
+
+def fetch_report_data(session_id) -> dict:
+    """Todos los datos del reporte de cierre en un único lote de Odoo.
+
+    Retorna un dict con cash_in, cash_out, sorted_methods, other_sales,
+    cash_sales y sales_details (mismas estructuras que las funciones get_*).
+    """
+    _prefetch_fields('account.bank.statement.line', 'pos.order', 'pos.order.line', 'pos.payment')
+    batch = OdooBatch()
+    statement_idx = batch.add(*_statement_lines_call(session_id))
+    groups_idx = batch.add(*_payment_groups_call(session_id))
+    orders_idx = batch.add(*_orders_call(session_id))
+    lines_idx = batch.add(*_order_lines_call(session_id))
+    payments_idx = batch.add(*_payments_call(session_id))
+    results = batch.execute()
+
+    return _report_data_from(results[statement_idx], results[groups_idx],
+                             results[orders_idx], results[lines_idx], results[payments_idx])
+
+def _report_data_from(statement_lines, method_groups, orders, lines, payments) -> dict:
+    cash_in, cash_out = _cash_movements_from_lines(statement_lines)
+    sorted_methods, other_sales, cash_sales = _methods_from_groups(method_groups)
+    return {
+        'cash_in': cash_in,
+        'cash_out': cash_out,
+        'sorted_methods': sorted_methods,
+        'other_sales': other_sales,
+        'cash_sales': cash_sales,
+        'sales_details': _sales_details_from(orders, lines, payments),
+    }
+
+def load_report_summary(session_id, include_movements: bool = True) -> dict:
+    """Totales del reporte sin descargar órdenes ni líneas (un lote de Odoo).
+
+    Retorna cash_in_total, cash_out_total (negativo), sorted_methods,
+    other_sales, cash_sales y order_count. Los totales de caja salen de
+    read_group; las líneas de extracto (cash_in / cash_out) solo se descargan
+    con `include_movements` (si no, quedan en None). El detalle por orden se
+    lee por páginas con iter_sales_details.
+    """
+    batch = OdooBatch()
+    cash_in_idx, cash_out_idx = (batch.add(*call) for call in _cash_totals_calls(session_id))
+    statement_idx = None
+    if include_movements:
+        _prefetch_fields('account.bank.statement.line')
+        statement_idx = batch.add(*_statement_lines_call(session_id))
+    groups_idx = batch.add(*_payment_groups_call(session_id))
+    count_idx = batch.add('pos.order', 'search_count', [[['session_id', '=', session_id]]])
+    results = batch.execute()
+    cash_in, cash_out = (_cash_movements_from_lines(results[statement_idx])
+                         if statement_idx is not None else (None, None))
+    sorted_methods, other_sales, cash_sales = _methods_from_groups(results[groups_idx])
+    return {
+        'cash_in_total': _sum_groups(results[cash_in_idx]),
+        'cash_out_total': _sum_groups(results[cash_out_idx]),
+        'cash_in': cash_in,
+        'cash_out': cash_out,
+        'sorted_methods': sorted_methods,
+        'other_sales': other_sales,
+        'cash_sales': cash_sales,
+        'order_count': results[count_idx],
+    }
+
+def iter_sales_details(session_id, page_size: int = 200) -> Iterator[List[dict]]:
+    """Detalle de ventas (misma estructura que get_sales_details) por páginas de órdenes.
+
+    Cada página cuesta un search_read de órdenes y un lote con sus líneas y
+    pagos; en memoria solo queda la página actual. Las páginas se piden por id
+    (id < último id visto, de la más nueva a la más vieja) y no por offset: en
+    una sesión abierta las órdenes nuevas correrían las páginas y el stream
+    repetiría u omitiría órdenes. Las órdenes creadas durante el stream no se
+    incluyen.
+    """
+    _prefetch_fields('pos.order', 'pos.order.line', 'pos.payment')
+    domain = [['session_id', '=', session_id]]
+    while True:
+        orders = _search_read('pos.order', domain, order='id desc', limit=page_size)
+        if not orders:
+            return
+        order_ids = [order['id'] for order in orders]
+        batch = OdooBatch()
+        lines_idx = batch.add(*_search_read_call('pos.order.line', [['order_id', 'in', order_ids]]))
+        payments_idx = batch.add(*_search_read_call('pos.payment', [['pos_order_id', 'in', order_ids]]))
+        results = batch.execute()
+        yield _sales_details_from(orders, results[lines_idx], results[payments_idx])
+        if len(orders) < page_size:
+            return
+        domain = [['session_id', '=', session_id], ['id', '<', order_ids[-1]]]
+
+# ---------------------------------------------------------------------------
+# Reporte en vivo (X) de sesiones abiertas: estado incremental por sesión.
+# La primera consulta trae todo; las siguientes solo registros con write_date
+# posterior al último sync (menos un margen, porque write_date es la hora de
+# inicio de la transacción en Odoo y una transacción larga puede confirmar
+# después). Los registros se fusionan por id en el estado guardado en el
+# cache compartido (namespace "live"). Cada LIVE_REPORT_FULL_SYNC segundos se
+# rehace desde cero para corregir borrados.
+# ---------------------------------------------------------------------------
+_LIVE_NS = "live"
+_LIVE_CALLS = (
+    ('statement_lines', _statement_lines_call),
+    ('orders', _orders_call),
+    ('lines', _order_lines_call),
+    ('payments', _payments_call),
+)
+
+def _live_setting(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name) or default)
+    except ValueError:
+        return default
+
+def _written_since(call: tuple, since: str) -> tuple:
+    model, method, args, kwargs = call
+    return (model, method, [args[0] + [['write_date', '>=', since]]], kwargs)
+
+def fetch_live_report_data(session_id) -> dict:
+    """Como fetch_report_data, pero incremental (para sesiones abiertas).
+
+    Cada refresco cuesta O(registros nuevos o modificados) en lugar de
+    O(sesión). Los totales por método se suman localmente desde los pagos.
+    """
+    cache = get_cache()
+    key = str(session_id)
+    now = time.time()
+    state = cache.get(_LIVE_NS, key)
+    if state is None or now - state['full_sync_at'] > _live_setting('LIVE_REPORT_FULL_SYNC', 1800):
+        state = {'cursor': None, 'full_sync_at': now, 'records': {name: {} for name, _ in _LIVE_CALLS}}
+
+    since = None
+    if state['cursor']:
+        overlap = timedelta(seconds=_live_setting('LIVE_REPORT_OVERLAP', 300))
+        since = (parse_odoo_datetime(state['cursor']) - overlap).strftime('%Y-%m-%d %H:%M:%S')
+
+    _prefetch_fields('account.bank.statement.line', 'pos.order', 'pos.order.line', 'pos.payment')
+    batch = OdooBatch()
+    index = {}
+    for name, build_call in _LIVE_CALLS:
+        call = build_call(session_id)
+        index[name] = batch.add(*(_written_since(call, since) if since else call))
+    results = batch.execute()
+
+    cursor = state['cursor']
+    for name, idx in index.items():
+        bucket = state['records'][name]
+        for record in results[idx]:
+            bucket[record['id']] = record
+            written = record.get('write_date')
+            if written and (cursor is None or written > cursor):
+                cursor = written
+    state['cursor'] = cursor
+    cache.set(_LIVE_NS, key, state, ttl=_live_setting('LIVE_REPORT_STATE_TTL', 43200))
+
+    records = state['records']
+    by_id = lambda bucket: [bucket[record_id] for record_id in sorted(bucket)]  # noqa: E731
+    # Mismo orden por defecto de pos.order en Odoo: más recientes primero
+    orders = sorted(records['orders'].values(), key=lambda o: (o['date_order'] or '', o['id']), reverse=True)
+    payments = by_id(records['payments'])
+    return _report_data_from(by_id(records['statement_lines']), payments, orders,
+                             by_id(records['lines']), payments)
+
+
+def load_report_data(session_data: dict) -> dict:
+    """Datos del reporte de una sesión (misma estructura que fetch_report_data).
+
+    Movimientos, métodos de pago y detalle de ventas en un solo lote de Odoo;
+    las sesiones abiertas se refrescan de forma incremental.
+    """
+    if _report_cache_key(session_data):
+        return fetch_report_data(session_data['id'])
+    return fetch_live_report_data(session_data['id'])
 
 def generate_pdf(session_data_or_name) -> str:
     """Genera un PDF de cierre de caja.
@@ -421,19 +668,29 @@ def generate_pdf(session_data_or_name) -> str:
             if k not in session_data:
                 raise ValueError(f"Falta clave requerida en session_data: {k}")
 
-        pdf = FPDF()
-        
-        # First page - Cash information with improved layout
-        pdf.add_page()
-        
         # Header with POS name and date - Trim the name at the parenthesis
         full_pos_name = session_data['config_id'][1]
         pos_name = full_pos_name.split('(')[0].strip()  # Get text before the parenthesis and trim whitespace
         
         # Format the date in Spanish style: "01 de Enero del 2025"
-        date_obj = datetime.strptime(session_data['start_at'], '%Y-%m-%d %H:%M:%S')
+        date_obj = parse_odoo_datetime(session_data['start_at'])
         date = format_date_spanish(date_obj)
         filename = f"{pos_name.replace(' ', '_')}_{date_obj.strftime('%Y-%m-%d')}.pdf"
+
+        # Sesiones cerradas no cambian: reutilizar el PDF ya renderizado (cache compartido entre workers)
+        cache_key = _report_cache_key(session_data)
+        if cache_key:
+            cached_pdf = get_cache().get(_REPORTS_NS, cache_key)
+            if cached_pdf:
+                with open(filename, 'wb') as f:
+                    f.write(cached_pdf)
+                return filename
+
+        render_started = time.perf_counter()
+        pdf = FPDF()
+        
+        # First page - Cash information with improved layout
+        pdf.add_page()
         
         # Add a nice header
         pdf.set_font("Arial", 'B', 16)
@@ -457,9 +714,13 @@ def generate_pdf(session_data_or_name) -> str:
         pdf.cell(95, 8, f"Hora de cierre: {session_end}", 0, 1, 'R')
         pdf.ln(5)
         
-        # Get data
-        cash_in, cash_out = get_cash_movements(session_data['id'])
-        sorted_methods, other_sales, cash_sales = get_sales_by_payment_method(session_data['id'])
+        # Get data (el tiempo de consulta a Odoo no cuenta como render)
+        query_started = time.perf_counter()
+        report_data = load_report_data(session_data)
+        query_seconds = time.perf_counter() - query_started
+        cash_in, cash_out = report_data['cash_in'], report_data['cash_out']
+        sorted_methods = report_data['sorted_methods']
+        other_sales, cash_sales = report_data['other_sales'], report_data['cash_sales']
 
         # Cash summary section
         pdf.set_font("Arial", 'B', 14)
@@ -575,7 +836,7 @@ def generate_pdf(session_data_or_name) -> str:
                 pdf.cell(90, 8, f"{format_currency(method_amount)}", 1, 1, 'R')
         
         # Add sales details
-        sales_details = get_sales_details(session_id=session_data['id'])
+        sales_details = report_data['sales_details']
         if sales_details:
             # Separate regular sales and refunds
             regular_sales = [order for order in sales_details if not order['is_refund']]
@@ -682,8 +943,14 @@ def generate_pdf(session_data_or_name) -> str:
                     pdf.ln(5)
 
         pdf.output(filename)
+        logs.add_ms("render_ms", time.perf_counter() - render_started - query_seconds)
+        if cache_key:
+            ttl = _report_cache_ttl()
+            if ttl > 0:
+                with open(filename, 'rb') as f:
+                    get_cache().set(_REPORTS_NS, cache_key, f.read(), ttl=ttl)
         return filename
-    except SessionNotFoundError:
+    except (SessionNotFoundError, CircuitOpenError):
         raise
     except Exception as e:
         raise PDFGenerationError(f"Error generando PDF: {e}") from e
@@ -0,0 +1,251 @@
+"""Perfilado bajo demanda en producción (solo administradores).
+
+Dos modos:
+
+1. Perfil de un request (cProfile). Con el header `X-Profile: 1` (o el query
+   `_profile=1`) más un `X-Admin-Token` válido, el endpoint se ejecuta bajo
+   cProfile en el hilo que lo atiende. La respuesta es la normal y lleva el
+   header `X-Profile-Id`; el perfil queda en DATA_DIR/profiles/<id>.pstats
+   (descargable en formato pstats o como texto ordenado por tiempo acumulado).
+   Los routers usan `route_class=ProfiledRoute` para que el endpoint corra
+   dentro del perfilador (cProfile solo ve el hilo donde se activa). En
+   endpoints async el perfil incluye también lo que corra en el event loop
+   mientras el endpoint espera; para esos conviene el muestreo.
+
+2. Muestreo del proceso completo. `sample(seconds)` toma cada `interval`
+   segundos la pila de todos los hilos (sys._current_frames) y guarda las
+   pilas agregadas en formato "collapsed" (una línea "f1;f2;f3 N" por pila),
+   listo para flamegraph.pl o speedscope. No instrumenta nada: el costo es
+   proporcional a la frecuencia de muestreo.
+
+Variables de entorno (opcionales):
+    PROFILE_KEEP -> perfiles guardados antes de borrar los más viejos (default 50)
+"""
+
+import cProfile
+import functools
+import hmac
+import inspect
+import io
+import logging
+import os
+import pstats
+import sys
+import threading
+import time
+import uuid
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional
+
+from fastapi.routing import APIRoute
+
+from services.storage import data_path
+
+_active: ContextVar[Optional[cProfile.Profile]] = ContextVar("profile", default=None)
+_sample_lock = threading.Lock()
+
+logger = logging.getLogger(__name__)
+
+# Hojas de pila que son hilos esperando (no consumen CPU)
+_IDLE_FILES = ("threading.py", "selectors.py", "queue.py", os.path.join("concurrent", "futures", "thread.py"))
+
+
+def _profiles_dir() -> str:
+    path = data_path("profiles")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _prune() -> None:
+    try:
+        keep = max(1, int(os.getenv("PROFILE_KEEP") or 50))
+    except ValueError:
+        keep = 50
+    directory = _profiles_dir()
+    files = sorted((os.path.join(directory, f) for f in os.listdir(directory)), key=os.path.getmtime, reverse=True)
+    for path in files[keep:]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def profile_path(profile_id: str, extension: str) -> str:
+    if not profile_id.isalnum():
+        raise ValueError("Id de perfil inválido")
+    return os.path.join(_profiles_dir(), f"{profile_id}.{extension}")
+
+
+# -- perfil por request -------------------------------------------------------
+
+def is_authorized(token: Optional[str]) -> bool:
+    expected = os.getenv("ADMIN_TOKEN")
+    return bool(expected and token and hmac.compare_digest(token, expected))
+
+
+def _wrap(endpoint: Callable) -> Callable:
+    if getattr(endpoint, "_profiled", False):
+        # include_router vuelve a crear la ruta con el endpoint ya envuelto
+        return endpoint
+    if inspect.iscoroutinefunction(endpoint):
+        @functools.wraps(endpoint)
+        async def async_wrapper(*args, **kwargs):
+            profile = _active.get()
+            if profile is None:
+                return await endpoint(*args, **kwargs)
+            profile.enable()
+            try:
+                return await endpoint(*args, **kwargs)
+            finally:
+                profile.disable()
+        async_wrapper._profiled = True
+        return async_wrapper
+
+    @functools.wraps(endpoint)
+    def wrapper(*args, **kwargs):
+        profile = _active.get()
+        if profile is None:
+            return endpoint(*args, **kwargs)
+        profile.enable()
+        try:
+            return endpoint(*args, **kwargs)
+        finally:
+            profile.disable()
+    wrapper._profiled = True
+    return wrapper
+
+
+class ProfiledRoute(APIRoute):
+    """APIRoute cuyo endpoint se ejecuta bajo el cProfile del request, si hay uno activo."""
+
+    def __init__(self, path: str, endpoint: Callable, **kwargs):
+        super().__init__(path, _wrap(endpoint), **kwargs)
+
+
+class ProfileMiddleware:
+    """Middleware ASGI: activa el perfil del request y agrega X-Profile-Id a la respuesta."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not _requested(scope):
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope.get("headers") or [])
+        if not is_authorized((headers.get(b"x-admin-token") or b"").decode("latin-1")):
+            await self.app(scope, receive, send)
+            return
+
+        profile_id = uuid.uuid4().hex[:16]
+        profile = cProfile.Profile()
+        token = _active.set(profile)
+        started = time.perf_counter()
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                message = dict(message)
+                message["headers"] = list(message.get("headers") or []) + [(b"x-profile-id", profile_id.encode("ascii"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            _active.reset(token)
+            elapsed = time.perf_counter() - started
+            try:
+                profile.dump_stats(profile_path(profile_id, "pstats"))
+                _prune()
+                logger.info("%s %s %.0f ms -> %s", scope['method'], scope['path'], elapsed * 1000, profile_id,
+                            extra={"profile_id": profile_id})
+            except Exception as e:  # noqa: BLE001
+                logger.warning("no se pudo guardar el perfil %s: %s", profile_id, e)
+
+
+def _requested(scope) -> bool:
+    for name, value in scope.get("headers") or []:
+        if name == b"x-profile" and value in (b"1", b"true"):
+            return True
+    query = scope.get("query_string") or b""
+    return b"_profile=1" in query.split(b"&")
+
+
+def stats_text(profile_id: str, sort: str = "cumulative", limit: int = 60) -> str:
+    """Resumen legible (pstats) de un perfil guardado."""
+    out = io.StringIO()
+    stats = pstats.Stats(profile_path(profile_id, "pstats"), stream=out)
+    stats.strip_dirs().sort_stats(sort).print_stats(limit)
+    return out.getvalue()
+
+
+def list_profiles() -> List[dict]:
+    directory = _profiles_dir()
+    profiles = []
+    for filename in sorted(os.listdir(directory), key=lambda f: os.path.getmtime(os.path.join(directory, f)), reverse=True):
+        profile_id, _, extension = filename.partition(".")
+        path = os.path.join(directory, filename)
+        profiles.append({"id": profile_id, "kind": extension, "bytes": os.path.getsize(path),
+                         "created_at": os.path.getmtime(path)})
+    return profiles
+
+
+# -- muestreo del proceso -------------------------------------------------------
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    module = frame.f_globals.get("__name__", os.path.basename(code.co_filename))
+    return f"{module}:{code.co_name}"
+
+
+def sample(seconds: float, interval: float = 0.005, include_idle: bool = False) -> dict:
+    """Muestrea las pilas de todos los hilos durante `seconds` y guarda el archivo collapsed.
+
+    Lanza RuntimeError si ya hay un muestreo en curso.
+    """
+    if not _sample_lock.acquire(blocking=False):
+        raise RuntimeError("Ya hay un muestreo en curso")
+    try:
+        own = threading.get_ident()
+        counts: Dict[str, int] = {}
+        samples = 0
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                if not include_idle and frame.f_code.co_filename.endswith(_IDLE_FILES):
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                key = ";".join(reversed(stack))
+                counts[key] = counts.get(key, 0) + 1
+            samples += 1
+            time.sleep(interval)
+    finally:
+        _sample_lock.release()
+
+    profile_id = uuid.uuid4().hex[:16]
+    with open(profile_path(profile_id, "collapsed"), "w", encoding="utf-8") as f:
+        for stack, count in sorted(counts.items(), key=lambda item: -item[1]):
+            f.write(f"{stack} {count}\n")
+    _prune()
+
+    leaves: Dict[str, int] = {}
+    for stack, count in counts.items():
+        leaf = stack.rsplit(";", 1)[-1]
+        leaves[leaf] = leaves.get(leaf, 0) + count
+    return {
+        "id": profile_id,
+        "seconds": seconds,
+        "samples": samples,
+        "stacks": len(counts),
+        "top_functions": [{"function": name, "samples": count}
+                          for name, count in sorted(leaves.items(), key=lambda item: -item[1])[:20]],
+    }
+
+
+__all__ = ["ProfiledRoute", "ProfileMiddleware", "sample", "stats_text", "list_profiles", "profile_path", "is_authorized"]
@@ -0,0 +1,177 @@
+"""Readiness: prober en segundo plano con resultados cacheados.
+
+Un hilo daemon revisa cada READY_PROBE_INTERVAL segundos:
+    - odoo:   re-autenticación contra /xmlrpc/2/common (credenciales vigentes).
+    - bridge: estado de conexión de las instancias WhatsApp (al menos una "open";
+              con alguna caída el estado es "degraded").
+y guarda el resultado en memoria. Mientras el warm-up de arranque no termine
+la instancia se reporta como no lista. `/ready` solo lee ese snapshot (más el
+estado de los breakers y la profundidad de colas), así que responde en
+microsegundos y el healthcheck de Coolify no carga Odoo ni el bridge.
+
+Breakers: cualquier breaker abierto saca a la instancia, salvo los de WhatsApp
+por instancia ("whatsapp:<nombre>"): basta con que uno no esté abierto.
+
+Colas: cualquier módulo puede exponer su profundidad con
+    register_gauge("nombre", lambda: len(cola))
+
+Variables de entorno (opcionales):
+    READY_PROBE_INTERVAL -> segundos entre chequeos (default 15)
+"""
+
+import os
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+from clients.breaker import OPEN, breakers_snapshot
+from clients.odoo import authenticate
+from clients.whatsapp import connection_states, get_instances, get_whatsapp_breaker, pending_confirmations
+from services import logs
+from services.warmup import warmup_done, warmup_state
+
+_DEFAULT_INTERVAL = 15.0
+
+
+def _interval() -> float:
+    try:
+        return max(1.0, float(os.getenv("READY_PROBE_INTERVAL") or _DEFAULT_INTERVAL))
+    except ValueError:
+        return _DEFAULT_INTERVAL
+
+
+def _check_odoo() -> dict:
+    uid = authenticate(force=True)
+    return {"uid": uid}
+
+
+def _check_bridge() -> dict:
+    states = connection_states()
+    if "open" not in states.values():
+        raise RuntimeError(f"Ninguna instancia WhatsApp conectada: {states}")
+    state = "open" if all(s == "open" for s in states.values()) else "degraded"
+    return {"state": state, "instances": states}
+
+
+def _is_whatsapp_breaker(name: str) -> bool:
+    return name == "whatsapp" or name.startswith("whatsapp:")
+
+
+def _whatsapp_available() -> bool:
+    """Al menos una instancia WhatsApp con el breaker cerrado o semiabierto."""
+    try:
+        instances = get_instances()
+    except ValueError:
+        return False
+    return any(get_whatsapp_breaker(inst.name).state != OPEN for inst in instances)
+
+
+_CHECKS: Dict[str, Callable[[], dict]] = {
+    "odoo": _check_odoo,
+    "bridge": _check_bridge,
+}
+
+_gauges: Dict[str, Callable[[], int]] = {}
+_inflight = 0
+_inflight_lock = threading.Lock()
+
+
+def register_gauge(name: str, fn: Callable[[], int]) -> None:
+    """Registra una función que devuelve la profundidad actual de una cola."""
+    _gauges[name] = fn
+
+
+def request_started() -> None:
+    global _inflight
+    with _inflight_lock:
+        _inflight += 1
+
+
+def request_finished() -> None:
+    global _inflight
+    with _inflight_lock:
+        _inflight -= 1
+
+
+register_gauge("http_inflight", lambda: _inflight)
+register_gauge("whatsapp_pending_confirmations", pending_confirmations)
+register_gauge("log_queue_depth", logs.queue_depth)
+register_gauge("log_dropped_records", logs.dropped_records)
+
+
+class ReadinessProber:
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._results: Dict[str, dict] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._last_run = 0.0
+
+    def run_once(self) -> None:
+        for name, check in _CHECKS.items():
+            started = time.perf_counter()
+            try:
+                detail = check()
+                result = {"ok": True, **detail}
+            except Exception as e:  # noqa: BLE001
+                result = {"ok": False, "error": str(e)}
+            result["latency_ms"] = round((time.perf_counter() - started) * 1000, 1)
+            result["checked_at"] = time.time()
+            self._results[name] = result
+        self._last_run = time.monotonic()
+
+    def _loop(self) -> None:
+        while not self._stop.is_set():
+            self.run_once()
+            self._stop.wait(self.interval)
+
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="readiness-prober", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def snapshot(self) -> dict:
+        """Estado cacheado; no hace I/O."""
+        checks = {name: dict(result) for name, result in self._results.items()}
+        stale = not self._last_run or time.monotonic() - self._last_run > self.interval * 3
+        breakers = breakers_snapshot()
+        queues = {}
+        for name, fn in list(_gauges.items()):
+            try:
+                queues[name] = fn()
+            except Exception:  # noqa: BLE001
+                queues[name] = None
+        ready = (
+            warmup_done()
+            and not stale
+            and all(checks.get(name, {}).get("ok") for name in _CHECKS)
+            # Un breaker abierto de una instancia WhatsApp no saca al pod si otra sigue atendiendo
+            and all(b["state"] != OPEN for name, b in breakers.items() if not _is_whatsapp_breaker(name))
+            and _whatsapp_available()
+        )
+        return {
+            "ready": ready,
+            "stale": stale,
+            "warmup": warmup_state(),
+            "checks": checks,
+            "breakers": {name: b["state"] for name, b in breakers.items()},
+            "queues": queues,
+        }
+
+
+_prober: Optional[ReadinessProber] = None
+
+
+def get_prober() -> ReadinessProber:
+    global _prober
+    if _prober is None:
+        _prober = ReadinessProber(_interval())
+    return _prober
+
+
+__all__ = ["ReadinessProber", "get_prober", "register_gauge", "request_started", "request_finished"]
@@ -0,0 +1,138 @@
+"""Datos de referencia de Odoo cacheados (configuración que casi no cambia).
+
+Modelos cubiertos y TTL por defecto:
+    pos.config          -> 1 h   (picking_type_id, nombre, activo)
+    stock.picking.type  -> 24 h  (default_location_src_id)
+    pos.payment.method  -> 24 h  (nombre)
+
+Los registros se guardan en el cache compartido (services.cache), un namespace
+por modelo ("reference:pos.config", ...), así que con CACHE_BACKEND=sqlite
+todos los workers ven la misma copia y una invalidación aplica a todos.
+
+En el arranque prefetch() carga en bloque todos los pos.config activos, sus
+picking types y los métodos de pago; los reportes resuelven la cadena
+config -> picking type -> ubicación desde memoria y solo gastan llamadas a
+Odoo en datos transaccionales.
+
+Variables de entorno (opcionales):
+    REFERENCE_CACHE_TTL -> TTL en segundos para todos los modelos (reemplaza los defaults)
+"""
+
+import os
+from typing import Dict, Iterable, List, Optional
+
+from clients.odoo import OdooBatch, execute_kw
+from services.cache import get_cache
+
+_MODELS: Dict[str, dict] = {
+    "pos.config": {"fields": ["name", "active", "picking_type_id"], "ttl": 3600.0},
+    "stock.picking.type": {"fields": ["name", "default_location_src_id"], "ttl": 86400.0},
+    "pos.payment.method": {"fields": ["name"], "ttl": 86400.0},
+}
+
+
+def _namespace(model: str) -> str:
+    return f"reference:{model}"
+
+
+def _ttl(model: str) -> float:
+    raw = os.getenv("REFERENCE_CACHE_TTL")
+    if raw:
+        try:
+            return float(raw)
+        except ValueError:
+            pass
+    return _MODELS[model]["ttl"]
+
+
+def _store(model: str, records: Iterable[dict]) -> int:
+    cache = get_cache()
+    ttl = _ttl(model)
+    count = 0
+    for record in records:
+        cache.set(_namespace(model), str(record["id"]), record, ttl=ttl)
+        count += 1
+    return count
+
+
+def get_records(model: str, ids: List[int]) -> Dict[int, dict]:
+    """Registros de `model` por id; los que faltan en cache se leen en un solo read."""
+    if model not in _MODELS:
+        raise ValueError(f"Modelo sin cache de referencia: {model}")
+    cache = get_cache()
+    found: Dict[int, dict] = {}
+    missing = []
+    for record_id in ids:
+        record = cache.get(_namespace(model), str(record_id))
+        if record is None:
+            missing.append(record_id)
+        else:
+            found[record_id] = record
+    if missing:
+        records = execute_kw(model, "read", [missing], {"fields": _MODELS[model]["fields"]})
+        _store(model, records)
+        found.update((record["id"], record) for record in records)
+    return found
+
+
+def get_record(model: str, record_id: int) -> Optional[dict]:
+    return get_records(model, [record_id]).get(record_id)
+
+
+def get_pos_location_id(config_id: int) -> Optional[int]:
+    """Ubicación de stock del POS (pos.config -> picking type -> ubicación origen)."""
+    config = get_record("pos.config", config_id)
+    if not config or not config.get("picking_type_id"):
+        return None
+    picking_type = get_record("stock.picking.type", config["picking_type_id"][0])
+    if not picking_type or not picking_type.get("default_location_src_id"):
+        return None
+    return picking_type["default_location_src_id"][0]
+
+
+def get_payment_method_name(method_id: int) -> Optional[str]:
+    method = get_record("pos.payment.method", method_id)
+    return method["name"] if method else None
+
+
+def prefetch() -> Dict[str, int]:
+    """Carga en bloque los pos.config activos, sus picking types y los métodos de pago."""
+    batch = OdooBatch()
+    configs_idx = batch.add("pos.config", "search_read", [[["active", "=", True]]],
+                            {"fields": _MODELS["pos.config"]["fields"]})
+    methods_idx = batch.add("pos.payment.method", "search_read", [[]],
+                            {"fields": _MODELS["pos.payment.method"]["fields"]})
+    results = batch.execute()
+    configs = results[configs_idx]
+
+    picking_type_ids = sorted({c["picking_type_id"][0] for c in configs if c.get("picking_type_id")})
+    picking_types = []
+    if picking_type_ids:
+        picking_types = execute_kw("stock.picking.type", "read", [picking_type_ids],
+                                   {"fields": _MODELS["stock.picking.type"]["fields"]})
+    return {
+        "pos.config": _store("pos.config", configs),
+        "stock.picking.type": _store("stock.picking.type", picking_types),
+        "pos.payment.method": _store("pos.payment.method", results[methods_idx]),
+    }
+
+
+def invalidate(model: Optional[str] = None) -> List[str]:
+    """Descarta el cache de un modelo (o de todos). Retorna los modelos invalidados."""
+    if model is not None and model not in _MODELS:
+        raise ValueError(f"Modelo sin cache de referencia: {model}. Use: {', '.join(_MODELS)}")
+    models = [model] if model else list(_MODELS)
+    cache = get_cache()
+    for name in models:
+        cache.clear(_namespace(name))
+    return models
+
+
+__all__ = [
+    "get_records",
+    "get_record",
+    "get_pos_location_id",
+    "get_payment_method_name",
+    "prefetch",
+    "invalidate",
+]
@@ -0,0 +1,48 @@
+"""Ubicación de datos locales y conexiones SQLite compartidas.
+
+Todo lo que la app persiste en disco (cache compartido entre workers, etc.)
+vive bajo DATA_DIR (default ./data). Las conexiones SQLite se abren en modo
+WAL para permitir lectores concurrentes desde varios procesos uvicorn.
+"""
+
+import os
+import sqlite3
+import threading
+from typing import Dict
+
+_local = threading.local()
+
+
+def data_dir() -> str:
+    """Directorio de datos (DATA_DIR). Se crea si no existe."""
+    path = os.getenv("DATA_DIR") or os.path.join(os.getcwd(), "data")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def data_path(filename: str) -> str:
+    """Ruta absoluta de un archivo dentro de DATA_DIR."""
+    return os.path.join(data_dir(), filename)
+
+
+def connect_sqlite(path: str) -> sqlite3.Connection:
+    """Abre una conexión SQLite configurada para uso multi-proceso (WAL)."""
+    conn = sqlite3.connect(path, timeout=10.0, isolation_level=None, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA busy_timeout=10000")
+    return conn
+
+
+def thread_connection(path: str) -> sqlite3.Connection:
+    """Conexión SQLite reutilizada por hilo (sqlite3 no comparte bien entre hilos)."""
+    conns: Dict[str, sqlite3.Connection] = getattr(_local, "conns", None)
+    if conns is None:
+        conns = _local.conns = {}
+    conn = conns.get(path)
+    if conn is None:
+        conn = conns[path] = connect_sqlite(path)
+    return conn
+
+
+__all__ = ["data_dir", "data_path", "connect_sqlite", "thread_connection"]
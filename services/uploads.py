@@ -0,0 +1,148 @@
+"""Lectura en streaming de PDFs subidos como multipart/form-data.
+
+read_pdf_upload(request) consume el cuerpo del request por fragmentos con el
+parser incremental de python-multipart: el archivo va directo a un
+SpooledTemporaryFile (memoria hasta UPLOAD_SPOOL_BYTES, luego disco), sin
+base64 ni un bytes completo del cuerpo. El encabezado %PDF- se valida con los
+primeros bytes del archivo y el tope de tamaño se aplica mientras llega, así
+un archivo inválido o demasiado grande se rechaza sin leer el resto.
+
+Variables de entorno (opcionales):
+    UPLOAD_MAX_BYTES   -> tamaño máximo del PDF (default 20 MB)
+    UPLOAD_SPOOL_BYTES -> bytes que se mantienen en memoria antes de pasar a disco (default 1 MB)
+"""
+
+import os
+import tempfile
+from typing import Dict, Optional, Tuple
+
+from fastapi import HTTPException, Request
+
+try:
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ImportError:  # python-multipart < 0.0.13
+    from multipart.multipart import MultipartParser, parse_options_header  # type: ignore
+
+_PDF_MAGIC = b"%PDF-"
+_MAX_FIELD_BYTES = 64 * 1024
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name) or default)
+    except ValueError:
+        return default
+
+
+class PDFUpload:
+    """Archivo recibido: `file` (posicionado al inicio), `filename` y `size`."""
+
+    def __init__(self, file, filename: Optional[str], size: int):
+        self.file = file
+        self.filename = filename
+        self.size = size
+
+    def close(self) -> None:
+        self.file.close()
+
+
+async def read_pdf_upload(request: Request, file_field: str = "pdf") -> Tuple[Dict[str, str], PDFUpload]:
+    """Parsea un multipart con un PDF en `file_field` y campos de texto.
+
+    Retorna (campos, upload). Lanza HTTPException 400 (formato, encabezado PDF,
+    archivo faltante), 413 (tamaño) o 415 (content-type).
+    """
+    max_bytes = _env_int("UPLOAD_MAX_BYTES", 20 * 1024 * 1024)
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or not params.get(b"boundary"):
+        raise HTTPException(status_code=415, detail="Se esperaba multipart/form-data")
+    declared = request.headers.get("content-length")
+    if declared and declared.isdigit() and int(declared) > max_bytes + _MAX_FIELD_BYTES:
+        raise HTTPException(status_code=413, detail=f"El archivo supera el máximo de {max_bytes} bytes")
+
+    spool = tempfile.SpooledTemporaryFile(max_size=_env_int("UPLOAD_SPOOL_BYTES", 1024 * 1024))
+    fields: Dict[str, str] = {}
+    state = {"header_field": b"", "headers": {}, "name": None, "filename": None,
+             "is_file": False, "buffer": bytearray(), "size": 0, "found": False}
+
+    def on_part_begin():
+        state.update(headers={}, name=None, filename=None, is_file=False, buffer=bytearray())
+
+    def on_header_field(data, start, end):
+        state["header_field"] += data[start:end]
+
+    def on_header_value(data, start, end):
+        key = state["header_field"].lower()
+        state["headers"][key] = state["headers"].get(key, b"") + data[start:end]
+
+    def on_header_end():
+        state["header_field"] = b""
+
+    def on_headers_finished():
+        _, disposition = parse_options_header(state["headers"].get(b"content-disposition", b""))
+        name = disposition.get(b"name", b"").decode("utf-8", "replace")
+        filename = disposition.get(b"filename")
+        state["name"] = name
+        if name == file_field:
+            if state["found"]:
+                raise HTTPException(status_code=400, detail=f"Solo se admite un archivo en '{file_field}'")
+            state["is_file"] = True
+            state["found"] = True
+            state["filename"] = filename.decode("utf-8", "replace") if filename else None
+
+    def on_part_data(data, start, end):
+        chunk = data[start:end]
+        if not state["is_file"]:
+            state["buffer"] += chunk
+            if len(state["buffer"]) > _MAX_FIELD_BYTES:
+                raise HTTPException(status_code=413, detail=f"Campo '{state['name']}' demasiado grande")
+            return
+        previous = state["size"]
+        state["size"] += len(chunk)
+        if state["size"] > max_bytes:
+            raise HTTPException(status_code=413, detail=f"El archivo supera el máximo de {max_bytes} bytes")
+        spool.write(chunk)
+        # Validar el encabezado apenas hay suficientes bytes
+        if previous < len(_PDF_MAGIC) <= state["size"]:
+            spool.seek(0)
+            head = spool.read(len(_PDF_MAGIC))
+            spool.seek(0, os.SEEK_END)
+            if head != _PDF_MAGIC:
+                raise HTTPException(status_code=400, detail="El archivo no es un PDF (falta encabezado %PDF-)")
+
+    def on_part_end():
+        if not state["is_file"] and state["name"]:
+            fields[state["name"]] = bytes(state["buffer"]).decode("utf-8", "replace")
+
+    parser = MultipartParser(params[b"boundary"], {
+        "on_part_begin": on_part_begin,
+        "on_part_data": on_part_data,
+        "on_part_end": on_part_end,
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_header_end": on_header_end,
+        "on_headers_finished": on_headers_finished,
+    })
+    try:
+        async for chunk in request.stream():
+            if chunk:
+                parser.write(chunk)
+        parser.finalize()
+    except HTTPException:
+        spool.close()
+        raise
+    except Exception as e:  # noqa: BLE001
+        spool.close()
+        raise HTTPException(status_code=400, detail=f"multipart inválido: {e}") from e
+
+    if not state["found"] or state["size"] == 0:
+        spool.close()
+        raise HTTPException(status_code=400, detail=f"Falta el archivo PDF en el campo '{file_field}'")
+    if state["size"] < len(_PDF_MAGIC):
+        spool.close()
+        raise HTTPException(status_code=400, detail="El archivo no es un PDF (falta encabezado %PDF-)")
+    spool.seek(0)
+    return fields, PDFUpload(spool, state["filename"], state["size"])
+
+
+__all__ = ["read_pdf_upload", "PDFUpload"]
@@ -0,0 +1,75 @@
+"""Warm-up de arranque: paga los costos de "primer request" antes del tráfico.
+
+Pasos (cada uno se mide y un fallo no impide los siguientes):
+    odoo_auth    -> carga de entorno + authenticate() (uid cacheado)
+    odoo_pool    -> abre ODOO_POOL_SIZE conexiones keep-alive (TCP + TLS)
+    reference    -> datos de referencia (pos.config activos, picking types, métodos de pago)
+    bridge_pool  -> primera llamada a cada instancia del bridge con el cliente HTTP compartido
+    fonts        -> métricas de fuentes fpdf usadas por el reporte
+    chat_aliases -> resolución de alias de chat -> JID
+
+Corre en un hilo en segundo plano lanzado desde el lifespan de FastAPI;
+`/ready` responde 503 hasta que termina.
+"""
+
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from clients.odoo import authenticate, warm_pool
+from clients.whatsapp import connection_states
+from services.chats import preload_aliases
+from services.pdf_service import preload_fonts
+from services.reference_data import prefetch as prefetch_reference_data
+
+_STEPS: List[Tuple[str, Callable[[], object]]] = [
+    ("odoo_auth", authenticate),
+    ("odoo_pool", warm_pool),
+    ("reference", prefetch_reference_data),
+    ("bridge_pool", connection_states),
+    ("fonts", preload_fonts),
+    ("chat_aliases", lambda: sorted(preload_aliases())),
+]
+
+_state: Dict[str, object] = {"done": False, "started_at": None, "finished_at": None, "steps": {}}
+_thread: Optional[threading.Thread] = None
+
+
+def run_warmup() -> dict:
+    """Ejecuta todos los pasos de warm-up de forma síncrona."""
+    _state.update(done=False, started_at=time.time(), finished_at=None, steps={})
+    steps: Dict[str, dict] = {}
+    for name, step in _STEPS:
+        started = time.perf_counter()
+        try:
+            result = step()
+            entry = {"ok": True}
+            if result is not None:
+                entry["result"] = result
+        except Exception as e:  # noqa: BLE001
+            entry = {"ok": False, "error": str(e)}
+        entry["ms"] = round((time.perf_counter() - started) * 1000, 1)
+        steps[name] = entry
+        _state["steps"] = dict(steps)
+    _state.update(done=True, finished_at=time.time())
+    return warmup_state()
+
+
+def start_warmup() -> None:
+    """Lanza run_warmup() en un hilo daemon (no bloquea el arranque)."""
+    global _thread
+    if _thread and _thread.is_alive():
+        return
+    _thread = threading.Thread(target=run_warmup, name="warmup", daemon=True)
+    _thread.start()
+
+
+def warmup_done() -> bool:
+    return bool(_state["done"])
+
+
+def warmup_state() -> dict:
+    return {k: (dict(v) if isinstance(v, dict) else v) for k, v in _state.items()}
+
+
+__all__ = ["run_warmup", "start_warmup", "warmup_done", "warmup_state"]
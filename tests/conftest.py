@@ -0,0 +1,15 @@
+"""Configuración común de los tests: raíz del repo en sys.path y DATA_DIR aislado."""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    """DATA_DIR temporal: cada test tiene sus propias bases SQLite."""
+    monkeypatch.setenv("DATA_DIR", str(tmp_path))
+    return tmp_path
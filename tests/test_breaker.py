@@ -0,0 +1,150 @@
+"""Tests del circuit breaker: transiciones de estado y timeouts adaptativos."""
+
+import pytest
+
+from clients import breaker as breaker_module
+from clients.breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError
+
+
+class _Clock:
+    """Reemplazo de `time` en clients.breaker: el tiempo solo avanza con advance()."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def perf_counter(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float) -> None:
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = _Clock()
+    monkeypatch.setattr(breaker_module, "time", fake)
+    return fake
+
+
+def _breaker(**kwargs) -> CircuitBreaker:
+    params = dict(failure_threshold=3, window=10, min_calls=10, open_seconds=30.0,
+                  timeout_min=2.0, timeout_max=30.0, min_latency_samples=5)
+    params.update(kwargs)
+    return CircuitBreaker("test", **params)
+
+
+def _fail(breaker: CircuitBreaker, op: str = "op") -> None:
+    with pytest.raises(OSError):
+        with breaker.guard(op, failures=(OSError,)):
+            raise OSError("caído")
+
+
+def _succeed(breaker: CircuitBreaker, clock: _Clock, op: str = "op", elapsed: float = 0.1) -> None:
+    with breaker.guard(op, failures=(OSError,)):
+        clock.advance(elapsed)
+
+
+def test_opens_after_consecutive_failures(clock):
+    breaker = _breaker()
+    for _ in range(2):
+        _fail(breaker)
+    assert breaker.state == CLOSED
+    _fail(breaker)
+    assert breaker.state == OPEN
+    with pytest.raises(CircuitOpenError) as exc:
+        breaker.acquire("op")
+    assert exc.value.retry_after == 30
+
+
+def test_success_resets_consecutive_failures(clock):
+    breaker = _breaker()
+    _fail(breaker)
+    _fail(breaker)
+    _succeed(breaker, clock)
+    _fail(breaker)
+    assert breaker.state == CLOSED
+
+
+def test_business_errors_do_not_count_as_failures(clock):
+    breaker = _breaker()
+    for _ in range(5):
+        with pytest.raises(ValueError):
+            with breaker.guard("op", failures=(OSError,)):
+                raise ValueError("error de negocio")
+    assert breaker.state == CLOSED
+
+
+def test_opens_on_error_rate_over_window(clock):
+    breaker = _breaker(failure_threshold=100, error_rate=0.5)
+    for _ in range(5):
+        _succeed(breaker, clock)
+        _fail(breaker)
+    assert breaker.state == OPEN
+
+
+def test_half_open_allows_single_probe_and_closes_on_success(clock):
+    breaker = _breaker()
+    for _ in range(3):
+        _fail(breaker)
+    clock.advance(30)
+    assert breaker.state == HALF_OPEN
+
+    breaker.acquire("op")
+    with pytest.raises(CircuitOpenError):
+        breaker.acquire("op")
+    breaker.record("op", 0.1, True)
+    assert breaker.state == CLOSED
+
+
+def test_half_open_probe_failure_reopens(clock):
+    breaker = _breaker()
+    for _ in range(3):
+        _fail(breaker)
+    clock.advance(30)
+    _fail(breaker)
+    assert breaker.state == OPEN
+    assert breaker.snapshot()["opened"] == 2
+
+
+def test_timeout_uses_ceiling_until_enough_samples(clock):
+    breaker = _breaker()
+    assert breaker.timeout_for("op") == 30.0
+    assert breaker.timeout_for("op", ceiling=10.0) == 10.0
+
+
+def test_timeout_adapts_to_observed_latency(clock):
+    breaker = _breaker(timeout_multiplier=3.0)
+    for _ in range(5):
+        _succeed(breaker, clock, elapsed=1.0)
+    assert breaker.timeout_for("op") == pytest.approx(3.0)
+    # Nunca por debajo de timeout_min
+    for _ in range(5):
+        _succeed(breaker, clock, op="fast", elapsed=0.01)
+    assert breaker.timeout_for("fast") == 2.0
+
+
+def test_timeout_floor_overrides_learned_percentile(clock):
+    breaker = _breaker(timeout_multiplier=3.0)
+    for _ in range(5):
+        _succeed(breaker, clock, elapsed=1.0)
+    assert breaker.timeout_for("op", floor=20.0) == 20.0
+    # El piso no pasa el techo de la operación ni timeout_max
+    assert breaker.timeout_for("op", ceiling=10.0, floor=20.0) == 10.0
+    assert breaker.timeout_for("op", floor=90.0) == 30.0
+    with breaker.guard("op", floor=20.0) as call:
+        assert call.timeout == 20.0
+
+
+def test_odoo_read_floor_defaults_well_below_max(monkeypatch):
+    from clients import odoo
+
+    monkeypatch.delenv("ODOO_READ_TIMEOUT_MIN", raising=False)
+    breaker = _breaker(timeout_max=60.0, timeout_min=5.0, min_latency_samples=1)
+    breaker.record("pos.order:search_read", 0.5, True)
+    # Lecturas rápidas: el piso por defecto deja 15 s, no el máximo de 60
+    assert breaker.timeout_for("pos.order:search_read", floor=odoo._read_timeout_floor()) == 15.0
+    monkeypatch.setenv("ODOO_READ_TIMEOUT_MIN", "0")
+    assert breaker.timeout_for("pos.order:search_read", floor=odoo._read_timeout_floor()) == 5.0
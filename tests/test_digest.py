@@ -0,0 +1,117 @@
+"""Tests del modo resumen: armado de lotes, ventana y formato del mensaje."""
+
+import queue
+from datetime import datetime
+
+import pytest
+
+from services import digest, jobs
+from services.digest import Coalescer, format_digest
+
+
+@pytest.fixture
+def sent(data_dir, monkeypatch):
+    """Envíos hechos por los coalescers: (jid, texto, alias) en una cola."""
+    outbox = queue.Queue()
+
+    def fake_send(jid, message, alias=None, **kwargs):
+        outbox.put((jid, message, alias))
+        return "Mensaje enviado y validado"
+
+    monkeypatch.setattr(digest, "send_and_validate", fake_send)
+    return outbox
+
+
+def _next(outbox: "queue.Queue"):
+    return outbox.get(timeout=2)
+
+
+def test_batch_flushes_at_max_messages(sent):
+    coalescer = Coalescer("traspasos", window=60, max_messages=3, max_chars=4000)
+    sizes = [coalescer.submit("123@g.us", f"alerta {i}")[1] for i in range(3)]
+    assert sizes == [1, 2, 3]
+    jid, message, alias = _next(sent)
+    assert (jid, alias) == ("123@g.us", "traspasos")
+    assert message.startswith("*3 alertas*")
+    assert all(f"alerta {i}" in message for i in range(3))
+    assert sent.empty()
+
+
+def test_batch_flushes_when_window_expires(sent):
+    coalescer = Coalescer("traspasos", window=0.05, max_messages=20, max_chars=4000)
+    coalescer.submit("123@g.us", "uno")
+    coalescer.submit("123@g.us", "dos")
+    _, message, _ = _next(sent)
+    assert message.startswith("*2 alertas*")
+    assert coalescer.pending == 0
+
+
+def test_single_message_is_sent_as_is(sent):
+    coalescer = Coalescer("traspasos", window=0.05, max_messages=20, max_chars=4000)
+    coalescer.submit("123@g.us", "solo una")
+    assert _next(sent)[1] == "solo una"
+
+
+def test_new_batch_on_chat_change_or_char_limit(sent):
+    coalescer = Coalescer("traspasos", window=60, max_messages=20, max_chars=10)
+    coalescer.submit("123@g.us", "uno")
+    # Otro chat: el lote abierto sale y empieza uno nuevo
+    assert coalescer.submit("456@g.us", "dos")[1] == 1
+    assert _next(sent)[:2] == ("123@g.us", "uno")
+    # Supera max_chars: sale el lote de 456 con un solo mensaje
+    assert coalescer.submit("456@g.us", "mensaje largo")[1] == 1
+    assert _next(sent)[:2] == ("456@g.us", "dos")
+
+
+def test_pending_is_released_when_send_fails(data_dir, monkeypatch):
+    failures = queue.Queue()
+
+    def failing_send(jid, message, alias=None, **kwargs):
+        failures.put(message)
+        raise RuntimeError("bridge caído")
+
+    monkeypatch.setattr(digest, "send_and_validate", failing_send)
+    coalescer = Coalescer("traspasos", window=60, max_messages=2, max_chars=4000)
+    coalescer.submit("123@g.us", "uno")
+    coalescer.submit("123@g.us", "dos")
+    failures.get(timeout=2)
+    assert coalescer.wait_idle(2)
+
+
+def test_batch_shares_one_job_with_the_send_result(sent):
+    coalescer = Coalescer("traspasos", window=60, max_messages=2, max_chars=4000)
+    first, _ = coalescer.submit("123@g.us", "uno")
+    second, _ = coalescer.submit("123@g.us", "dos")
+    assert first == second
+    _next(sent)
+    assert coalescer.wait_idle(2)
+    job = jobs.get_job(first)
+    assert (job["status"], job["batch_size"], job["alias"]) == (jobs.VALIDATED, 2, "traspasos")
+    # El lote siguiente es otro job
+    assert coalescer.submit("123@g.us", "tres")[0] != first
+
+
+def test_flush_all_sends_open_batches_before_window(sent, monkeypatch):
+    coalescer = Coalescer("traspasos", window=60, max_messages=20, max_chars=4000)
+    monkeypatch.setattr(digest, "_coalescers", {"traspasos": coalescer})
+    job_id, _ = coalescer.submit("123@g.us", "uno")
+    assert jobs.get_job(job_id)["status"] == jobs.PENDING
+    assert digest.flush_all(timeout=2) == 0
+    assert _next(sent)[1] == "uno"
+    assert jobs.get_job(job_id)["status"] == jobs.VALIDATED
+
+
+def test_format_digest_adds_local_time_per_message(monkeypatch):
+    monkeypatch.setattr(digest, "to_report_tz", lambda value: value)
+    text = format_digest([(datetime(2025, 3, 1, 9, 5, 0), "uno"), (datetime(2025, 3, 1, 9, 6, 30), "dos")])
+    assert text == "*2 alertas*\n[09:05:00] uno\n[09:06:30] dos"
+
+
+def test_get_coalescer_only_for_configured_aliases(monkeypatch):
+    monkeypatch.setenv("DIGEST_ALIASES", "Traspasos:20, pedidos:x, :5")
+    monkeypatch.setattr(digest, "_coalescers", {})
+    assert digest.windows() == {"traspasos": 20.0}
+    coalescer = digest.get_coalescer("TRASPASOS")
+    assert coalescer is not None and coalescer.window == 20.0
+    assert digest.get_coalescer("traspasos") is coalescer
+    assert digest.get_coalescer("pedidos") is None
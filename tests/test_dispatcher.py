@@ -0,0 +1,195 @@
+"""Tests del despachador de cierres: cursor, ventana de solapamiento y deduplicación."""
+
+import pytest
+
+from services import dispatcher as dispatcher_module
+from services.dispatcher import FAILED, SENT, SKIPPED, ClosingDispatcher
+
+
+class _FakeOdoo:
+    """Sesiones cerradas en memoria con la semántica de list_closed_sessions."""
+
+    def __init__(self):
+        self.sessions = []
+        self.queries = []
+
+    def add(self, session_id: int, write_date: str, config_id: int = 1) -> dict:
+        session = {"id": session_id, "name": f"POS/{session_id:05d}", "write_date": write_date,
+                   "config_id": [config_id, "Tienda"]}
+        self.sessions.append(session)
+        return session
+
+    def list_closed_sessions(self, since: str, limit: int = 50, offset: int = 0):
+        self.queries.append((since, limit, offset))
+        matching = sorted((s for s in self.sessions if s["write_date"] >= since),
+                          key=lambda s: (s["write_date"], s["id"]))
+        return matching[offset:offset + limit]
+
+
+@pytest.fixture
+def odoo(monkeypatch):
+    fake = _FakeOdoo()
+    monkeypatch.setattr(dispatcher_module, "list_closed_sessions", fake.list_closed_sessions)
+    return fake
+
+
+@pytest.fixture
+def dispatcher(data_dir, monkeypatch):
+    monkeypatch.setenv("DISPATCHER_START", "2025-03-01 12:00:00")
+    monkeypatch.setenv("DISPATCHER_OVERLAP_SECONDS", "600")
+    instance = ClosingDispatcher(interval=60)
+    instance.delivered = []
+    instance.outcomes = {}
+
+    def deliver(session):
+        instance.delivered.append(session["id"])
+        return instance.outcomes.get(session["id"], (SENT, "Mensaje enviado y validado"))
+
+    monkeypatch.setattr(instance, "_deliver", deliver)
+    monkeypatch.setattr(instance, "_materialize", lambda session: None)
+    return instance
+
+
+def test_status_does_not_initialize_cursor(dispatcher):
+    assert dispatcher.status()["cursor"] is None
+    assert dispatcher._read_cursor() is None
+
+
+def test_first_run_queries_overlap_window_before_start(dispatcher, odoo):
+    dispatcher.run_once()
+    assert odoo.queries[0][0] == "2025-03-01 11:50:00"
+    assert dispatcher.status()["cursor"] == "2025-03-01 12:00:00|0"
+
+
+def test_late_commit_behind_cursor_is_delivered(dispatcher, odoo):
+    odoo.add(10, "2025-03-01 12:05:00")
+    assert dispatcher.run_once() == 1
+    assert dispatcher.get_cursor() == ("2025-03-01 12:05:00", 10)
+
+    # Transacción iniciada antes que la sesión 10 pero confirmada después
+    odoo.add(9, "2025-03-01 12:04:00")
+    assert dispatcher.run_once() == 1
+    assert dispatcher.delivered == [10, 9]
+    # El cursor no retrocede
+    assert dispatcher.get_cursor() == ("2025-03-01 12:05:00", 10)
+
+
+def test_resolved_sessions_in_window_are_not_redelivered(dispatcher, odoo):
+    odoo.add(10, "2025-03-01 12:05:00")
+    odoo.add(11, "2025-03-01 12:06:00", config_id=2)
+    dispatcher.outcomes[11] = (SKIPPED, "Sin chat para pos.config 2")
+    dispatcher.run_once()
+    dispatcher.run_once()
+    assert dispatcher.delivered == [10, 11]
+    assert dispatcher.status()["counts"] == {SENT: 1, SKIPPED: 1}
+
+
+def test_sessions_outside_window_are_ignored(dispatcher, odoo):
+    odoo.add(5, "2025-03-01 11:00:00")
+    dispatcher.run_once()
+    assert dispatcher.delivered == []
+
+
+def test_retry_does_not_block_later_sessions_or_pass_cursor(dispatcher, odoo, monkeypatch):
+    monkeypatch.setenv("DISPATCHER_MAX_ATTEMPTS", "2")
+    odoo.add(10, "2025-03-01 12:05:00")
+    odoo.add(11, "2025-03-01 12:06:00")
+    dispatcher.outcomes[10] = (None, "bridge caído")
+
+    assert dispatcher.run_once() == 1
+    assert dispatcher.delivered == [10, 11]
+    # La sesión 11 quedó resuelta pero el cursor no pasa a la 10 pendiente
+    assert dispatcher.get_cursor() == ("2025-03-01 12:00:00", 0)
+
+    assert dispatcher.run_once() == 0
+    assert dispatcher.delivered == [10, 11, 10]
+    assert dispatcher.status()["counts"] == {FAILED: 1, SENT: 1}
+    assert dispatcher.get_cursor() == ("2025-03-01 12:06:00", 11)
+
+
+def test_pages_through_all_sessions(dispatcher, odoo, monkeypatch):
+    monkeypatch.setattr(dispatcher_module, "_PAGE_SIZE", 2)
+    for session_id in range(1, 6):
+        odoo.add(session_id, f"2025-03-01 12:0{session_id}:00")
+    assert dispatcher.run_once() == 5
+    assert [offset for _, _, offset in odoo.queries] == [0, 2, 4]
+
+
+# -- _deliver con el ledger real ------------------------------------------------
+
+@pytest.fixture
+def bridge(data_dir, monkeypatch, tmp_path):
+    """send_and_validate / message_exists simulados; el ledger es el real (en DATA_DIR)."""
+    from services import ledger
+
+    monkeypatch.setattr(ledger, "_schema_ready", False)
+    monkeypatch.setenv("CLOSING_CHAT_MAP", "1:123@g.us")
+    monkeypatch.setenv("DISPATCHER_START", "2025-03-01 12:00:00")
+
+    class Bridge:
+        sends = []
+        in_chat = set()
+        confirm = False
+
+    def fake_generate_pdf(session):
+        path = tmp_path / f"{session['id']}.pdf"
+        path.write_bytes(b"%PDF-1.4")
+        return str(path)
+
+    def fake_send(jid, message, *, pos_name=None, alias=None, **kwargs):
+        message_id = f"MSG{len(Bridge.sends) + 1}"
+        Bridge.sends.append(message_id)
+        ledger.record_sent(message_id, jid, kind="media", payload_hash=None, instance="i",
+                           elapsed_ms=1.0, alias=alias, pos_name=pos_name)
+        Bridge.in_chat.add(message_id)
+        validated = Bridge.confirm
+        ledger.record_confirmation(message_id, jid, validated, "ok" if validated else "sin confirmar", 1.0)
+        return "Mensaje enviado y validado" if validated else "Mensaje enviado pero no validado"
+
+    monkeypatch.setattr(dispatcher_module, "generate_pdf", fake_generate_pdf)
+    monkeypatch.setattr(dispatcher_module, "send_and_validate", fake_send)
+    monkeypatch.setattr(dispatcher_module, "message_exists",
+                        lambda jid, message_id, instance=None: message_id in Bridge.in_chat)
+    return Bridge
+
+
+def _real_dispatcher(monkeypatch) -> ClosingDispatcher:
+    instance = ClosingDispatcher(interval=60)
+    monkeypatch.setattr(instance, "_materialize", lambda session: None)
+    return instance
+
+
+def test_unconfirmed_send_is_rechecked_not_resent(bridge, odoo, monkeypatch):
+    odoo.add(10, "2025-03-01 12:05:00")
+    instance = _real_dispatcher(monkeypatch)
+
+    assert instance.run_once() == 0
+    assert bridge.sends == ["MSG1"]
+    # El mensaje aparece en el chat: el reintento lo confirma sin reenviar
+    assert instance.run_once() == 1
+    assert bridge.sends == ["MSG1"]
+    assert instance.status()["counts"] == {SENT: 1}
+
+
+def test_unconfirmed_send_missing_from_chat_fails_without_resending(bridge, odoo, monkeypatch):
+    monkeypatch.setenv("DISPATCHER_MAX_ATTEMPTS", "3")
+    odoo.add(10, "2025-03-01 12:05:00")
+    instance = _real_dispatcher(monkeypatch)
+
+    instance.run_once()
+    bridge.in_chat.clear()
+    instance.run_once()
+    instance.run_once()
+    assert bridge.sends == ["MSG1"]
+    assert instance.status()["counts"] == {FAILED: 1}
+
+
+def test_validated_send_is_skipped(bridge, odoo, monkeypatch):
+    bridge.confirm = True
+    odoo.add(10, "2025-03-01 12:05:00")
+    assert _real_dispatcher(monkeypatch).run_once() == 1
+    # Historial de entregas perdido: el ledger igual evita el reenvío
+    other = _real_dispatcher(monkeypatch)
+    other.db_path = other.db_path + ".nuevo"
+    assert other.run_once() == 0
+    assert bridge.sends == ["MSG1"]
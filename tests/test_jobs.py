@@ -0,0 +1,86 @@
+"""Tests de los envíos asíncronos: validación de callback_url y stream SSE por job."""
+
+import threading
+import time
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from routes import jobs as jobs_route
+from services import jobs
+
+
+@pytest.fixture
+def callbacks(monkeypatch):
+    monkeypatch.setenv("CALLBACK_SECRET", "secreto")
+    monkeypatch.setenv("CALLBACK_ALLOWED_HOSTS", "hooks.example.com, *.interno.example.com")
+
+
+@pytest.mark.parametrize("url", [
+    "https://hooks.example.com/noti",
+    "http://a.interno.example.com:8080/cb",
+])
+def test_allowed_callback_hosts(callbacks, url):
+    jobs.check_callback_url(url)
+
+
+@pytest.mark.parametrize("url", [
+    "http://169.254.169.254/latest/meta-data/",
+    "http://localhost:8084/admin",
+    "https://hooks.example.com.evil.net/",
+    "https://interno.example.com/",
+    "ftp://hooks.example.com/",
+])
+def test_rejected_callback_hosts(callbacks, url):
+    with pytest.raises(ValueError):
+        jobs.check_callback_url(url)
+
+
+def test_callbacks_require_allowlist(monkeypatch):
+    monkeypatch.setenv("CALLBACK_SECRET", "secreto")
+    monkeypatch.delenv("CALLBACK_ALLOWED_HOSTS", raising=False)
+    with pytest.raises(ValueError, match="CALLBACK_ALLOWED_HOSTS"):
+        jobs.check_callback_url("https://hooks.example.com/noti")
+
+
+@pytest.fixture
+def client(data_dir, monkeypatch):
+    monkeypatch.setattr(jobs_route, "_HEARTBEAT_SECONDS", 0.05)
+    app = FastAPI()
+    app.include_router(jobs_route.router)
+    return TestClient(app)
+
+
+def test_events_stream_ends_when_other_worker_finishes_job(client):
+    job = {"job_id": "abc123", "message_id": "m1", "status": jobs.PENDING, "detail": None,
+           "created_at": time.time(), "finished_at": None, "callback_url": None}
+    jobs._save(job)
+
+    def finish_elsewhere():
+        # Otro worker: actualiza el estado compartido sin publicar en este proceso
+        time.sleep(0.2)
+        jobs._save(dict(job, status=jobs.VALIDATED, detail="Mensaje enviado y validado"))
+
+    threading.Thread(target=finish_elsewhere, daemon=True).start()
+    with client.stream("GET", "/whatsapp/jobs/events", params={"job_id": "abc123"}) as resp:
+        body = "".join(resp.iter_text())
+    assert "event: job" in body
+    assert '"status": "validated"' in body
+
+
+def test_events_for_unknown_job_is_404(client):
+    assert client.get("/whatsapp/jobs/events", params={"job_id": "nope"}).status_code == 404
+
+
+def test_send_async_rejects_callback_before_sending(callbacks, monkeypatch):
+    from fastapi import HTTPException
+
+    from routes import send_plain_text
+
+    sent = []
+    monkeypatch.setattr(send_plain_text, "send_message", lambda *args, **kwargs: sent.append(args))
+    with pytest.raises(HTTPException) as exc:
+        send_plain_text.send_async("123@g.us", "hola", "http://169.254.169.254/latest/meta-data/")
+    assert exc.value.status_code == 400
+    assert sent == []
@@ -0,0 +1,38 @@
+"""Tests de GET /whatsapp/messages (ledger local)."""
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from routes import messages
+from services import ledger
+
+
+@pytest.fixture
+def client(data_dir, monkeypatch):
+    monkeypatch.setattr(ledger, "_schema_ready", False)
+    app = FastAPI()
+    app.include_router(messages.router)
+    return TestClient(app)
+
+
+def _sent(message_id: str, alias=None):
+    ledger.record_sent(message_id, "123@g.us", kind="text", payload_hash=None, instance="i",
+                       elapsed_ms=1.0, alias=alias)
+
+
+def test_filter_by_alias(client):
+    _sent("A1", alias="traspasos")
+    _sent("B1", alias="pedidos")
+    _sent("A2", alias="traspasos")
+    resp = client.get("/whatsapp/messages", params={"alias": "Traspasos"})
+    assert [m["message_id"] for m in resp.json()["messages"]] == ["A2", "A1"]
+
+
+def test_alias_lookup_uses_index(client):
+    _sent("A1", alias="traspasos")
+    plan = ledger._conn().execute(
+        "EXPLAIN QUERY PLAN SELECT seq FROM ledger WHERE event IN ('sent', 'send_failed') AND alias = ? "
+        "ORDER BY seq DESC LIMIT 50", ["traspasos"]
+    ).fetchall()
+    assert any("idx_ledger_alias" in row[-1] for row in plan)
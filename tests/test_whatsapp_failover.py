@@ -0,0 +1,110 @@
+"""Tests del failover entre instancias del bridge (_call_bridge)."""
+
+import httpx
+import pytest
+
+from clients import breaker as breaker_module
+from clients import whatsapp
+from clients.breaker import OPEN
+
+
+class _Bridge:
+    """Bridge simulado: cada instancia responde según `behavior[nombre]`."""
+
+    def __init__(self):
+        self.calls = []
+        self.behavior = {}
+
+    def handler(self, request: httpx.Request) -> httpx.Response:
+        name = request.url.path.rsplit("/", 1)[-1]
+        self.calls.append(name)
+        action = self.behavior.get(name, 200)
+        if isinstance(action, type) and issubclass(action, Exception):
+            raise action("simulado", request=request)
+        return httpx.Response(action, json={"instance": name})
+
+
+@pytest.fixture
+def bridge(monkeypatch):
+    monkeypatch.setenv("WHATSAPP_INSTANCES", "a,b")
+    monkeypatch.setenv("WHATSAPP_APIKEY", "clave")
+    monkeypatch.setenv("WHATSAPP_URL", "http://bridge.test")
+    monkeypatch.setattr(breaker_module, "_breakers", {})
+    fake = _Bridge()
+    monkeypatch.setattr(whatsapp, "_client", httpx.Client(transport=httpx.MockTransport(fake.handler)))
+    return fake
+
+
+def _call(key: str, **kwargs):
+    return whatsapp._call_bridge(
+        key, lambda inst: (f"{inst.base}/op/{inst.name}", {}), op="test", max_timeout=5.0, **kwargs
+    )
+
+
+def _order(key: str):
+    return [i.name for i in whatsapp.instances_for(key)]
+
+
+def test_connect_error_fails_over_for_sends(bridge):
+    first, second = _order("573001234567")
+    bridge.behavior[first] = httpx.ConnectError
+    instance, _ = _call("573001234567")
+    assert instance.name == second
+    assert bridge.calls == [first, second]
+
+
+def test_read_timeout_does_not_fail_over_for_sends(bridge):
+    first, _ = _order("573001234567")
+    bridge.behavior[first] = httpx.ReadTimeout
+    with pytest.raises(httpx.ReadTimeout):
+        _call("573001234567")
+    assert bridge.calls == [first]
+
+
+def test_read_timeout_fails_over_for_idempotent_calls(bridge):
+    first, second = _order("573001234567")
+    bridge.behavior[first] = httpx.ReadTimeout
+    instance, _ = _call("573001234567", idempotent=True)
+    assert instance.name == second
+
+
+def test_server_error_is_returned_for_sends(bridge):
+    first, _ = _order("573001234567")
+    bridge.behavior[first] = 502
+    instance, resp = _call("573001234567")
+    assert (instance.name, resp.status_code) == (first, 502)
+    assert bridge.calls == [first]
+
+
+def test_server_error_fails_over_for_idempotent_calls(bridge):
+    first, second = _order("573001234567")
+    bridge.behavior[first] = 502
+    instance, resp = _call("573001234567", idempotent=True)
+    assert (instance.name, resp.status_code) == (second, 200)
+
+
+def test_server_error_on_last_instance_is_returned(bridge):
+    for name in ("a", "b"):
+        bridge.behavior[name] = 503
+    _, resp = _call("573001234567", idempotent=True)
+    assert resp.status_code == 503
+    assert len(bridge.calls) == 2
+
+
+def test_open_breaker_is_skipped_without_calling(bridge):
+    first, second = _order("573001234567")
+    breaker = whatsapp.get_whatsapp_breaker(first)
+    for _ in range(breaker.failure_threshold):
+        breaker.record("test", 0.1, False)
+    assert breaker.state == OPEN
+    instance, _ = _call("573001234567")
+    assert instance.name == second
+    assert bridge.calls == [second]
+
+
+def test_pinned_instance_has_no_failover(bridge):
+    first, second = _order("573001234567")
+    bridge.behavior[second] = httpx.ConnectError
+    with pytest.raises(httpx.ConnectError):
+        _call("573001234567", instance=second)
+    assert bridge.calls == [second]